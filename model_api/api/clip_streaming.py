@@ -0,0 +1,194 @@
+import asyncio
+import os
+import re
+from email.utils import formatdate
+from typing import Tuple, Union
+import sys
+
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 1 nivel: .../api -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'clip_streaming.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Límite de clips sirviéndose a la vez (se crea con el primer pedido, dentro del event loop)
+_stream_slots: Union[asyncio.Semaphore, None] = None
+
+
+def _slots() -> asyncio.Semaphore:
+    global _stream_slots
+    if _stream_slots is None:
+        _stream_slots = asyncio.Semaphore(config.CLIP_STREAM_MAX_CONCURRENT)
+    return _stream_slots
+
+
+class ClipFileResponse(Response):
+    # Respuesta que envía el rango [start, end] de un archivo sin cargarlo en memoria.
+    # Si el servidor ASGI ofrece la extensión 'http.response.zerocopysend', el
+    # archivo se envía con sendfile (sin pasar por Python). Si no (ej. uvicorn),
+    # se lee en bloques de CLIP_STREAM_CHUNK_BYTES con 'os.pread' en un hilo.
+    # Libera el cupo de streaming al terminar (o si el cliente se desconecta).
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, release_slot: bool):
+        super().__init__(status_code=status_code, headers=headers, media_type="video/mp4")
+        self.path = path
+        self.start = start
+        self.length = max(0, end - start + 1)
+        self.release_slot = release_slot
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope.get("method") == "HEAD" or self.length == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+            with open(self.path, "rb") as f:
+                if "http.response.zerocopysend" in scope.get("extensions", {}):
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": f.fileno(),
+                        "offset": self.start,
+                        "count": self.length,
+                        "more_body": False,
+                    })
+                    return
+
+                offset, remaining = self.start, self.length
+                while remaining > 0:
+                    chunk = await asyncio.to_thread(
+                        os.pread, f.fileno(), min(config.CLIP_STREAM_CHUNK_BYTES, remaining), offset
+                    )
+                    if not chunk:
+                        break # El archivo se truncó mientras se enviaba
+                    offset += len(chunk)
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if self.release_slot:
+                _slots().release()
+
+
+def resolve_clip_path(filename: str) -> str:
+    # Solo nombres de archivo .mp4 dentro de SAVE_CLIP_PATH (sin rutas ni '..')
+    if os.path.basename(filename) != filename or not filename.endswith(".mp4"):
+        raise HTTPException(status_code=404, detail="Clip no encontrado.")
+    clip_root = os.path.realpath(config.SAVE_CLIP_PATH)
+    path = os.path.realpath(os.path.join(clip_root, filename))
+    if os.path.dirname(path) != clip_root or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Clip no encontrado.")
+    return path
+
+
+def _is_clip_complete(filename: str) -> bool:
+    # El resumen .json del evento se escribe al cerrar la grabación
+    log_name = os.path.splitext(filename)[0] + ".json"
+    return os.path.exists(os.path.join(config.SAVE_LOG_PATH, log_name))
+
+
+def parse_range(range_header: str, size: int) -> Union[Tuple[int, int], None]:
+    # Interpreta 'Range: bytes=a-b' (también 'a-' y '-n'). Devuelve (inicio, fin)
+    # inclusivos, o None si el encabezado no se soporta (ej. varios rangos):
+    # en ese caso se responde el archivo completo, como permite el RFC 9110.
+    # Lanza 416 si el rango no se puede satisfacer.
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Sufijo: los últimos 'last' bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def serve_clip(request: Request, filename: str) -> Response:
+    # Sirve un clip grabado con soporte de Range, ETag/If-None-Match y límite de
+    # concurrencia. Un clip que todavía se está grabando NO se sirve: el
+    # 'VideoWriter' (mp4v) escribe el índice 'moov' recién al cerrar el archivo,
+    # así que cualquier prefijo del .mp4 es ilegible. Se responde 409 con
+    # 'X-Clip-Complete: false' y 'Retry-After' hasta que termina el evento.
+    path = resolve_clip_path(filename)
+
+    if not _is_clip_complete(filename):
+        raise HTTPException(
+            status_code=409,
+            detail="El clip se está grabando todavía. Intente de nuevo cuando termine el evento.",
+            headers={
+                "X-Clip-Complete": "false",
+                "Retry-After": str(config.CLIP_INCOMPLETE_RETRY_AFTER_SECONDS),
+                "Cache-Control": "no-store",
+            }
+        )
+
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache",
+        "X-Clip-Complete": "true",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header is not None:
+        # 'If-Range': si el cliente tiene otra versión del archivo, se ignora el Range
+        if_range = request.headers.get("if-range")
+        if if_range is None or if_range.strip() == etag:
+            byte_range = parse_range(range_header, size)
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+
+    # Cupo de streaming: si no se libera uno a tiempo, 503 (el cliente reintenta)
+    try:
+        await asyncio.wait_for(_slots().acquire(), timeout=config.CLIP_STREAM_ACQUIRE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiados clips en transmisión. Intente de nuevo.",
+            headers={"Retry-After": "1"}
+        )
+
+    return ClipFileResponse(path, start, end, status_code, headers, release_slot=True)
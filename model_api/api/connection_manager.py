@@ -1,34 +1,429 @@
 import asyncio
+import time
+from collections import deque
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Deque, Dict, Iterable, List, Set, Tuple, Union
+import sys
+import os
+
+import numpy as np
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 1 nivel: .../api -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+    from api.metrics import MetricsRegistry
+    from api.ws_protocol import (
+        CameraTable, EncodedResult, cameras_message, encode_json_batch, encode_results_frame, hello_message
+    )
+except ImportError as e:
+    print(f"Error fatal en 'connection_manager.py': No se pudo importar un módulo. {e}")
+    sys.exit(1)
+
+SLOW_CLIENT_POLICIES = ("drop_oldest", "disconnect")
+
+# Etiqueta de métricas para los clientes suscritos a todas las cámaras
+ALL_CAMERAS_LABEL = "*"
+
+
+class ClientConnection:
+    # Un cliente WebSocket, con sus suscripciones y su cola de salida acotada.
+    # 'publish' solo encola (instantáneo); una tarea escritora por cliente
+    # ('ConnectionManager._writer') vacía la cola. Así un cliente lento solo
+    # se atrasa a sí mismo.
+    #
+    # Formato y ritmo los elige el cliente al conectarse ('ws_protocol'):
+    #   - sin 'max_rate': recibe todos los resultados (cola de 'max_queue_messages'
+    #     por cámara: un cliente de muchas cámaras no se llena antes que uno de una)
+    #   - con 'max_rate': como mucho 'max_rate' envíos por segundo; entre envíos
+    #     solo se guarda el último resultado de cada cámara (coalescencia)
+    # Un cliente multiplexado ('/ws') recibe además lo pendiente de todas sus
+    # cámaras junto, en un mensaje cada 'batch_interval' segundos.
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        label: str,
+        max_queue_messages: int,
+        wire_format: str = "json",
+        max_rate: Union[float, None] = None,
+        batch_interval: Union[float, None] = None
+    ):
+        self.websocket = websocket
+        self.label = label # camera_id (endpoint por cámara) o "multiplex"
+        self.max_queue_messages = max_queue_messages
+        self.wire_format = wire_format
+        self.max_rate = max_rate
+        self.multiplexed = batch_interval is not None
+        self.send_interval = max(batch_interval or 0.0, 1.0 / max_rate if max_rate else 0.0)
+
+        # Suscripciones
+        self.cameras: Set[str] = set()
+        self.all_cameras = False
+
+        # Por cámara: (resultado, hora de encolado)
+        self.queues: Dict[str, Deque[Tuple[EncodedResult, float]]] = {}
+        self.latest: Dict[str, Tuple[EncodedResult, float]] = {} # Con 'max_rate': último por cámara
+        self.control: Deque[str] = deque() # Mensajes de control (texto), antes que los datos
+        self.next_send_at = 0.0
+        self.ready = asyncio.Event()
+        self.writer_task: Union[asyncio.Task, None] = None
+        self.closed = False
+        self.announced_cameras: Set[str] = set() # Cámaras cuyo índice ya conoce (binario)
+
+        self.connected_at = time.time()
+        self.sent_messages = 0
+        self.dropped_messages = 0
+        self.coalesced_messages = 0
+        self.last_send_seconds = 0.0 # Duración del último envío
+
+    def enqueue(self, result: EncodedResult, enqueued_at: float, policy: str) -> bool:
+        # Devuelve False si el cliente debe desconectarse (cola llena con política "disconnect")
+        if self.max_rate is not None:
+            previous = self.latest.get(result.camera_id)
+            if previous is not None:
+                self.coalesced_messages += 1
+                enqueued_at = previous[1] # El atraso se mide desde el primer dato sin enviar
+            self.latest[result.camera_id] = (result, enqueued_at)
+            self.ready.set()
+            return True
+
+        queue = self.queues.get(result.camera_id)
+        if queue is None:
+            queue = self.queues[result.camera_id] = deque()
+        if len(queue) >= self.max_queue_messages:
+            if policy == "disconnect":
+                return False
+            queue.popleft() # "drop_oldest": el dato nuevo reemplaza al más viejo
+            self.dropped_messages += 1
+        queue.append((result, enqueued_at))
+        self.ready.set()
+        return True
+
+    def enqueue_control(self, message: str):
+        self.control.append(message)
+        self.ready.set()
+
+    def discard_pending(self, camera_ids: Union[Set[str], None]):
+        # Quita lo pendiente de cámaras a las que el cliente ya no está suscrito (None = todas)
+        if camera_ids is None:
+            self.queues.clear()
+            self.latest.clear()
+            return
+        for camera_id in camera_ids:
+            self.latest.pop(camera_id, None)
+            self.queues.pop(camera_id, None)
+
+    def pending_count(self) -> int:
+        if self.max_rate is not None:
+            return len(self.latest)
+        return sum(len(queue) for queue in self.queues.values())
+
+    def pending_for(self, camera_id: str) -> int:
+        if self.max_rate is not None:
+            return 1 if camera_id in self.latest else 0
+        return len(self.queues.get(camera_id, ()))
+
+    async def wait_ready(self):
+        while not (self.control or self.pending_count()):
+            self.ready.clear()
+            await self.ready.wait()
+
+    async def take_batch(self) -> List[EncodedResult]:
+        # Devuelve todo lo pendiente, respetando 'send_interval' entre envíos
+        delay = self.next_send_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay) # Mientras tanto, la cola se sigue llenando
+        if self.send_interval:
+            self.next_send_at = time.monotonic() + self.send_interval
+
+        if self.max_rate is not None:
+            batch = [result for result, _ in self.latest.values()]
+            self.latest.clear()
+        else:
+            # Cada cámara en orden; las cámaras, una detrás de otra
+            batch = [result for queue in self.queues.values() for result, _ in queue]
+            self.queues.clear()
+        return batch
+
+    def lag_seconds(self, now: float) -> float:
+        # Antigüedad del dato más viejo que aún no se envió, sin contar la espera
+        # propia de 'send_interval' (agrupar o limitar el ritmo no es atraso)
+        if self.max_rate is not None:
+            oldest = min((enqueued_at for _, enqueued_at in self.latest.values()), default=now)
+        else:
+            oldest = min((queue[0][1] for queue in self.queues.values() if queue), default=now)
+        return max(0.0, now - oldest - self.send_interval)
+
+    def subscriptions(self) -> Union[List[str], str]:
+        return ALL_CAMERAS_LABEL if self.all_cameras else sorted(self.cameras)
+
+    def stats(self, now: float) -> dict:
+        return {
+            "endpoint": "multiplex" if self.multiplexed else "camera",
+            "cameras": self.subscriptions(),
+            "client": f"{self.websocket.client.host}:{self.websocket.client.port}" if getattr(self.websocket, "client", None) else None,
+            "format": self.wire_format,
+            "max_rate": self.max_rate,
+            "connected_seconds": round(time.time() - self.connected_at, 1),
+            "queued_messages": self.pending_count(),
+            "lag_seconds": round(self.lag_seconds(now), 4),
+            "sent_messages": self.sent_messages,
+            "dropped_messages": self.dropped_messages,
+            "coalesced_messages": self.coalesced_messages,
+            "last_send_seconds": round(self.last_send_seconds, 4),
+        }
+
 
 class ConnectionManager:
     # Esta clase gestiona todas las conexiones WebSocket activas (frontends).
-    # Mapea un camera_id a una lista de WebSockets suscritos.
-    
-    def __init__(self):
-        # El diccionario de conexiones activas
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, camera_id: str):
-        # Acepta y registra una nueva conexión de un cliente
+    # Mapea un camera_id a los clientes suscritos ('ClientConnection'); los
+    # clientes suscritos a todas las cámaras se guardan aparte.
+    #
+    # Cada cliente tiene una cola de salida de WS_CLIENT_QUEUE_MESSAGES mensajes
+    # por cámara y su propia tarea escritora: el envío a los clientes ocurre en paralelo y
+    # 'publish' nunca espera a la red (no frena al 'event_manager_task').
+    # Si un cliente no da abasto, se aplica WS_SLOW_CLIENT_POLICY:
+    #   "drop_oldest" -> se descarta el mensaje más viejo de su cola
+    #   "disconnect"  -> se cierra la conexión (el cliente puede reconectarse)
+    # Un envío que tarda más de WS_SEND_TIMEOUT_SECONDS también desconecta.
+    #
+    # Cada resultado se codifica (JSON o binario) una sola vez, la primera vez
+    # que un cliente lo necesita, y se comparte entre todos los clientes.
+
+    def __init__(
+        self,
+        max_queue_messages: Union[int, None] = None,
+        slow_client_policy: Union[str, None] = None,
+        send_timeout_seconds: Union[float, None] = None,
+        metrics: Union[MetricsRegistry, None] = None
+    ):
+        self.max_queue_messages = max(1, max_queue_messages or config.WS_CLIENT_QUEUE_MESSAGES)
+        self.slow_client_policy = slow_client_policy or config.WS_SLOW_CLIENT_POLICY
+        if self.slow_client_policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"WS_SLOW_CLIENT_POLICY no válida: '{self.slow_client_policy}'. Opciones: {SLOW_CLIENT_POLICIES}")
+        self.send_timeout_seconds = config.WS_SEND_TIMEOUT_SECONDS if send_timeout_seconds is None else send_timeout_seconds
+        self.metrics = metrics
+        self.camera_table = CameraTable() # Índices de cámara del formato binario
+
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        # El diccionario de conexiones activas: camera_id -> {websocket: cliente}
+        self.active_connections: Dict[str, Dict[WebSocket, ClientConnection]] = {}
+        # Clientes suscritos a todas las cámaras (incluidas las que aparezcan después)
+        self.all_camera_clients: Dict[WebSocket, ClientConnection] = {}
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        camera_id: str,
+        wire_format: str = "json",
+        max_rate: Union[float, None] = None
+    ):
+        # Acepta y registra un cliente del endpoint por cámara ('/ws/{camera_id}')
+        # ('wire_format' y 'max_rate' ya validados con 'ws_protocol.parse_negotiation')
         await websocket.accept()
-        
-        # Si es la primera conexión para esta cámara, crea la lista
-        if camera_id not in self.active_connections:
-            self.active_connections[camera_id] = []
-            
-        self.active_connections[camera_id].append(websocket)
-        print(f"[API] Frontend conectado a WebSocket para: {camera_id}")
-
-    def disconnect(self, websocket: WebSocket, camera_id: str):
+        client = ClientConnection(websocket, camera_id, self.max_queue_messages, wire_format, max_rate)
+        self._register(client, [camera_id])
+        print(f"[API] Frontend conectado a WebSocket para: {camera_id} (formato: {wire_format}, max_rate: {max_rate})")
+
+    async def connect_multiplexed(
+        self,
+        websocket: WebSocket,
+        camera_ids: Union[List[str], None],
+        wire_format: str = "json",
+        max_rate: Union[float, None] = None
+    ):
+        # Acepta y registra un cliente del endpoint multiplexado ('/ws').
+        # 'camera_ids' = suscripción inicial (None = todas las cámaras).
+        await websocket.accept()
+        client = ClientConnection(
+            websocket, "multiplex", self.max_queue_messages, wire_format, max_rate,
+            batch_interval=config.WS_MULTIPLEX_INTERVAL_SECONDS
+        )
+        self._register(client, camera_ids)
+        print(f"[API] Frontend conectado a WebSocket multiplexado: {client.subscriptions()} (formato: {wire_format}, max_rate: {max_rate})")
+
+    def _register(self, client: ClientConnection, camera_ids: Union[List[str], None]):
+        self.clients[client.websocket] = client
+        self.subscribe(client.websocket, camera_ids)
+        client.writer_task = asyncio.create_task(self._writer(client))
+
+    def subscribe(self, websocket: WebSocket, camera_ids: Union[Iterable[str], None]) -> Union[List[str], str]:
+        # Suma cámaras a la suscripción del cliente (None = todas). Devuelve la suscripción actual.
+        client = self.clients.get(websocket)
+        if client is None:
+            return [] # Ya desconectado (ej. cliente lento)
+        if camera_ids is None:
+            client.all_cameras = True
+            self.all_camera_clients[websocket] = client
+            self._report_clients(ALL_CAMERAS_LABEL)
+        else:
+            for camera_id in camera_ids:
+                if camera_id not in client.cameras:
+                    client.cameras.add(camera_id)
+                    self.active_connections.setdefault(camera_id, {})[websocket] = client
+                    self._report_clients(camera_id)
+        return client.subscriptions()
+
+    def unsubscribe(self, websocket: WebSocket, camera_ids: Union[Iterable[str], None]) -> Union[List[str], str]:
+        # Quita cámaras de la suscripción del cliente (None = todas, incluida la de "todas")
+        client = self.clients.get(websocket)
+        if client is None:
+            return []
+        if camera_ids is None:
+            removed = set(client.cameras)
+            if client.all_cameras:
+                client.all_cameras = False
+                self.all_camera_clients.pop(websocket, None)
+                self._report_clients(ALL_CAMERAS_LABEL)
+            client.discard_pending(None)
+        else:
+            removed = set(camera_ids) & client.cameras
+            if not client.all_cameras:
+                client.discard_pending(removed)
+
+        for camera_id in removed:
+            client.cameras.discard(camera_id)
+            subscribers = self.active_connections.get(camera_id, {})
+            subscribers.pop(websocket, None)
+            if not subscribers:
+                self.active_connections.pop(camera_id, None)
+            self._report_clients(camera_id)
+        return client.subscriptions()
+
+    def send_control(self, websocket: WebSocket, message: str):
+        # Encola un mensaje de control (texto) para el cliente (ej. confirmación de suscripción)
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.enqueue_control(message)
+
+    def disconnect(self, websocket: WebSocket, camera_id: Union[str, None] = None):
         # Elimina una conexión de un cliente que se ha desconectado
-        if camera_id in self.active_connections:
-            self.active_connections[camera_id].remove(websocket)
-        print(f"[API] Frontend desconectado de: {camera_id}")
-
-    async def broadcast(self, camera_id: str, message: str):
-        # Envía un mensaje (JSON) a todos los clientes que están viendo esa cámara
-        if camera_id in self.active_connections:
-            for connection in self.active_connections[camera_id]:
-                await connection.send_text(message)
\ No newline at end of file
+        # (se puede llamar más de una vez: desde el endpoint y desde el escritor)
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        self.unsubscribe(websocket, None)
+        del self.clients[websocket]
+        client.closed = True
+        if client.writer_task is not None and client.writer_task is not asyncio.current_task():
+            client.writer_task.cancel()
+        print(f"[API] Frontend desconectado de: {client.label}")
+
+    async def publish(self, camera_id: str, results: List[Tuple[np.ndarray, float]]):
+        # Encola resultados (probabilities, produced_at) de una cámara para todos
+        # los clientes que la están viendo. No espera a que se envíen: de eso se
+        # encargan las tareas escritoras.
+        clients = {**self.active_connections.get(camera_id, {}), **self.all_camera_clients}
+        if not clients or not results:
+            return
+
+        encoded = [EncodedResult(camera_id, probabilities, produced_at) for probabilities, produced_at in results]
+        now = time.monotonic()
+        dropped = 0
+        coalesced = 0
+        for client in clients.values():
+            dropped_before, coalesced_before = client.dropped_messages, client.coalesced_messages
+            if not all(client.enqueue(result, now, self.slow_client_policy) for result in encoded):
+                print(f"[API] Cliente lento ({client.label}): cola llena ({self.max_queue_messages} mensajes por cámara). Desconectando.")
+                self._drop_slow_client(client)
+                asyncio.create_task(self._close_websocket(client.websocket))
+                continue
+            dropped += client.dropped_messages - dropped_before
+            coalesced += client.coalesced_messages - coalesced_before
+
+        if self.metrics is not None:
+            if dropped:
+                self.metrics.increment("ws_messages_dropped_total", camera_id, dropped)
+            if coalesced:
+                self.metrics.increment("ws_messages_coalesced_total", camera_id, coalesced)
+            self._report_lag(camera_id, clients.values(), now)
+
+    async def _send(self, client: ClientConnection, message: Union[str, bytes]):
+        send_start = time.monotonic()
+        if isinstance(message, bytes):
+            await asyncio.wait_for(client.websocket.send_bytes(message), timeout=self.send_timeout_seconds)
+        else:
+            await asyncio.wait_for(client.websocket.send_text(message), timeout=self.send_timeout_seconds)
+        client.last_send_seconds = time.monotonic() - send_start
+
+    async def _writer(self, client: ClientConnection):
+        # Tarea escritora de un cliente: envía su cola en orden
+        try:
+            if client.wire_format == "binary":
+                # Negociación: tablas de clases y cámaras, una sola vez
+                known = self.camera_table.indices.keys() if client.all_cameras else client.cameras
+                cameras = self.camera_table.subset(list(known))
+                await self._send(client, hello_message(client.wire_format, client.max_rate, cameras))
+                client.announced_cameras.update(cameras)
+
+            while not client.closed:
+                await client.wait_ready()
+                while client.control:
+                    await self._send(client, client.control.popleft())
+                if not client.pending_count():
+                    continue
+
+                batch = await client.take_batch()
+                if not batch:
+                    continue
+                if client.wire_format == "binary":
+                    new_cameras = {result.camera_id for result in batch} - client.announced_cameras
+                    if new_cameras:
+                        await self._send(client, cameras_message(self.camera_table.subset(new_cameras)))
+                        client.announced_cameras.update(new_cameras)
+                    # Todas las entradas pendientes en un solo mensaje
+                    await self._send(client, encode_results_frame(
+                        [result.binary_entry(self.camera_table) for result in batch]
+                    ))
+                elif client.multiplexed:
+                    await self._send(client, encode_json_batch(batch))
+                else:
+                    for result in batch:
+                        await self._send(client, result.json_text())
+                client.sent_messages += len(batch)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            print(f"[API] Cliente lento ({client.label}): envío de más de {self.send_timeout_seconds}s. Desconectando.")
+            self._drop_slow_client(client)
+            await self._close_websocket(client.websocket)
+        except Exception:
+            # El cliente se fue (conexión cerrada o rota)
+            self.disconnect(client.websocket)
+
+    def _drop_slow_client(self, client: ClientConnection):
+        labels = [ALL_CAMERAS_LABEL] if client.all_cameras else sorted(client.cameras)
+        self.disconnect(client.websocket)
+        if self.metrics is not None:
+            for label in labels:
+                self.metrics.increment("ws_slow_clients_disconnected_total", label)
+
+    async def _close_websocket(self, websocket: WebSocket):
+        try:
+            # 1013 = "Try Again Later"
+            await asyncio.wait_for(websocket.close(code=1013), timeout=self.send_timeout_seconds)
+        except Exception:
+            pass
+
+    def _report_clients(self, camera_id: str):
+        if self.metrics is None:
+            return
+        if camera_id == ALL_CAMERAS_LABEL:
+            count = len(self.all_camera_clients)
+        else:
+            count = len(self.active_connections.get(camera_id, {}))
+        self.metrics.set_gauge("ws_clients", camera_id, count)
+
+    def _report_lag(self, camera_id: str, clients: Iterable[ClientConnection], now: float):
+        clients = list(clients)
+        self.metrics.set_gauge("ws_client_lag_seconds", camera_id, max((c.lag_seconds(now) for c in clients), default=0.0))
+        self.metrics.set_gauge("ws_client_queue_messages", camera_id, max((c.pending_for(camera_id) for c in clients), default=0))
+
+    def client_stats(self) -> List[dict]:
+        # Estado de cada cliente conectado (para GET /connections)
+        now = time.monotonic()
+        return [client.stats(now) for client in self.clients.values()]
@@ -1,10 +1,13 @@
 import asyncio
-import json
+import concurrent.futures
+import threading
+import time
 import sys
 import os
 import numpy as np
 from multiprocessing import Queue
-from typing import Dict, Union
+from queue import Empty, Full
+from typing import Dict, List, Tuple, Union
 
 # Agregamos la raíz del proyecto ('model_api') al path de Python
 # Sube 1 nivel: .../api -> .../model_api
@@ -14,6 +17,8 @@ sys.path.append(model_api_root)
 try:
     from config import config
     from api.connection_manager import ConnectionManager
+    from api.metrics import MetricsRegistry
+    from api.timeseries_store import TimeSeriesStore
 except ImportError as e:
     print(f"Error fatal en 'event_manager.py': No se pudo importar un módulo. {e}")
     sys.exit(1)
@@ -21,75 +26,191 @@ except ImportError as e:
 # Diccionario global para mantener el estado de cada cámara (ej. "IDLE", "RECORDING")
 camera_states: Dict[str, str] = {}
 
+# Un resultado de la 'results_queue': (camera_id, probabilities, produced_at)
+Result = Tuple[str, np.ndarray, float]
+
+def _notify_scheduler(scheduler_queue: Union[Queue, None], camera_id: str, state: str):
+    # Avisa al planificador del 'inference_service' del nuevo estado de la cámara
+    if scheduler_queue is None:
+        return
+    try:
+        scheduler_queue.put_nowait((camera_id, state))
+    except Full:
+        print(f"[EventManager] ADVERTENCIA: 'scheduler_queue' llena. Estado de {camera_id} no notificado.")
+
+def _results_reader(
+    results_queue: Queue,
+    batches: asyncio.Queue,
+    loop: asyncio.AbstractEventLoop,
+    stop_event: threading.Event
+):
+    # Hilo lector: espera el primer resultado y luego vacía lo que ya esté en la
+    # cola (hasta RESULTS_DRAIN_MAX_BATCH) sin más esperas. Cada ráfaga pasa al
+    # event loop como una sola lista. Si el event loop va atrasado, la cola
+    # 'batches' (acotada) se llena y el hilo espera: la presión vuelve a la
+    # 'results_queue' en lugar de acumularse en la API.
+    while not stop_event.is_set():
+        try:
+            batch: List[Result] = [results_queue.get(timeout=0.5)]
+        except Empty:
+            continue
+        except (EOFError, OSError):
+            break # La cola se cerró (apagado)
+
+        while len(batch) < config.RESULTS_DRAIN_MAX_BATCH:
+            try:
+                batch.append(results_queue.get_nowait())
+            except Empty:
+                break
+
+        future = asyncio.run_coroutine_threadsafe(batches.put(batch), loop)
+        while not stop_event.is_set():
+            try:
+                future.result(timeout=0.5)
+                break
+            except concurrent.futures.TimeoutError:
+                continue
+            except Exception:
+                return # El event loop se cerró
+
+def _collapse_commands(commands: list) -> list:
+    # El worker solo usa las últimas probabilidades recibidas: de cada racha de
+    # arrays seguidos basta con enviar el último. Las órdenes se mantienen en orden.
+    collapsed = []
+    for command in commands:
+        if isinstance(command, np.ndarray) and collapsed and isinstance(collapsed[-1], np.ndarray):
+            collapsed[-1] = command
+        else:
+            collapsed.append(command)
+    return collapsed
+
+async def _process_camera_results(
+    camera_id: str,
+    results: List[Result],
+    manager: ConnectionManager,
+    control_queues: Dict[str, Queue],
+    scheduler_queue: Union[Queue, None],
+    metrics: Union[MetricsRegistry, None],
+    timeseries: Union[TimeSeriesStore, None] = None
+):
+    # Procesa, en orden, los resultados de una cámara que llegaron en la misma ráfaga
+
+    # --- 1. Alerta WebSocket (al Frontend) ---
+
+    # Guardar en el historial reciente (para clientes que se conectan tarde) y
+    # encolar para todos los clientes suscritos a esta cámara (una sola pasada).
+    # Cada cliente recibe el formato que negoció (JSON o binario).
+    camera_results = [(probabilities, produced_at) for _, probabilities, produced_at in results]
+    if timeseries is not None:
+        timeseries.append(camera_id, camera_results)
+    await manager.publish(camera_id, camera_results)
+    if metrics is not None:
+        now = time.time()
+        for _, _, produced_at in results:
+            metrics.observe("result_to_broadcast_seconds", camera_id, max(0.0, now - produced_at))
+        metrics.increment("results_broadcast_total", camera_id, len(results))
+
+    # --- 2. Lógica de Grabación (al Camera Worker) ---
+
+    control_queue = control_queues.get(camera_id)
+    if not control_queue:
+        # Si 'run_app.py' no registró una cola para esta cámara, no podemos controlarla.
+        print(f"[EventManager] ERROR: No se encontró 'control_queue' para {camera_id}.")
+        return
+
+    # --- Máquina de Estados de Grabación ---
+    # (se recorre cada resultado; los comandos se juntan y se envían al final)
+    commands = []
+    for _, probabilities, _ in results:
+        # Comprobar si alguna probabilidad supera el umbral de alerta
+        is_violence_detected = any(p > config.ALERT_THRESHOLD for p in probabilities)
+
+        # Obtener el estado actual de la cámara (default: "IDLE")
+        current_state = camera_states.get(camera_id, "IDLE")
+
+        if is_violence_detected:
+            if current_state == "IDLE":
+                # --- INICIAR GRABACIÓN ---
+                print(f"[EventManager] ¡Evento detectado en {camera_id}! Enviando orden START_RECORDING.")
+                commands.append("START_RECORDING")
+                camera_states[camera_id] = "RECORDING" # Actualizar estado
+                _notify_scheduler(scheduler_queue, camera_id, "RECORDING")
+
+            # Enviar las probabilidades al worker para que las guarde en el log
+            commands.append(probabilities)
+
+        elif current_state == "RECORDING":
+            # --- DETENER GRABACIÓN ---
+            print(f"[EventManager] Evento terminado en {camera_id}. Enviando orden STOP_RECORDING.")
+            commands.append("STOP_RECORDING")
+            camera_states[camera_id] = "IDLE" # Actualizar estado
+            _notify_scheduler(scheduler_queue, camera_id, "IDLE")
+
+    for command in _collapse_commands(commands):
+        control_queue.put(command)
+
 async def event_manager_task(
     manager: ConnectionManager,
     results_queue: Queue,
-    control_queues: Dict[str, Queue]
+    control_queues: Dict[str, Queue],
+    scheduler_queue: Union[Queue, None] = None,
+    metrics: Union[MetricsRegistry, None] = None,
+    timeseries: Union[TimeSeriesStore, None] = None
 ):
     # Esta es la tarea de fondo ("cerebro lógico") de la API.
     # Se ejecuta en un bucle infinito dentro del proceso de la API.
-    
+    # Los resultados los lee un hilo dedicado ('_results_reader') en ráfagas;
+    # aquí se procesa cada ráfaga agrupada por cámara (un 'broadcast' y un
+    # envío de comandos por cámara, en lugar de uno por resultado).
+    # Si se recibe 'scheduler_queue', cada cambio de estado de una cámara
+    # se notifica al 'inference_service' para priorizar las que graban.
+    # Si se recibe 'metrics', se mide el tiempo desde que se produjo cada
+    # resultado hasta que se envió a los clientes.
+    # Si se recibe 'timeseries', cada resultado se guarda en el historial reciente.
+
     print("[EventManager] Tarea de fondo iniciada. Esperando resultados de la GPU...")
-    
-    while True:
-        try:
-            # --- 1. Leer Resultados de la GPU ---
-            
-            # Usamos 'asyncio.to_thread' para ejecutar el .get() bloqueante
-            # en un hilo separado, sin congelar el bucle de eventos de la API.
-            camera_id, probabilities = await asyncio.to_thread(results_queue.get)
-
-            # --- 2. Alerta WebSocket (al Frontend) ---
-            
-            # Formatear el mensaje JSON para el frontend (React)
-            probs_dict = {
-                config.CLASSES[i]: float(probabilities[i]) 
-                for i in range(len(config.CLASSES))
-            }
-            message = json.dumps({
-                "camera_id": camera_id, 
-                "probabilities": probs_dict
-            })
-            
-            # Enviar a todos los clientes suscritos a este WebSocket
-            await manager.broadcast(camera_id, message)
-
-            # --- 3. Lógica de Grabación (al Camera Worker) ---
-            
-            # Comprobar si alguna probabilidad supera el umbral de alerta
-            is_violence_detected = any(p > config.ALERT_THRESHOLD for p in probabilities)
-            
-            # Obtener el estado actual de la cámara (default: "IDLE")
-            current_state = camera_states.get(camera_id, "IDLE")
-            
-            control_queue = control_queues.get(camera_id)
-            if not control_queue:
-                # Si 'run_app.py' no registró una cola para esta cámara, no podemos controlarla.
-                print(f"[EventManager] ERROR: No se encontró 'control_queue' para {camera_id}.")
-                continue
 
-            # --- Máquina de Estados de Grabación ---
-            
-            if is_violence_detected:
-                if current_state == "IDLE":
-                    # --- INICIAR GRABACIÓN ---
-                    print(f"[EventManager] ¡Evento detectado en {camera_id}! Enviando orden START_RECORDING.")
-                    control_queue.put("START_RECORDING")
-                    camera_states[camera_id] = "RECORDING" # Actualizar estado
-                
-                # Enviar las probabilidades al worker para que las guarde en el JSON
-                control_queue.put(probabilities)
-
-            elif not is_violence_detected and current_state == "RECORDING":
-                # --- DETENER GRABACIÓN ---
-                print(f"[EventManager] Evento terminado en {camera_id}. Enviando orden STOP_RECORDING.")
-                control_queue.put("STOP_RECORDING")
-                camera_states[camera_id] = "IDLE" # Actualizar estado
-
-        except (KeyboardInterrupt, SystemExit):
-            print("[EventManager] Deteniendo tarea de fondo...")
-            break
-        except Exception as e:
-            print(f"[EventManager] ERROR en el bucle: {e}")
-            # Pausa breve para no inundar los logs si hay un error persistente
-            await asyncio.sleep(1)
\ No newline at end of file
+    batches: asyncio.Queue = asyncio.Queue(maxsize=config.RESULTS_READER_MAX_PENDING_BATCHES)
+    stop_event = threading.Event()
+    reader = threading.Thread(
+        target=_results_reader,
+        args=(results_queue, batches, asyncio.get_running_loop(), stop_event),
+        name="results-reader",
+        daemon=True
+    )
+    reader.start()
+
+    try:
+        while True:
+            try:
+                # --- 1. Leer Resultados de la GPU ---
+                # item = (camera_id, probabilities, produced_at)
+                results = await batches.get()
+                while not batches.empty():
+                    results.extend(batches.get_nowait())
+
+                # Agrupar por cámara (conservando el orden de cada una)
+                by_camera: Dict[str, List[Result]] = {}
+                for result in results:
+                    by_camera.setdefault(result[0], []).append(result)
+
+                # Cada cámara en su propio 'try': un error con una cámara (ej. un
+                # resultado corrupto) no descarta los resultados de las demás ni
+                # frena la ráfaga con la pausa del bucle
+                for camera_id, camera_results in by_camera.items():
+                    try:
+                        await _process_camera_results(
+                            camera_id, camera_results, manager, control_queues, scheduler_queue, metrics, timeseries
+                        )
+                    except Exception as e:
+                        print(f"[EventManager] ERROR al procesar los resultados de {camera_id}: {e}")
+
+            except (KeyboardInterrupt, SystemExit):
+                print("[EventManager] Deteniendo tarea de fondo...")
+                break
+            except Exception as e:
+                print(f"[EventManager] ERROR en el bucle: {e}")
+                # Pausa breve para no inundar los logs si hay un error persistente
+                await asyncio.sleep(1)
+    finally:
+        stop_event.set()
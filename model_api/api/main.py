@@ -1,8 +1,11 @@
 import asyncio
+import json
 import sys
 import os
 import multiprocessing as mp
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from typing import Dict, Union
 from contextlib import asynccontextmanager
 
@@ -12,10 +15,16 @@ model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(model_api_root)
 
 try:
+    from config import config
     from api.event_manager import event_manager_task
     from api.connection_manager import ConnectionManager
+    from api.metrics import MetricsRegistry, metrics_collector_task
+    from api.clip_streaming import serve_clip
+    from api.timeseries_store import TimeSeriesStore
+    from api.ws_protocol import error_message, parse_cameras, parse_negotiation, snapshot_message, subscribed_message
+    from services.event_catalog import EventCatalog
 except ImportError as e:
-    print(f"Error fatal en 'main.py': No se pudo importar 'event_manager' o 'connection_manager'. {e}")
+    print(f"Error fatal en 'main.py': No se pudo importar 'event_manager', 'connection_manager', 'metrics', 'clip_streaming', 'timeseries_store' o 'event_catalog'. {e}")
     sys.exit(1)
 
 
@@ -24,6 +33,8 @@ except ImportError as e:
 # El script 'run_app.py' las llenará ("inyectará") antes de iniciar el servidor.
 inference_queue: Union[mp.Queue, None] = None
 results_queue: Union[mp.Queue, None] = None
+scheduler_queue: Union[mp.Queue, None] = None
+metrics_queue: Union[mp.Queue, None] = None # None = métricas desactivadas
 control_queues: Dict[str, mp.Queue] = {}
 
 
@@ -43,13 +54,30 @@ async def lifespan(app: FastAPI):
     asyncio.create_task(event_manager_task(
         manager=manager,
         results_queue=results_queue,
-        control_queues=control_queues
+        control_queues=control_queues,
+        scheduler_queue=scheduler_queue,
+        metrics=metrics,
+        timeseries=timeseries
     ))
+
+    # Recolector de las métricas que envían los workers y el 'inference_service'
+    if metrics_queue is not None:
+        asyncio.create_task(metrics_collector_task(metrics, metrics_queue))
+
+    # Catálogo de eventos grabados (lo escriben los workers, aquí solo se consulta)
+    global event_catalog
+    if config.EVENT_CATALOG_ENABLED:
+        try:
+            event_catalog = EventCatalog()
+        except Exception as e:
+            print(f"[API] ADVERTENCIA: No se pudo abrir el catálogo de eventos: {e}")
     
     # Esto es lo que se ejecuta mientras la app está viva
     yield
     
     # Código de apagado
+    if event_catalog is not None:
+        event_catalog.close()
     print("[API] Servidor FastAPI apagándose.")
 
 
@@ -60,16 +88,40 @@ app = FastAPI(
     lifespan=lifespan  
 )
 
+# Registro de métricas del pipeline (servido en /metrics)
+metrics = MetricsRegistry()
+
 # Instancia única del gestor de conexiones
-manager = ConnectionManager()
+manager = ConnectionManager(metrics=metrics)
+
+# Historial reciente de probabilidades por cámara (lo llena 'event_manager_task')
+timeseries = TimeSeriesStore()
+
+# Catálogo de eventos (se abre en 'lifespan'; None = desactivado o no disponible)
+event_catalog: Union[EventCatalog, None] = None
 
 # --- Endpoints ---
 
 @app.websocket("/ws/{camera_id}")
-async def websocket_endpoint(websocket: WebSocket, camera_id: str):
-    # Mantiene una conexión persistente con un cliente frontend
-    
-    await manager.connect(websocket, camera_id)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    camera_id: str,
+    format: Union[str, None] = None,
+    max_rate: Union[float, None] = None,
+    snapshot: float = config.WS_SNAPSHOT_SECONDS
+):
+    # Mantiene una conexión persistente con un cliente frontend.
+    # El cliente negocia el formato y el ritmo en la URL, ej.
+    # /ws/cam_01?format=binary&max_rate=0.5 (ver api/ws_protocol.py)
+    # Al conectarse recibe primero el historial de los últimos 'snapshot' segundos.
+    try:
+        wire_format, max_rate = parse_negotiation(format, max_rate)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e)) # 1008 = "Policy Violation"
+        return
+
+    await manager.connect(websocket, camera_id, wire_format, max_rate)
+    _send_snapshot(websocket, [camera_id], snapshot)
     try:
         while True:
             # Espera a que el cliente envíe un mensaje (ej. 'ping')
@@ -78,7 +130,172 @@ async def websocket_endpoint(websocket: WebSocket, camera_id: str):
     except WebSocketDisconnect:
         manager.disconnect(websocket, camera_id)
 
+def _send_snapshot(websocket: WebSocket, camera_ids: Union[list, None], seconds: float):
+    # Historial reciente de las cámaras (None = todas) como primer mensaje de datos.
+    # Se genera sin 'await' después de registrar al cliente: los resultados en
+    # vivo que lleguen luego van a su cola, sin huecos ni duplicados.
+    if seconds > 0:
+        manager.send_control(websocket, snapshot_message(seconds, timeseries.snapshot(camera_ids, seconds)))
+
+def _unknown_cameras(camera_ids: Union[list, None]) -> list:
+    # Cámaras pedidas que no existen (solo se puede comprobar si 'run_app.py' inyectó las colas)
+    if camera_ids is None or not control_queues:
+        return []
+    return [camera_id for camera_id in camera_ids if camera_id not in control_queues]
+
+@app.websocket("/ws")
+async def multiplexed_websocket_endpoint(
+    websocket: WebSocket,
+    cameras: str = "*",
+    format: Union[str, None] = None,
+    max_rate: Union[float, None] = None,
+    snapshot: float = config.WS_SNAPSHOT_SECONDS
+):
+    # Una sola conexión para varias cámaras (o todas), ej.
+    # /ws?cameras=cam_01,cam_02&format=binary  o  /ws?cameras=*
+    # Los resultados llegan agrupados: un mensaje cada WS_MULTIPLEX_INTERVAL_SECONDS
+    # con lo pendiente de todas las cámaras suscritas.
+    # La suscripción se cambia en caliente enviando, por ejemplo:
+    #   {"action": "subscribe", "cameras": ["cam_03"]}
+    #   {"action": "unsubscribe", "cameras": "*"}
+    # Cada cambio se confirma con {"type": "subscribed", "cameras": [...]}.
+    # Al conectarse, y al suscribirse a cámaras nuevas, el cliente recibe el
+    # historial de los últimos 'snapshot' segundos de esas cámaras.
+    try:
+        wire_format, max_rate = parse_negotiation(format, max_rate)
+        camera_ids = parse_cameras(cameras)
+        unknown = _unknown_cameras(camera_ids)
+        if unknown:
+            raise ValueError(f"Cámaras desconocidas: {unknown}")
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e)) # 1008 = "Policy Violation"
+        return
+
+    await manager.connect_multiplexed(websocket, camera_ids, wire_format, max_rate)
+    manager.send_control(websocket, subscribed_message("*" if camera_ids is None else sorted(set(camera_ids))))
+    _send_snapshot(websocket, camera_ids, snapshot)
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                request = json.loads(text)
+                if not isinstance(request, dict):
+                    continue # Ej. 'ping'
+                action = request.get("action")
+                if action not in ("subscribe", "unsubscribe"):
+                    raise ValueError(f"Acción no válida: '{action}'. Opciones: ('subscribe', 'unsubscribe')")
+                camera_ids = parse_cameras(request.get("cameras"))
+                unknown = _unknown_cameras(camera_ids)
+                if unknown:
+                    raise ValueError(f"Cámaras desconocidas: {unknown}")
+            except json.JSONDecodeError:
+                continue # Texto libre (ej. 'ping'): se ignora
+            except ValueError as e:
+                manager.send_control(websocket, error_message(str(e)))
+                continue
+
+            if action == "subscribe":
+                client = manager.clients.get(websocket)
+                previous = client.subscriptions() if client is not None else "*"
+                subscriptions = manager.subscribe(websocket, camera_ids)
+                manager.send_control(websocket, subscribed_message(subscriptions))
+                # Historial solo de las cámaras que no tenía
+                if previous != "*":
+                    requested = timeseries.camera_ids() if camera_ids is None else camera_ids
+                    added = [camera_id for camera_id in requested if camera_id not in previous]
+                    if added:
+                        _send_snapshot(websocket, added, snapshot)
+            else:
+                subscriptions = manager.unsubscribe(websocket, camera_ids)
+                manager.send_control(websocket, subscribed_message(subscriptions))
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+
 @app.get("/")
 def read_root():
     # Endpoint simple para verificar que la API está viva (Health Check)
-    return {"message": "UrbanSentinel API en funcionamiento."}
\ No newline at end of file
+    return {"message": "UrbanSentinel API en funcionamiento."}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    # Métricas por etapa y por cámara en formato de texto de Prometheus
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/connections")
+async def read_connections():
+    # Clientes WebSocket conectados, con su cola pendiente y atraso (lag).
+    # 'async': lee el estado del 'manager' desde el event loop, donde se modifica.
+    return {"clients": manager.client_stats()}
+
+@app.get("/timeseries")
+async def list_timeseries():
+    # Cámaras con historial reciente en memoria y cuántos resultados guarda cada una.
+    # 'async' a propósito: se ejecuta en el event loop, igual que 'event_manager_task'
+    # (que escribe el historial), y nunca lo ve a medio actualizar.
+    return {
+        "capacity": timeseries.capacity,
+        "cameras": {camera_id: timeseries.series[camera_id].count for camera_id in timeseries.camera_ids()},
+    }
+
+@app.get("/timeseries/{camera_id}")
+async def read_timeseries(
+    camera_id: str,
+    seconds: float = Query(60.0, gt=0, description="Ventana: los últimos N segundos"),
+    resolution: float = Query(1.0, gt=0, description="Segundos por punto (min/max/mean de cada intervalo)")
+):
+    # Historial reciente de una cámara, agrupado en intervalos de 'resolution'
+    # segundos (ver api/timeseries_store.py). Para reconstruir gráficos sin
+    # esperar a nuevos resultados. 'async' por lo mismo que 'list_timeseries'
+    # (el cálculo es corto y vectorizado).
+    if camera_id not in timeseries.series:
+        raise HTTPException(status_code=404, detail="Cámara sin historial.")
+    return timeseries.downsample(camera_id, seconds, resolution)
+
+@app.get("/events")
+def list_events(
+    camera_id: Union[str, None] = None,
+    start: Union[datetime, None] = Query(None, description="Inicio del rango (ISO 8601), por hora de inicio del evento"),
+    end: Union[datetime, None] = Query(None, description="Fin del rango (ISO 8601, exclusivo)"),
+    event_class: Union[str, None] = Query(None, description="Solo eventos cuyo pico de esta clase llegó a 'min_probability'"),
+    min_probability: Union[float, None] = Query(None, ge=0.0, le=1.0, description="Solo junto con 'event_class' (400 si se envía sin ella)"),
+    limit: int = Query(config.EVENT_CATALOG_PAGE_SIZE, ge=1, le=config.EVENT_CATALOG_MAX_PAGE_SIZE),
+    cursor: Union[str, None] = None
+):
+    # Eventos grabados, del más reciente al más antiguo, paginados por cursor:
+    # para la página siguiente se repite la consulta con 'cursor=next_cursor'.
+    if event_catalog is None:
+        raise HTTPException(status_code=503, detail="Catálogo de eventos no disponible.")
+    if event_class is not None and event_class not in config.CLASSES:
+        raise HTTPException(status_code=400, detail=f"Clase no válida: '{event_class}'. Opciones: {config.CLASSES}")
+
+    try:
+        events, next_cursor = event_catalog.query_events(
+            camera_id=camera_id,
+            start=start.timestamp() if start is not None else None,
+            end=end.timestamp() if end is not None else None,
+            event_class=event_class,
+            min_probability=min_probability,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"events": events, "next_cursor": next_cursor}
+
+@app.get("/events/{event_id}")
+def read_event(event_id: int):
+    if event_catalog is None:
+        raise HTTPException(status_code=503, detail="Catálogo de eventos no disponible.")
+    event = event_catalog.get_event(event_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail=f"Evento {event_id} no encontrado.")
+    return event
+
+@app.api_route("/clips/{filename}", methods=["GET", "HEAD"])
+async def stream_clip(request: Request, filename: str):
+    # Video de un evento grabado (el 'video_file' de /events), con soporte de
+    # Range para que el reproductor pueda saltar sin descargar el archivo entero.
+    return await serve_clip(request, filename)
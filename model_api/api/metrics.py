@@ -0,0 +1,129 @@
+import asyncio
+import bisect
+import threading
+from multiprocessing import Queue
+from typing import Dict, List
+import sys
+import os
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 1 nivel: .../api -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+    from services.metrics_reporter import METRIC_DEFINITIONS, SeriesKey
+except ImportError as e:
+    print(f"Error fatal en 'metrics.py': No se pudo importar un módulo. {e}")
+    sys.exit(1)
+
+METRIC_PREFIX = "urbansentinel_"
+
+
+class MetricsRegistry:
+    # Registro de métricas del proceso de la API.
+    # Junta los resúmenes que envían los 'MetricsReporter' de los demás procesos
+    # (por la 'metrics_queue') con las métricas que se miden aquí mismo
+    # (ej. 'result_to_broadcast_seconds' en el 'event_manager'), y las
+    # exporta en el formato de texto de Prometheus.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets: List[float] = list(config.METRICS_LATENCY_BUCKETS)
+        # Histogramas acumulados: clave -> [conteos_por_bucket, suma, total]
+        self.histograms: Dict[SeriesKey, List] = {}
+        self.counters: Dict[SeriesKey, float] = {}
+        self.gauges: Dict[SeriesKey, float] = {}
+
+    def _histogram(self, key: SeriesKey) -> List:
+        if key not in self.histograms:
+            self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        return self.histograms[key]
+
+    def observe(self, name: str, camera_id: str, seconds: float):
+        with self.lock:
+            histogram = self._histogram((name, camera_id))
+            histogram[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def increment(self, name: str, camera_id: str, amount: float = 1):
+        with self.lock:
+            key = (name, camera_id)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, camera_id: str, value: float):
+        with self.lock:
+            self.gauges[(name, camera_id)] = value
+
+    def merge(self, report: dict):
+        # Suma un resumen de un 'MetricsReporter' (ver su formato)
+        with self.lock:
+            for key, (bucket_counts, total_sum, count) in report.get("histograms", {}).items():
+                histogram = self._histogram(key)
+                if len(bucket_counts) != len(histogram[0]):
+                    continue # Buckets distintos (config cambiada a mitad de ejecución)
+                for i, bucket_count in enumerate(bucket_counts):
+                    histogram[0][i] += bucket_count
+                histogram[1] += total_sum
+                histogram[2] += count
+            for key, amount in report.get("counters", {}).items():
+                self.counters[key] = self.counters.get(key, 0) + amount
+            self.gauges.update(report.get("gauges", {}))
+
+    def render_prometheus(self) -> str:
+        # Exporta todas las series en el formato de texto de Prometheus (0.0.4)
+        lines = []
+        with self.lock:
+            for name, (metric_type, description) in METRIC_DEFINITIONS.items():
+                if metric_type == "histogram":
+                    series = {key: h for key, h in self.histograms.items() if key[0] == name}
+                elif metric_type == "counter":
+                    series = {key: v for key, v in self.counters.items() if key[0] == name}
+                else:
+                    series = {key: v for key, v in self.gauges.items() if key[0] == name}
+                if not series:
+                    continue
+
+                full_name = METRIC_PREFIX + name
+                lines.append(f"# HELP {full_name} {description}")
+                lines.append(f"# TYPE {full_name} {metric_type}")
+
+                for (_, camera_id), value in sorted(series.items()):
+                    label = f'camera="{_escape_label(camera_id)}"'
+                    if metric_type != "histogram":
+                        lines.append(f"{full_name}{{{label}}} {value}")
+                        continue
+
+                    bucket_counts, total_sum, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + [float("inf")], bucket_counts):
+                        cumulative += bucket_count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{full_name}_bucket{{{label},le="{le}"}} {cumulative}')
+                    lines.append(f"{full_name}_sum{{{label}}} {total_sum}")
+                    lines.append(f"{full_name}_count{{{label}}} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+async def metrics_collector_task(registry: MetricsRegistry, metrics_queue: Queue):
+    # Tarea de fondo de la API: vacía la 'metrics_queue' y acumula los
+    # resúmenes en el registro (igual que 'event_manager_task' con los resultados).
+    print("[Metrics] Tarea de fondo iniciada. Esperando métricas de los procesos...")
+
+    while True:
+        try:
+            report = await asyncio.to_thread(metrics_queue.get)
+            registry.merge(report)
+        except (KeyboardInterrupt, SystemExit):
+            print("[Metrics] Deteniendo tarea de fondo...")
+            break
+        except Exception as e:
+            print(f"[Metrics] ERROR en el bucle: {e}")
+            await asyncio.sleep(1)
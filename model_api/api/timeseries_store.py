@@ -0,0 +1,156 @@
+import time
+from typing import Dict, List, Tuple, Union
+import sys
+import os
+
+import numpy as np
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 1 nivel: .../api -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'timeseries_store.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+
+class CameraSeries:
+    # Anillo de tamaño fijo con los últimos resultados de una cámara:
+    # 'timestamps' (float64, epoch) y 'probabilities' (float32, una columna por clase).
+    # Al llenarse, cada resultado nuevo pisa al más viejo (sin reservar memoria).
+
+    def __init__(self, capacity: int, num_classes: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.probabilities = np.zeros((capacity, num_classes), dtype=np.float32)
+        self.head = 0 # Próxima posición a escribir
+        self.count = 0
+
+    def append(self, timestamps: np.ndarray, probabilities: np.ndarray):
+        # Agrega una ráfaga de resultados (en orden) con una sola escritura por arreglo
+        if len(timestamps) > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            probabilities = probabilities[-self.capacity:]
+        positions = (self.head + np.arange(len(timestamps))) % self.capacity
+        self.timestamps[positions] = timestamps
+        self.probabilities[positions] = probabilities
+        self.head = (self.head + len(timestamps)) % self.capacity
+        self.count = min(self.capacity, self.count + len(timestamps))
+
+    def window(self, since: float) -> Tuple[np.ndarray, np.ndarray]:
+        # Resultados con timestamp >= 'since', del más viejo al más nuevo (copias)
+        start = (self.head - self.count) % self.capacity
+        order = (start + np.arange(self.count)) % self.capacity
+        timestamps = self.timestamps[order]
+        mask = timestamps >= since
+        return timestamps[mask], self.probabilities[order[mask]]
+
+
+class TimeSeriesStore:
+    # Historial reciente de probabilidades por cámara, en memoria de la API.
+    # Lo alimenta el 'event_manager_task' con cada ráfaga de resultados; sirve
+    # para que un cliente que se conecta tarde reconstruya sus gráficos sin
+    # esperar a nuevos resultados ('GET /timeseries/{camera_id}' y la "foto"
+    # que reciben los WebSocket al conectarse).
+    # No tiene lock: solo se debe usar desde el event loop de la API (tareas y
+    # endpoints 'async def'). Un endpoint 'def' corre en el threadpool de
+    # FastAPI y podría leer un anillo a medio actualizar.
+
+    def __init__(self, capacity: Union[int, None] = None):
+        self.capacity = max(1, capacity or config.TIMESERIES_CAPACITY)
+        self.num_classes = len(config.CLASSES)
+        self.series: Dict[str, CameraSeries] = {}
+
+    def append(self, camera_id: str, results: List[Tuple[np.ndarray, float]]):
+        # 'results' = [(probabilities, produced_at), ...] de una cámara, en orden
+        if not results:
+            return
+        series = self.series.get(camera_id)
+        if series is None:
+            series = self.series[camera_id] = CameraSeries(self.capacity, self.num_classes)
+        series.append(
+            np.fromiter((produced_at for _, produced_at in results), dtype=np.float64, count=len(results)),
+            np.stack([probabilities for probabilities, _ in results]).astype(np.float32, copy=False)
+        )
+
+    def camera_ids(self) -> List[str]:
+        return sorted(self.series)
+
+    def window(self, camera_id: str, seconds: float, now: Union[float, None] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # Resultados de los últimos 'seconds' segundos (arreglos vacíos si no hay)
+        series = self.series.get(camera_id)
+        if series is None:
+            return np.zeros(0, dtype=np.float64), np.zeros((0, self.num_classes), dtype=np.float32)
+        now = time.time() if now is None else now
+        return series.window(now - seconds)
+
+    def downsample(
+        self,
+        camera_id: str,
+        seconds: float,
+        resolution_seconds: float,
+        now: Union[float, None] = None
+    ) -> dict:
+        # Agrupa los últimos 'seconds' segundos en intervalos de 'resolution_seconds'
+        # (como mucho TIMESERIES_MAX_POINTS; si no alcanza, se agranda el intervalo)
+        # y calcula min/max/mean por clase en cada intervalo, sin bucles de Python.
+        # Solo se devuelven los intervalos que tienen datos.
+        now = time.time() if now is None else now
+        resolution_seconds = max(resolution_seconds, seconds / config.TIMESERIES_MAX_POINTS)
+        timestamps, probabilities = self.window(camera_id, seconds, now)
+
+        start = now - seconds
+        if len(timestamps):
+            order = np.argsort(timestamps, kind="stable") # Por si llegaron desordenados
+            timestamps, probabilities = timestamps[order], probabilities[order]
+            buckets = np.floor((timestamps - start) / resolution_seconds).astype(np.int64)
+            # Primer índice de cada intervalo (los intervalos ya están ordenados)
+            bucket_ids, first = np.unique(buckets, return_index=True)
+            counts = np.diff(np.append(first, len(buckets)))
+            minimum = np.minimum.reduceat(probabilities, first, axis=0)
+            maximum = np.maximum.reduceat(probabilities, first, axis=0)
+            mean = np.add.reduceat(probabilities, first, axis=0, dtype=np.float64) / counts[:, None]
+            bucket_starts = start + bucket_ids * resolution_seconds
+        else:
+            bucket_starts = counts = np.zeros(0)
+            minimum = maximum = mean = np.zeros((0, self.num_classes))
+
+        return {
+            "camera_id": camera_id,
+            "start": start,
+            "end": now,
+            "resolution_seconds": resolution_seconds,
+            "timestamps": np.round(bucket_starts, 3).tolist(),
+            "counts": counts.astype(int).tolist(),
+            "min": _by_class(minimum),
+            "max": _by_class(maximum),
+            "mean": _by_class(mean),
+        }
+
+    def snapshot(self, camera_ids: Union[List[str], None], seconds: float) -> List[dict]:
+        # Historial de los últimos 'seconds' segundos, sin agrupar, de varias
+        # cámaras (None = todas). Es la "foto" que recibe un WebSocket al conectarse.
+        if seconds <= 0:
+            return []
+        now = time.time()
+        snapshot = []
+        for camera_id in (self.camera_ids() if camera_ids is None else camera_ids):
+            timestamps, probabilities = self.window(camera_id, seconds, now)
+            if len(timestamps):
+                snapshot.append({
+                    "camera_id": camera_id,
+                    "timestamps": timestamps.tolist(),
+                    "probabilities": _by_class(probabilities),
+                })
+        return snapshot
+
+
+def _by_class(values: np.ndarray) -> Dict[str, List[float]]:
+    # Columnas (una por clase) -> {clase: [valores]} con 4 decimales (JSON compacto)
+    return {
+        class_name: np.round(values[:, i].astype(np.float64), 4).tolist()
+        for i, class_name in enumerate(config.CLASSES)
+    }
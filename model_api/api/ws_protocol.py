@@ -0,0 +1,164 @@
+import json
+import struct
+import time
+from typing import Dict, List, Tuple, Union
+import sys
+import os
+
+import numpy as np
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 1 nivel: .../api -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'ws_protocol.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+# Formatos que un cliente puede pedir al conectarse ('?format=...')
+#   "json"   -> un mensaje de texto por resultado: {"camera_id", "probabilities": {clase: p}}
+#   "binary" -> mensajes binarios compactos (ver abajo); las tablas de clases y
+#               cámaras se envían una sola vez, como texto, en el "hello"
+WIRE_FORMATS = ("json", "binary")
+PROTOCOL_VERSION = 1
+
+# Mensaje binario (little-endian):
+#   cabecera: tipo (uint8), hora de envío (float64, epoch), cantidad de entradas (uint16)
+#   entrada:  índice de cámara (uint16) + una probabilidad float32 por clase
+MSG_RESULTS = 1
+HEADER = struct.Struct("<BdH")
+ENTRY = struct.Struct(f"<H{len(config.CLASSES)}f")
+
+
+class CameraTable:
+    # Asigna a cada camera_id un índice fijo (uint16) para el formato binario.
+    # Es global a la API: el mismo índice vale para todos los clientes.
+
+    def __init__(self):
+        self.indices: Dict[str, int] = {}
+
+    def index(self, camera_id: str) -> int:
+        index = self.indices.get(camera_id)
+        if index is None:
+            index = len(self.indices)
+            if index > 0xFFFF:
+                raise ValueError("Demasiadas cámaras para el formato binario (máximo 65536).")
+            self.indices[camera_id] = index
+        return index
+
+    def subset(self, camera_ids) -> Dict[str, int]:
+        return {camera_id: self.index(camera_id) for camera_id in camera_ids}
+
+
+class EncodedResult:
+    # Un resultado de una cámara, con sus codificaciones calculadas una sola vez
+    # (a demanda) y compartidas por todos los clientes que lo reciben.
+    __slots__ = ("camera_id", "probabilities", "produced_at", "_json", "_entry")
+
+    def __init__(self, camera_id: str, probabilities: np.ndarray, produced_at: float):
+        self.camera_id = camera_id
+        self.probabilities = probabilities
+        self.produced_at = produced_at
+        self._json: Union[str, None] = None
+        self._entry: Union[bytes, None] = None
+
+    def json_text(self) -> str:
+        if self._json is None:
+            self._json = json.dumps({
+                "camera_id": self.camera_id,
+                "probabilities": dict(zip(config.CLASSES, map(float, self.probabilities)))
+            })
+        return self._json
+
+    def binary_entry(self, table: CameraTable) -> bytes:
+        if self._entry is None:
+            self._entry = ENTRY.pack(table.index(self.camera_id), *map(float, self.probabilities))
+        return self._entry
+
+
+def encode_json_batch(results: List[EncodedResult]) -> str:
+    # Mensaje JSON del endpoint multiplexado: varios resultados (de varias cámaras)
+    # juntos. Reutiliza el texto ya codificado de cada resultado.
+    return (
+        f'{{"type": "results", "sent_at": {time.time()}, "results": ['
+        + ", ".join(result.json_text() for result in results)
+        + "]}"
+    )
+
+
+def encode_results_frame(entries: List[bytes]) -> bytes:
+    return HEADER.pack(MSG_RESULTS, time.time(), len(entries)) + b"".join(entries)
+
+
+def decode_results_frame(data: bytes, num_classes: int) -> Tuple[float, List[Tuple[int, Tuple[float, ...]]]]:
+    # Inverso de 'encode_results_frame' (para clientes de Python y pruebas)
+    message_type, sent_at, count = HEADER.unpack_from(data, 0)
+    if message_type != MSG_RESULTS:
+        raise ValueError(f"Tipo de mensaje binario desconocido: {message_type}")
+    entry = struct.Struct(f"<H{num_classes}f")
+    entries = []
+    for i in range(count):
+        camera_index, *probabilities = entry.unpack_from(data, HEADER.size + i * entry.size)
+        entries.append((camera_index, tuple(probabilities)))
+    return sent_at, entries
+
+
+def hello_message(wire_format: str, max_rate: Union[float, None], cameras: Dict[str, int]) -> str:
+    # Primer mensaje (texto) para un cliente binario: la "negociación" del formato
+    return json.dumps({
+        "type": "hello",
+        "version": PROTOCOL_VERSION,
+        "format": wire_format,
+        "max_rate": max_rate,
+        "classes": list(config.CLASSES),
+        "cameras": cameras,
+        "header": HEADER.format,
+        "entry": ENTRY.format,
+    })
+
+
+def cameras_message(cameras: Dict[str, int]) -> str:
+    # Cámaras nuevas para un cliente binario (se envía antes de usar sus índices)
+    return json.dumps({"type": "cameras", "cameras": cameras})
+
+
+def subscribed_message(cameras: Union[List[str], str]) -> str:
+    # Confirmación de la suscripción actual de un cliente multiplexado ("*" = todas)
+    return json.dumps({"type": "subscribed", "cameras": cameras})
+
+
+def snapshot_message(seconds: float, cameras: List[dict]) -> str:
+    # Historial reciente (ver 'TimeSeriesStore.snapshot') que recibe un cliente
+    # al conectarse, antes de los resultados en vivo
+    return json.dumps({"type": "snapshot", "seconds": seconds, "classes": list(config.CLASSES), "cameras": cameras})
+
+
+def error_message(detail: str) -> str:
+    return json.dumps({"type": "error", "detail": detail})
+
+
+def parse_cameras(value: Union[str, List[str], None]) -> Union[List[str], None]:
+    # Lista de cámaras pedida por el cliente multiplexado: "cam_01,cam_02",
+    # ["cam_01", "cam_02"] o "*" (todas, devuelve None)
+    if value == "*" or value == ["*"]:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(camera_id, str) for camera_id in value):
+        raise ValueError("'cameras' debe ser una lista de camera_id o \"*\".")
+    return [camera_id.strip() for camera_id in value if camera_id.strip()]
+
+
+def parse_negotiation(wire_format: Union[str, None], max_rate: Union[float, None]) -> Tuple[str, Union[float, None]]:
+    # Valida lo que pidió el cliente y aplica los valores por defecto de config
+    wire_format = wire_format or config.WS_DEFAULT_FORMAT
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Formato no válido: '{wire_format}'. Opciones: {WIRE_FORMATS}")
+    if max_rate is None:
+        max_rate = config.WS_DEFAULT_MAX_RATE
+    if max_rate is not None and max_rate <= 0:
+        raise ValueError("'max_rate' debe ser mayor que 0.")
+    return wire_format, max_rate
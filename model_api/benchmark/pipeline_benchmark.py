@@ -0,0 +1,418 @@
+import asyncio
+import datetime
+import functools
+import json
+import platform
+import queue
+import tempfile
+import threading
+import time
+import sys
+import os
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple, Union
+
+import numpy as np
+import cv2
+import onnxruntime
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../benchmark -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+    from processing.video_processor import FramePreprocessCache
+    from processing.frame_ring_buffer import FrameRingBuffer
+    from onnx_model.onnx_detector import ViolenceDetector
+    from onnx_model.onnx_person_detector import PersonDetector
+    from services.batching import collect_batch
+    from services.stream_reader.file_reader import FileReader
+    from api.connection_manager import ConnectionManager
+    from api.event_manager import event_manager_task
+    from benchmark.synthetic_assets import (
+        build_synthetic_violence_model,
+        build_synthetic_person_model,
+        generate_synthetic_videos
+    )
+except ImportError as e:
+    print(f"Error fatal en 'pipeline_benchmark.py': No se pudo importar un módulo. {e}")
+    sys.exit(1)
+
+# 'resource' no existe en Windows (ahí no se reporta el pico de RSS)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Benchmark de extremo a extremo del pipeline:
+#   FileReader -> PersonDetector -> preprocess_clip -> ViolenceDetector
+#   -> event_manager_task -> fan-out WebSocket
+#
+# Todo corre en UN proceso (un hilo por cámara, un hilo de inferencia y el
+# bucle asyncio de la API) para poder medir cada etapa con el mismo reloj.
+# Los componentes son los mismos de la app; lo único simulado son los
+# clientes WebSocket (no hay red). Los workers no duermen entre frames:
+# se mide el máximo que da el pipeline, no el tiempo real.
+
+STAGES = ["read", "person_detection", "preprocess", "inference", "event_fanout", "end_to_end"]
+
+
+class StageRecorder:
+    # Acumula las latencias (s) y los items procesados por etapa (thread-safe)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.items: Dict[str, int] = {stage: 0 for stage in STAGES}
+
+    def record(self, stage: str, seconds: float, items: int = 1):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+            self.items[stage] += items
+
+    def summary(self, wall_seconds: float) -> Dict[str, Dict[str, float]]:
+        # Throughput (items/s sobre el tiempo total) y percentiles de latencia (ms)
+        stages = {}
+        with self.lock:
+            for stage in STAGES:
+                samples = np.asarray(self.latencies[stage], dtype=np.float64) * 1000.0
+                if samples.size == 0:
+                    continue
+                p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+                stages[stage] = {
+                    "calls": int(samples.size),
+                    "items": self.items[stage],
+                    "throughput_per_second": self.items[stage] / wall_seconds if wall_seconds > 0 else 0.0,
+                    "mean_ms": float(samples.mean()),
+                    "p50_ms": float(p50),
+                    "p95_ms": float(p95),
+                    "p99_ms": float(p99),
+                    "max_ms": float(samples.max()),
+                }
+        return stages
+
+
+class _BenchmarkWebSocket:
+    # Cliente WebSocket simulado: acepta la conexión y cuenta lo que recibe.
+    # Con 'on_message', avisa cada mensaje recibido (para medir la entrega).
+
+    def __init__(self, on_message: Union[Callable[[], None], None] = None):
+        self.messages = 0
+        self.bytes = 0
+        self.on_message = on_message
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.messages += 1
+        self.bytes += len(message)
+        if self.on_message is not None:
+            self.on_message()
+
+    async def send_bytes(self, message: bytes):
+        await self.send_text(message)
+
+
+class _BenchmarkConnectionManager(ConnectionManager):
+    # ConnectionManager real que registra la latencia desde que el resultado
+    # entró en la 'results_queue' hasta que lo recibe el primer cliente de la
+    # cámara (el envío ocurre en la tarea escritora de cada cliente).
+    # 'end_to_end' se mide desde que se leyó el PRIMER frame del clip: incluye
+    # llenar la ventana, el preprocesado, la espera del lote y la inferencia.
+
+    def __init__(self, recorder: StageRecorder):
+        # Cola por cliente sin límite práctico: el benchmark mide latencia, no descartes
+        super().__init__(max_queue_messages=1_000_000)
+        self.recorder = recorder
+        # Por cámara, en el orden de la cola: (clip_start_at o None, published_at)
+        self.pending: Dict[str, Deque[Tuple[Union[float, None], float]]] = {}
+        self.lock = threading.Lock()
+        self.delivered = 0
+
+    def expect(self, camera_id: str, clip_start_at: Union[float, None], published_at: float):
+        self.pending.setdefault(camera_id, deque()).append((clip_start_at, published_at))
+
+    def delivered_to(self, camera_id: str):
+        now = time.perf_counter()
+        with self.lock:
+            clip_start_at, published_at = self.pending[camera_id].popleft()
+            self.delivered += 1
+        self.recorder.record("event_fanout", now - published_at)
+        if clip_start_at is not None:
+            self.recorder.record("end_to_end", now - clip_start_at)
+
+
+def _peak_rss_mb() -> Union[float, None]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB; macOS en bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class PipelineBenchmark:
+    # Ejecuta el pipeline para 'num_cameras' cámaras durante 'frames_per_camera'
+    # frames cada una y devuelve un reporte (dict serializable a JSON).
+
+    def __init__(
+        self,
+        num_cameras: int = 4,
+        frames_per_camera: int = 300,
+        clients_per_camera: int = 1,
+        violence_model_path: Union[str, None] = None,
+        person_model_path: Union[str, None] = None,
+        video_paths: Union[List[str], None] = None,
+        work_dir: Union[str, None] = None
+    ):
+        # Sin rutas se generan modelos y videos sintéticos en 'work_dir'
+        # (por defecto, un directorio temporal).
+        self.num_cameras = num_cameras
+        self.frames_per_camera = frames_per_camera
+        self.clients_per_camera = clients_per_camera
+        self.violence_model_path = violence_model_path
+        self.person_model_path = person_model_path
+        self.video_paths = video_paths
+        self.work_dir = work_dir
+
+        self.recorder = StageRecorder()
+        self.manager = _BenchmarkConnectionManager(self.recorder)
+        self.results_queue: queue.Queue = queue.Queue()
+        self.clip_queue: queue.Queue = queue.Queue(maxsize=config.INFERENCE_QUEUE_MAXSIZE)
+        self.publish_lock = threading.Lock()
+        self.published = 0
+        self.batch_sizes: List[int] = []
+
+    def _prepare_assets(self, work_dir: str) -> bool:
+        # Genera lo que no se haya pasado. Devuelve True si algo es sintético.
+        synthetic = False
+        if self.violence_model_path is None:
+            self.violence_model_path = build_synthetic_violence_model(os.path.join(work_dir, "synthetic_swin3d.onnx"))
+            synthetic = True
+        if self.person_model_path is None:
+            self.person_model_path = build_synthetic_person_model(os.path.join(work_dir, "synthetic_yolov8n.onnx"))
+            synthetic = True
+        if not self.video_paths:
+            self.video_paths = generate_synthetic_videos(os.path.join(work_dir, "videos"), num_videos=max(2, self.num_cameras))
+            synthetic = True
+        return synthetic
+
+    def _publish(self, camera_id: str, probabilities: np.ndarray, clip_start_at: Union[float, None]):
+        # Entrega un resultado a la 'results_queue' del event manager.
+        # (El registro y el put van juntos para conservar el orden por cámara)
+        with self.publish_lock:
+            self.manager.expect(camera_id, clip_start_at, time.perf_counter())
+            self.results_queue.put((camera_id, probabilities, time.time()))
+            self.published += 1
+
+    def _camera_loop(self, camera_id: str, video_paths: List[str]):
+        # Versión sin pausas del bucle de 'camera_worker' (modo "local")
+        reader = FileReader(video_paths)
+        person_detector = PersonDetector(model_path=self.person_model_path)
+        try:
+            source_fps = reader.get_fps()
+            if source_fps == 0 or source_fps > 1000:
+                source_fps = config.TARGET_FPS
+            inference_buffer_size = int(config.CLIP_LEN / config.TARGET_FPS * source_fps)
+
+            frame_ring = FrameRingBuffer(inference_buffer_size)
+            # Momento de lectura de cada frame de la ventana (para 'end_to_end')
+            read_times: Deque[float] = deque(maxlen=inference_buffer_size)
+            frame_cache = FramePreprocessCache()
+            neutral_probs = np.zeros(len(config.CLASSES))
+
+            for frame_counter in range(1, self.frames_per_camera + 1):
+                start = time.perf_counter()
+                ret, frame = reader.read()
+                self.recorder.record("read", time.perf_counter() - start)
+                if not ret:
+                    print(f"[Benchmark] ADVERTENCIA: El video de {camera_id} terminó antes de tiempo.")
+                    break
+                frame_ring.append(frame)
+                read_times.append(start)
+
+                if len(frame_ring) < inference_buffer_size or frame_counter % config.STRIDE != 0:
+                    continue
+
+                start = time.perf_counter()
+                person_count = person_detector.count_persons(frame)
+                self.recorder.record("person_detection", time.perf_counter() - start)
+
+                if person_count < 2:
+                    self._publish(camera_id, neutral_probs, None)
+                    continue
+
+                start = time.perf_counter()
+                tensor = frame_cache.preprocess_clip(
+                    frame_ring.latest(inference_buffer_size),
+                    frame_counter - inference_buffer_size,
+                    as_uint8=config.UINT8_CLIP_TRANSPORT
+                )
+                self.recorder.record("preprocess", time.perf_counter() - start)
+
+                # Bloqueante: en el benchmark no se descartan clips.
+                # Con el búfer lleno, read_times[0] es la lectura del primer frame del clip.
+                self.clip_queue.put((camera_id, tensor, read_times[0]))
+        finally:
+            reader.release()
+
+    def _inference_loop(self):
+        # Igual que 'inference_service' (micro-batching), hasta recibir None
+        detector = ViolenceDetector(model_path=self.violence_model_path)
+        finished = False
+        while not finished:
+            items = collect_batch(self.clip_queue, config.MAX_BATCH_SIZE, config.BATCH_TIMEOUT_SECONDS)
+            finished = any(item is None for item in items)
+            items = [item for item in items if item is not None]
+            if not items:
+                continue
+
+            batch_tensor = np.stack([tensor for _, tensor, _ in items], axis=0)
+            start = time.perf_counter()
+            batch_probs = detector.predict_batch(batch_tensor)
+            self.recorder.record("inference", time.perf_counter() - start, items=len(items))
+            self.batch_sizes.append(len(items))
+
+            for (camera_id, _, clip_start_at), probabilities in zip(items, batch_probs):
+                self._publish(camera_id, probabilities, clip_start_at)
+
+    async def _run_pipeline(self) -> float:
+        camera_ids = [f"bench_cam_{i + 1:02d}" for i in range(self.num_cameras)]
+        control_queues = {camera_id: queue.Queue() for camera_id in camera_ids}
+
+        # Clientes simulados conectados por la API real del ConnectionManager
+        for camera_id in camera_ids:
+            for client_index in range(self.clients_per_camera):
+                # El primer cliente de cada cámara mide la entrega
+                on_message = functools.partial(self.manager.delivered_to, camera_id) if client_index == 0 else None
+                await self.manager.connect(_BenchmarkWebSocket(on_message), camera_id)
+
+        # Videos repartidos entre cámaras (cada una arranca en uno distinto)
+        camera_threads = []
+        for i, camera_id in enumerate(camera_ids):
+            videos = self.video_paths[i % len(self.video_paths):] + self.video_paths[:i % len(self.video_paths)]
+            camera_threads.append(threading.Thread(target=self._camera_loop, args=(camera_id, videos), daemon=True))
+        inference_thread = threading.Thread(target=self._inference_loop, daemon=True)
+
+        start = time.perf_counter()
+        event_task = asyncio.create_task(event_manager_task(self.manager, self.results_queue, control_queues))
+        inference_thread.start()
+        for thread in camera_threads:
+            thread.start()
+
+        # Esperar a que terminen las cámaras, luego la inferencia, y luego la entrega
+        while any(thread.is_alive() for thread in camera_threads):
+            await asyncio.sleep(0.05)
+        self.clip_queue.put(None)
+        while inference_thread.is_alive():
+            await asyncio.sleep(0.05)
+        while self.manager.delivered < self.published:
+            await asyncio.sleep(0.01)
+        wall_seconds = time.perf_counter() - start
+
+        event_task.cancel()
+        # Desbloquear el hilo de 'event_manager_task' que espera en results_queue.get()
+        self.results_queue.put((camera_ids[0], np.zeros(len(config.CLASSES)), time.time()))
+        return wall_seconds
+
+    def run(self) -> Dict[str, Any]:
+        with tempfile.TemporaryDirectory(prefix="urbansentinel_bench_") as temp_dir:
+            work_dir = self.work_dir or temp_dir
+            os.makedirs(work_dir, exist_ok=True)
+            synthetic = self._prepare_assets(work_dir)
+
+            print(f"[Benchmark] {self.num_cameras} cámaras x {self.frames_per_camera} frames "
+                  f"({'activos sintéticos' if synthetic else 'activos reales'})...")
+            wall_seconds = asyncio.run(self._run_pipeline())
+
+        return {
+            "benchmark": "pipeline",
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                "num_cameras": self.num_cameras,
+                "frames_per_camera": self.frames_per_camera,
+                "clients_per_camera": self.clients_per_camera,
+                "max_batch_size": config.MAX_BATCH_SIZE,
+                "batch_timeout_seconds": config.BATCH_TIMEOUT_SECONDS,
+                "uint8_clip_transport": config.UINT8_CLIP_TRANSPORT,
+                "synthetic_assets": synthetic,
+                "violence_model": os.path.basename(self.violence_model_path),
+                "person_model": os.path.basename(self.person_model_path),
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "numpy": np.__version__,
+                "opencv": cv2.__version__,
+                "onnxruntime": onnxruntime.__version__,
+            },
+            "wall_seconds": wall_seconds,
+            "peak_rss_mb": _peak_rss_mb(),
+            "results_delivered": self.manager.delivered,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            "stages": self.recorder.summary(wall_seconds),
+        }
+
+
+def save_report(report: Dict[str, Any], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_reports(
+    baseline: Dict[str, Any],
+    candidate: Dict[str, Any],
+    threshold: float = 0.10,
+    min_delta_ms: float = 0.5
+) -> List[Dict[str, Any]]:
+    # Compara dos reportes y devuelve la lista de regresiones de 'candidate':
+    #   - throughput de una etapa que BAJA más de 'threshold' (relativo),
+    #   - p50/p95/p99 que SUBEN más de 'threshold' y más de 'min_delta_ms'
+    #     (para no marcar ruido en etapas de microsegundos),
+    #   - pico de RSS que SUBE más de 'threshold'.
+    regressions = []
+
+    def check(stage: str, metric: str, old: float, new: float, higher_is_worse: bool, min_delta: float = 0.0):
+        if old is None or new is None or old <= 0:
+            return
+        change = (new - old) / old
+        worse = change > threshold if higher_is_worse else change < -threshold
+        if worse and abs(new - old) >= min_delta:
+            regressions.append({"stage": stage, "metric": metric, "baseline": old, "candidate": new, "change": change})
+
+    for stage, old_stats in baseline.get("stages", {}).items():
+        new_stats = candidate.get("stages", {}).get(stage)
+        if new_stats is None:
+            continue
+        check(stage, "throughput_per_second", old_stats["throughput_per_second"], new_stats["throughput_per_second"], False)
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            check(stage, metric, old_stats[metric], new_stats[metric], True, min_delta_ms)
+
+    check("process", "peak_rss_mb", baseline.get("peak_rss_mb"), candidate.get("peak_rss_mb"), True)
+    return regressions
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    # Tabla legible de un reporte (para la consola)
+    peak_rss = report.get("peak_rss_mb")
+    lines = [
+        f"Cámaras: {report['config']['num_cameras']} | Frames/cámara: {report['config']['frames_per_camera']} | "
+        f"Tiempo: {report['wall_seconds']:.2f}s | Lote medio: {report['mean_batch_size']:.1f} | "
+        f"Pico RSS: {f'{peak_rss:.0f} MB' if peak_rss is not None else 'n/d'}",
+        f"{'etapa':<18}{'items/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    for stage, stats in report["stages"].items():
+        lines.append(
+            f"{stage:<18}{stats['throughput_per_second']:>10.1f}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,122 @@
+import sys
+import os
+from typing import Any, Dict, List, Union
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../benchmark -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+    from services.clip_admission import ClipAdmissionBuffer
+    from services.inference_scheduler import FairClipScheduler
+except ImportError as e:
+    print(f"Error fatal en 'scheduler_benchmark.py': No se pudo importar un módulo. {e}")
+    sys.exit(1)
+
+
+# Benchmark del planificador de inferencia bajo contención.
+#
+# El reparto justo (WFQ) y el impulso de prioridad solo cambian el resultado
+# cuando hay más clips pendientes que lugares en el lote:
+#     cámaras x INFERENCE_MAX_PENDING_PER_CAMERA > MAX_BATCH_SIZE
+# (con los valores por defecto, más de 16 cámaras por proceso de inferencia).
+# Por debajo, todo clip pendiente entra en el siguiente lote con cualquier
+# planificador.
+#
+# Aquí se simula ese régimen sin modelo ni reloj: en cada ronda cada cámara
+# entrega un clip y el detector saca UN lote. Se compara "fifo" con "fair"
+# (cuántas rondas sirve a cada cámara y cuántas seguidas la deja sin servir).
+
+
+def simulate_scheduler(
+    scheduler: str,
+    num_cameras: int,
+    rounds: int,
+    batch_size: Union[int, None] = None,
+    max_pending_per_camera: Union[int, None] = None,
+    recording_cameras: int = 1,
+    priority_boost: Union[float, None] = None
+) -> Dict[str, Any]:
+    batch_size = batch_size or config.MAX_BATCH_SIZE
+    max_pending_per_camera = max_pending_per_camera or config.INFERENCE_MAX_PENDING_PER_CAMERA
+    priority_boost = config.INFERENCE_PRIORITY_BOOST if priority_boost is None else priority_boost
+
+    if scheduler == "fair":
+        admission = FairClipScheduler(max_pending_per_camera, None, priority_boost=priority_boost)
+    elif scheduler == "fifo":
+        admission = ClipAdmissionBuffer(max_pending_per_camera, None)
+    else:
+        raise ValueError(f"Planificador no válido: {scheduler}")
+
+    # Las últimas cámaras son las que graban un evento (las peor ubicadas para "fifo")
+    camera_ids = [f"cam_{i:02d}" for i in range(num_cameras)]
+    recording = camera_ids[num_cameras - recording_cameras:]
+    if scheduler == "fair":
+        for camera_id in recording:
+            admission.set_priority(camera_id, True)
+
+    served = {camera_id: 0 for camera_id in camera_ids}
+    unserved_streak = {camera_id: 0 for camera_id in camera_ids}
+    max_unserved_streak = {camera_id: 0 for camera_id in camera_ids}
+
+    for round_index in range(rounds):
+        # Hora de encolado simulada: las cámaras entregan en orden dentro de la ronda
+        for i, camera_id in enumerate(camera_ids):
+            admission.offer(camera_id, None, round_index + i * 1e-6)
+
+        batch = admission.take_batch(batch_size, timeout_seconds=0.0)
+        served_now = {camera_id for camera_id, _, _ in batch}
+        for camera_id in camera_ids:
+            if camera_id in served_now:
+                served[camera_id] += 1
+                unserved_streak[camera_id] = 0
+            else:
+                unserved_streak[camera_id] += 1
+                max_unserved_streak[camera_id] = max(max_unserved_streak[camera_id], unserved_streak[camera_id])
+
+    def summarize(cameras: List[str]) -> Dict[str, float]:
+        if not cameras:
+            return {"min_share": 0.0, "mean_share": 0.0, "max_unserved_rounds": 0}
+        shares = [served[camera_id] / rounds for camera_id in cameras]
+        return {
+            "min_share": min(shares),
+            "mean_share": sum(shares) / len(shares),
+            "max_unserved_rounds": max(max_unserved_streak[camera_id] for camera_id in cameras),
+        }
+
+    return {
+        "scheduler": scheduler,
+        "config": {
+            "num_cameras": num_cameras,
+            "rounds": rounds,
+            "batch_size": batch_size,
+            "max_pending_per_camera": max_pending_per_camera,
+            "recording_cameras": recording_cameras,
+            "priority_boost": priority_boost,
+        },
+        "contended": num_cameras * max_pending_per_camera > batch_size,
+        "recording": summarize(recording),
+        "others": summarize([camera_id for camera_id in camera_ids if camera_id not in recording]),
+        "served": served,
+    }
+
+
+def format_scheduler_report(reports: List[Dict[str, Any]]) -> str:
+    # Tabla legible (una fila por planificador y grupo de cámaras)
+    first = reports[0]["config"]
+    lines = [
+        f"Cámaras: {first['num_cameras']} ({first['recording_cameras']} grabando) | Lote: {first['batch_size']} | "
+        f"Pendientes/cámara: {first['max_pending_per_camera']} | Rondas: {first['rounds']} | "
+        f"Contención: {'sí' if reports[0]['contended'] else 'no (todos los clips entran en cada lote)'}",
+        f"{'planificador':<14}{'cámaras':<12}{'% mín':>8}{'% medio':>9}{'rondas sin servir':>19}",
+    ]
+    for report in reports:
+        for group in ("recording", "others"):
+            stats = report[group]
+            lines.append(
+                f"{report['scheduler']:<14}{'grabando' if group == 'recording' else 'resto':<12}"
+                f"{stats['min_share']:>8.0%}{stats['mean_share']:>9.0%}{stats['max_unserved_rounds']:>19}"
+            )
+    return "\n".join(lines)
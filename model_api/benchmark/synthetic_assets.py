@@ -0,0 +1,122 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../benchmark -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'synthetic_assets.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+# 'onnx' solo hace falta para generar los modelos sintéticos (no para la app)
+try:
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+except ImportError:
+    onnx = None
+
+
+# Modelos y videos sintéticos para el benchmark.
+# Sustituyen a 'swin3d_t.onnx' y 'yolov8n.onnx' con grafos mínimos que tienen
+# las MISMAS entradas y salidas, así el pipeline completo se puede medir en
+# una máquina solo-CPU sin ningún asset. Miden el costo del pipeline (lectura,
+# preprocesado, colas, lotes, fan-out), no el del modelo real: para eso se
+# pasan las rutas de los modelos reales al benchmark.
+
+def _require_onnx():
+    if onnx is None:
+        raise RuntimeError("Se necesita el paquete 'onnx' para generar modelos sintéticos (pip install onnx).")
+
+
+def _save_model(graph, path: str):
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8 # Compatible con versiones antiguas de onnxruntime
+    onnx.save(model, path)
+
+
+def build_synthetic_violence_model(path: str) -> str:
+    # Modelo con la interfaz de Swin3D: (N, 3, 32, 224, 224) -> logits (N, 3).
+    # Promedia cada canal y lo proyecta a las clases (lote dinámico).
+    _require_onnx()
+    num_classes = len(config.CLASSES)
+    clip_shape = [3, config.CLIP_LEN, config.INPUT_CROP_SIZE, config.INPUT_CROP_SIZE]
+
+    clips = helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N"] + clip_shape)
+    logits = helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["N", num_classes])
+    weights = numpy_helper.from_array(np.full((3, num_classes), 0.5, dtype=np.float32), "W")
+
+    nodes = [
+        helper.make_node("ReduceMean", ["input"], ["channel_mean"], axes=[2, 3, 4], keepdims=0),
+        helper.make_node("MatMul", ["channel_mean", "W"], ["logits"]),
+    ]
+    _save_model(helper.make_graph(nodes, "synthetic_swin3d", [clips], [logits], [weights]), path)
+    return path
+
+
+def build_synthetic_person_model(path: str, num_persons: int = 3) -> str:
+    # Modelo con la interfaz de YOLOv8n (imgsz=320): (N, 3, 320, 320) -> (N, 84, 2100).
+    # Siempre "detecta" 'num_persons' personas separadas (sin solaparse en NMS).
+    # Con 2 o más, todos los clips pasan al detector de violencia.
+    _require_onnx()
+    images = helper.make_tensor_value_info("images", TensorProto.FLOAT, ["N", 3, 320, 320])
+    output = helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["N", 84, 2100])
+
+    detections = np.zeros((1, 84, 2100), dtype=np.float32)
+    for i in range(num_persons):
+        detections[0, 0:4, i] = [30 + 60 * (i % 5), 60 + 100 * (i // 5), 40, 80] # cx, cy, w, h
+        detections[0, 4, i] = 0.9 # Confianza de la clase 'person'
+
+    # La salida depende de la entrada (Mul por 0) para que ORT no la pliegue
+    nodes = [
+        helper.make_node("ReduceMean", ["images"], ["image_mean"], axes=[1, 2, 3], keepdims=1),
+        helper.make_node("Reshape", ["image_mean", "shape"], ["image_mean_3d"]),
+        helper.make_node("Mul", ["image_mean_3d", "zero"], ["zeros"]),
+        helper.make_node("Add", ["zeros", "detections"], ["output0"]),
+    ]
+    initializers = [
+        numpy_helper.from_array(np.array([-1, 1, 1], dtype=np.int64), "shape"),
+        numpy_helper.from_array(np.zeros((1, 1, 1), dtype=np.float32), "zero"),
+        numpy_helper.from_array(detections, "detections"),
+    ]
+    _save_model(helper.make_graph(nodes, "synthetic_yolov8n", [images], [output], initializers), path)
+    return path
+
+
+def generate_synthetic_videos(
+    output_dir: str,
+    num_videos: int,
+    num_frames: int = 150,
+    size: tuple = (640, 360),
+    fps: float = 30.0
+) -> list:
+    # Escribe 'num_videos' videos .mp4 con contenido en movimiento (un degradado
+    # que se desplaza y un rectángulo) para que el decodificador trabaje de verdad.
+    os.makedirs(output_dir, exist_ok=True)
+    width, height = size
+    gradient = np.tile(np.linspace(0, 255, width, dtype=np.float32), (height, 1))
+
+    paths = []
+    for video_index in range(num_videos):
+        path = os.path.join(output_dir, f"synthetic_{video_index:02d}.mp4")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        if not writer.isOpened():
+            raise RuntimeError(f"No se pudo crear el video sintético: {path}")
+
+        for frame_index in range(num_frames):
+            shift = (frame_index * 4 + video_index * 37) % width
+            channel = np.roll(gradient, shift, axis=1).astype(np.uint8)
+            frame = cv2.merge([channel, np.flipud(channel), np.full_like(channel, 64 + video_index * 16)])
+            x = (frame_index * 3) % max(1, width - 80)
+            cv2.rectangle(frame, (x, height // 3), (x + 80, height // 3 + 120), (255, 255, 255), -1)
+            writer.write(frame)
+
+        writer.release()
+        paths.append(path)
+
+    return paths
@@ -13,6 +13,8 @@ ONNX_MODEL_PATH = os.path.join(BASE_DIR, "onnx_model", "swin3d_t.onnx")
 SAVE_CLIP_PATH = os.path.join(BASE_DIR, "data", "clips_guardados")
 # Ruta para guardar los logs JSON de eventos detectados
 SAVE_LOG_PATH = os.path.join(BASE_DIR, "data", "logs_eventos")
+# Catálogo SQLite de eventos grabados (consultado por los endpoints /events)
+EVENT_CATALOG_PATH = os.path.join(BASE_DIR, "data", "event_catalog.db")
 
 
 # --- Parámetros del Modelo ---
@@ -44,18 +46,219 @@ NORM_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
 # Cada cuántos frames se ejecutará una predicción (ventana deslizante)
 STRIDE = 16
 
+# Pre-filtro de personas (YOLOv8n): aplicar NMS antes de contar.
+# Sin NMS, una misma persona puede sumar varias propuestas al conteo.
+PERSON_NMS_ENABLED = False
+PERSON_NMS_IOU_THRESHOLD = 0.45
+
+# Dónde se ejecuta el pre-filtro de personas:
+#   "local"   -> cada 'camera_worker' carga su propia sesión YOLO (CPU).
+#   "service" -> un único 'person_detection_service' recibe los frames de todas
+#                las cámaras y los ejecuta en lotes (B, 3, 320, 320).
+PERSON_DETECTION_MODE = "local"
+PERSON_MAX_BATCH_SIZE = 32
+PERSON_BATCH_TIMEOUT_SECONDS = 0.02  # (20 ms)
+# Tiempo máximo que un worker espera la respuesta del servicio
+PERSON_SERVICE_RESPONSE_TIMEOUT_SECONDS = 2.0
+
+# FileReader: decodificar en un hilo de fondo y abrir el siguiente video
+# por adelantado (evita pausas del worker al cambiar de archivo).
+FILE_READER_PREFETCH = True
+# Tamaño de la cola de frames ya decodificados (acota la memoria usada)
+FILE_READER_PREFETCH_FRAMES = 64
+
+# RtspReader (cámaras en vivo): reconexión con espera exponencial
+RTSP_RECONNECT_INITIAL_DELAY_SECONDS = 1.0
+RTSP_RECONNECT_MAX_DELAY_SECONDS = 30.0
+# Reintentos antes de dar el stream por terminado (None = reintentar siempre)
+RTSP_MAX_RECONNECT_ATTEMPTS = None
+# Tiempo máximo que read() espera un frame nuevo (None = esperar siempre,
+# incluso durante una reconexión)
+RTSP_READ_TIMEOUT_SECONDS = None
+# Medición de FPS reales: ventana de frames y espera máxima en get_fps()
+RTSP_FPS_WINDOW_FRAMES = 120
+RTSP_FPS_MIN_SAMPLES = 30
+RTSP_FPS_MEASURE_SECONDS = 3.0
+# Frenar la lectura a los FPS nominales de la fuente. Solo para usar un archivo
+# local como cámara "rtsp" de prueba (un archivo se decodifica mucho más rápido
+# que en tiempo real); con una cámara en vivo debe quedar en False.
+RTSP_REALTIME_PACING = False
+
 # Tiempo (en segundos) de video que se guarda ANTES de que se detecte un evento
 PRE_ROLL_SECONDS = 5
+# Pre-rollo comprimido: el worker mantiene los últimos PRE_ROLL_SECONDS como
+# segmentos de frames JPEG (codificados en un hilo de fondo) en lugar de frames
+# crudos. Ocupa ~10-20 veces menos memoria y START_RECORDING no escribe nada de
+# forma síncrona. False = frames crudos en el búfer circular (comportamiento anterior).
+PRE_ROLL_ENCODED = True
+PRE_ROLL_JPEG_QUALITY = 85
+# Frames por segmento (el pre-rollo se descarta de a un segmento entero)
+PRE_ROLL_SEGMENT_FRAMES = 15
+# Frames pendientes de codificar; si el codificador va atrasado se omiten frames
+PRE_ROLL_ENCODER_QUEUE_FRAMES = 8
+
+# --- Escritura de Eventos (RecorderWriterPool) ---
+# Hilos de escritura compartidos por todas las grabaciones de un worker.
+# Escriben a toda velocidad (sin sincronizarse a los FPS de la fuente).
+RECORDER_WRITER_THREADS = 1
+# Frames en cola por grabación (cota de memoria: ~6 MB por frame a 1080p)
+RECORDER_QUEUE_MAX_FRAMES = 60
+# Qué hacer si la cola de una grabación se llena:
+# "drop_oldest" = descartar el frame más antiguo en cola; "drop_newest" = descartar el nuevo
+RECORDER_OVERFLOW_POLICY = "drop_oldest"
+# Frames que escribe un hilo de una grabación antes de pasar a la siguiente
+RECORDER_WRITE_BATCH_FRAMES = 8
+# Espera máxima al cerrar el worker para terminar de escribir las grabaciones pendientes
+RECORDER_SHUTDOWN_TIMEOUT_SECONDS = 10.0
+# Log de predicciones por evento ('<evento>.jsonl', ver services/event_journal.py):
+# se vuelca a disco cada N registros o cada N segundos (lo que ocurra antes)
+EVENT_LOG_FLUSH_RECORDS = 30
+EVENT_LOG_FLUSH_SECONDS = 1.0
+# True = además 'os.fsync' en cada volcado (más seguro ante cortes de luz, más lento)
+EVENT_LOG_FSYNC = False
+
+# --- Catálogo de Eventos (services/event_catalog.py) ---
+# True = cada evento terminado se indexa en EVENT_CATALOG_PATH
+EVENT_CATALOG_ENABLED = True
+# Espera máxima por el lock de escritura de SQLite (varios workers escriben a la vez)
+EVENT_CATALOG_BUSY_TIMEOUT_SECONDS = 5.0
+# Tamaño de página por defecto y máximo de GET /events
+EVENT_CATALOG_PAGE_SIZE = 50
+EVENT_CATALOG_MAX_PAGE_SIZE = 500
+
+# --- Lectura de Resultados en la API (api/event_manager.py) ---
+# Un hilo lector vacía la 'results_queue' en ráfagas de hasta N resultados
+RESULTS_DRAIN_MAX_BATCH = 256
+# Ráfagas pendientes de procesar; si se llenan, el hilo lector espera
+RESULTS_READER_MAX_PENDING_BATCHES = 4
+
+# --- Clientes WebSocket (api/connection_manager.py) ---
+# Mensajes por cámara en la cola de salida de cada cliente (un cliente de
+# '/ws' suscrito a 64 cámaras puede tener hasta 64 x N pendientes)
+WS_CLIENT_QUEUE_MESSAGES = 32
+# Con la cola llena: "drop_oldest" (descartar el más viejo) o "disconnect" (cerrar la conexión)
+WS_SLOW_CLIENT_POLICY = "drop_oldest"
+# Un envío que tarda más que esto desconecta al cliente
+WS_SEND_TIMEOUT_SECONDS = 5.0
+# Formato por defecto si el cliente no pide uno ('?format='): "json" o "binary"
+# (ver api/ws_protocol.py)
+WS_DEFAULT_FORMAT = "json"
+# Envíos por segundo por defecto si el cliente no pide 'max_rate' (None = sin límite)
+WS_DEFAULT_MAX_RATE = None
+# Endpoint multiplexado ('/ws?cameras=...'): cada cuántos segundos se envía un
+# mensaje con los resultados pendientes de todas las cámaras suscritas
+WS_MULTIPLEX_INTERVAL_SECONDS = 0.25
+# Al conectarse (o suscribirse a una cámara nueva), el cliente recibe primero
+# el historial de los últimos N segundos (mensaje "snapshot"). 0 = desactivado.
+# El cliente puede pedir otro valor con '?snapshot=N'.
+WS_SNAPSHOT_SECONDS = 60.0
+
+# --- Historial Reciente en Memoria (GET /timeseries, api/timeseries_store.py) ---
+# Resultados guardados por cámara (anillo de tamaño fijo). Con un resultado
+# cada ~0.5s, 2048 son ~17 minutos (~32 KB por cámara)
+TIMESERIES_CAPACITY = 2048
+# Máximo de intervalos por respuesta (si no alcanza, se agranda la resolución)
+TIMESERIES_MAX_POINTS = 1000
+
+# --- Streaming de Clips (GET /clips/{filename}, api/clip_streaming.py) ---
+# Tamaño de cada bloque leído del disco cuando no hay sendfile (memoria por descarga)
+CLIP_STREAM_CHUNK_BYTES = 256 * 1024
+# Descargas simultáneas como máximo; las demás esperan hasta el timeout y luego reciben 503
+CLIP_STREAM_MAX_CONCURRENT = 8
+CLIP_STREAM_ACQUIRE_TIMEOUT_SECONDS = 2.0
+# Un clip en grabación no es reproducible (mp4v escribe el índice 'moov' al cerrar el
+# archivo): se responde 409 con este 'Retry-After' hasta que el evento termina
+CLIP_INCOMPLETE_RETRY_AFTER_SECONDS = 5
+
 # Umbral de probabilidad (ej. 0.7 = 70%) para disparar una alerta/grabación
 ALERT_THRESHOLD = 0.7
 
 
 # --- Parámetros del Servicio de Inferencia ---
 
-# (Actualmente no se usa 'batching' porque el modelo no lo soporta)
-# (Se mantiene para futura optimización del modelo)
+# Micro-batching entre cámaras: el servicio junta clips de varias cámaras
+# hasta llenar el lote o agotar el timeout, y los ejecuta en una sola llamada.
 MAX_BATCH_SIZE = 16
 BATCH_TIMEOUT_SECONDS = 0.1  # (100 ms)
+# Tamaño de lote fijo del modelo ONNX exportado.
+# None = autodetectar desde el modelo (un export dinámico se ejecuta de una vez;
+# uno de lote fijo se trocea y se rellena hasta ese tamaño).
+MODEL_FIXED_BATCH_SIZE = None
+
+# Transporte de clips en uint8 (sin normalizar) en lugar de float32.
+# Los clips pesan 4 veces menos (~4.8 MB) y el escalado + normalización de
+# ImageNet se hace en el proceso de inferencia ('ViolenceDetector'), con el
+# mismo resultado numérico.
+UINT8_CLIP_TRANSPORT = False
+
+# Transporte de clips por memoria compartida (SharedClipPool).
+# Los workers escriben el clip en un slot y solo envían su índice por la cola.
+# Cada slot ocupa un clip completo (~19 MB en float32, ~4.8 MB en uint8).
+SHARED_MEMORY_TRANSPORT = True
+SHARED_CLIP_POOL_SLOTS = 32
+# Tiempo máximo que un worker espera por un slot libre antes de descartar el clip
+SHARED_CLIP_ACQUIRE_TIMEOUT_SECONDS = 0.05
+
+# Control de admisión (evita que un nodo sobrecargado acumule clips sin límite).
+# Tamaño máximo de las colas entre procesos (un put con la cola llena descarta el item)
+INFERENCE_QUEUE_MAXSIZE = 64
+RESULTS_QUEUE_MAXSIZE = 1024
+# Clips pendientes por cámara en el servicio de inferencia. Un clip nuevo
+# reemplaza al más antiguo de su cámara.
+INFERENCE_MAX_PENDING_PER_CAMERA = 1
+# Antigüedad máxima (segundos) de un clip para pasar por el modelo (None = sin límite)
+INFERENCE_MAX_CLIP_AGE_SECONDS = 2.0
+# Fin anticipado de la espera de un lote (BATCH_TIMEOUT_SECONDS es el máximo):
+# se envía en cuanto todas las cámaras activas (con un clip en los últimos
+# INFERENCE_ACTIVE_CAMERA_SECONDS) tienen su clip pendiente, o si no llega
+# ningún clip nuevo en INFERENCE_BATCH_QUIET_SECONDS.
+INFERENCE_ACTIVE_CAMERA_SECONDS = 2.0
+INFERENCE_BATCH_QUIET_SECONDS = 0.01  # (10 ms)
+# Planificación entre cámaras:
+#   "fair" -> Weighted Fair Queueing por cámara + prioridad a las que graban un evento.
+#   "fifo" -> los clips más antiguos primero, sin importar la cámara.
+# Solo se diferencian si cámaras x INFERENCE_MAX_PENDING_PER_CAMERA > MAX_BATCH_SIZE
+# (si no, todos los clips pendientes entran en cada lote). Ver
+# 'python run_benchmark.py scheduler'.
+INFERENCE_SCHEDULER = "fair"
+# Peso relativo por cámara (las que no aparecen tienen peso 1.0)
+INFERENCE_CAMERA_WEIGHTS = {}
+# Multiplicador de peso para las cámaras en estado "RECORDING"
+INFERENCE_PRIORITY_BOOST = 4.0
+# Ventana (segundos) para calcular la tasa de servicio por cámara
+INFERENCE_RATE_WINDOW_SECONDS = 60
+# Cada cuánto se imprimen los contadores de admisión por cámara
+INFERENCE_STATS_INTERVAL_SECONDS = 30
+
+# Pool de procesos de inferencia (útil en servidores solo-CPU con muchos núcleos,
+# donde una sola sesión de ONNX Runtime no aprovecha todos los núcleos).
+# Con más de 1, un despachador en 'run_app.py' reparte los clips entre ellos.
+INFERENCE_NUM_WORKERS = 1
+# Reparto de cámaras entre los procesos. En ambos casos cada cámara queda fija
+# en un proceso (así se conservan el orden de sus resultados, el "último clip
+# reemplaza al anterior" y la planificación por cámara); solo cambia cómo se
+# elige el proceso la primera vez que se ve la cámara:
+#   "least_loaded"    -> el proceso con menos clips en curso en ese momento.
+#   "camera_affinity" -> el proceso con menos cámaras asignadas.
+INFERENCE_ROUTING = "least_loaded"
+# Hilos de ONNX Runtime por proceso. None = automático: con un solo proceso
+# el valor por defecto de ORT; con varios, los núcleos repartidos entre ellos.
+INFERENCE_INTRA_OP_THREADS = None
+INFERENCE_INTER_OP_THREADS = None
+
+# --- Puntuación offline (run_offline_scoring.py) ---
+# Procesos del pool (cada uno con su propia sesión ONNX; los núcleos se reparten)
+OFFLINE_NUM_WORKERS = 2
+# Ventanas por llamada al modelo dentro de cada video
+OFFLINE_BATCH_SIZE = 8
+
+# --- Métricas (endpoint /metrics, formato Prometheus) ---
+METRICS_ENABLED = True
+# Cada cuánto envían los workers y el 'inference_service' sus métricas a la API
+METRICS_FLUSH_INTERVAL_SECONDS = 5.0
+METRICS_QUEUE_MAXSIZE = 256
+# Límites (segundos) de los buckets de los histogramas de latencia
+METRICS_LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
 
 # Lista de proveedores de ONNX Runtime, en orden de prioridad
 INFERENCE_PROVIDERS = [
@@ -0,0 +1,63 @@
+from onnxruntime.capi.onnxruntime_pybind11_state import Fail, RuntimeException
+import numpy as np
+
+
+def is_fixed_batch_error(error: Exception) -> bool:
+    # True si ONNX Runtime falló en un nodo 'Reshape' por la forma de la entrada
+    # (ej. "The input tensor cannot be reshaped to the requested shape"). Es el
+    # error de un lote "quemado" en el export; lo lanza como FAIL, no como
+    # INVALID_ARGUMENT (que es una entrada con dimensiones incorrectas).
+    if not isinstance(error, (Fail, RuntimeException)):
+        return False
+    message = str(error)
+    return "Reshape node" in message or "cannot be reshaped" in message
+
+
+class FixedBatchRunner:
+    # Ejecución por lotes compartida por 'ViolenceDetector' y 'PersonDetector'.
+    # La clase que la usa define 'session', 'input_name', 'output_name',
+    # 'fixed_batch_size' (None = lote dinámico) y 'log_name' (prefijo de los mensajes).
+
+    def _run_fixed_batches(self, batch: np.ndarray) -> np.ndarray:
+        # Ejecuta un lote de tamaño arbitrario sobre un modelo de lote fijo.
+        # Parte el lote en trozos del tamaño compilado y rellena (padding)
+        # el último trozo con ceros. Las filas de relleno se descartan.
+        batch_size = self.fixed_batch_size
+        num_items = batch.shape[0]
+        output_chunks = []
+
+        for start in range(0, num_items, batch_size):
+            chunk = batch[start:start + batch_size]
+            real_size = chunk.shape[0]
+
+            if real_size < batch_size:
+                padding = np.zeros((batch_size - real_size,) + chunk.shape[1:], dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, padding], axis=0)
+
+            output = self.session.run([self.output_name], {self.input_name: chunk})[0]
+            output_chunks.append(output[:real_size])
+
+        return np.concatenate(output_chunks, axis=0)
+
+    def _run_batch(self, batch: np.ndarray) -> np.ndarray:
+        # Ejecuta el lote completo (o troceado, si el modelo es de lote fijo).
+        if self.fixed_batch_size is not None:
+            return self._run_fixed_batches(batch)
+
+        try:
+            return self.session.run([self.output_name], {self.input_name: batch})[0]
+        except Exception as e:
+            # Algunos exports declaran el lote como dinámico pero tienen
+            # nodos 'Reshape' con N=1 "quemado". Solo ese error (en un lote
+            # > 1) pasa a modo de lote fijo (1); cualquier otro (ej. memoria,
+            # proveedor, entrada inválida) se propaga sin tocar el modo.
+            if batch.shape[0] == 1 or not is_fixed_batch_error(e):
+                raise
+            print(f"[{self.log_name}] ADVERTENCIA: El modelo no acepta lotes dinámicos ({e}). Usando lotes de 1.")
+            self.fixed_batch_size = 1
+            try:
+                return self._run_fixed_batches(batch)
+            except Exception:
+                # Con lotes de 1 tampoco funciona: el problema no era el lote
+                self.fixed_batch_size = None
+                raise
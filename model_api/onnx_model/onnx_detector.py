@@ -12,27 +12,49 @@ sys.path.append(model_api_root)
 try:
     # Importamos el módulo (archivo) config.py
     from config import config
+    from processing.video_processor import normalize_clip_batch
+    from onnx_model.batch_runner import FixedBatchRunner
 except ImportError as e:
-    print(f"Error fatal en 'detector.py': No se pudo importar 'config'. {e}")
+    print(f"Error fatal en 'detector.py': No se pudo importar un módulo. {e}")
     sys.exit(1)
 
 
-class ViolenceDetector:
+class ViolenceDetector(FixedBatchRunner):
     # Clase contenedora para el modelo de inferencia ONNX
     # Implementa "Lazy Loading" para ser segura con multiprocessing
+    # (la ejecución por lotes y el modo de lote fijo vienen de 'FixedBatchRunner')
+    log_name = "Detector"
 
-    def __init__(self):
+    def __init__(
+        self,
+        intra_op_num_threads: int | None = None,
+        inter_op_num_threads: int | None = None,
+        model_path: str | None = None
+    ):
         # Constructor (Lazy Loading). No carga el modelo, solo prepara la config.
+        # 'intra_op_num_threads' / 'inter_op_num_threads' limitan los hilos de
+        # ONNX Runtime (None = valor por defecto: todos los núcleos). Sirven
+        # para repartir los núcleos entre varios procesos de inferencia.
+        # 'model_path' = None usa config.ONNX_MODEL_PATH (otro valor: ej. el
+        # modelo sintético del benchmark).
         self.session: onnxruntime.InferenceSession | None = None
         self.lock = threading.Lock() # Asegura que el modelo se cargue solo una vez
   
         # Carga la configuración desde el archivo config.py
-        self.model_path = config.ONNX_MODEL_PATH
+        self.model_path = model_path or config.ONNX_MODEL_PATH
         self.providers = config.INFERENCE_PROVIDERS
+
+        # Tamaño de lote fijo del modelo exportado (None = lote dinámico).
+        # Si config no lo fuerza, se detecta al cargar el modelo.
+        self.fixed_batch_size: int | None = config.MODEL_FIXED_BATCH_SIZE
         
         # Prepara las opciones de la sesión
         self.options = onnxruntime.SessionOptions()
         self.options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_num_threads is not None:
+            self.options.intra_op_num_threads = intra_op_num_threads
+        if inter_op_num_threads is not None:
+            self.options.inter_op_num_threads = inter_op_num_threads
 
     def _sigmoid(self, x: np.ndarray) -> np.ndarray:
         # Función helper para aplicar sigmoid (el modelo devuelve logits)
@@ -49,15 +71,23 @@ class ViolenceDetector:
         )
         self.input_name = self.session.get_inputs()[0].name
         self.output_name = self.session.get_outputs()[0].name
+
+        # Detectar si el modelo se exportó con un tamaño de lote fijo.
+        # (Un export dinámico declara la dimensión 0 como texto, ej. 'N' o 'batch_size')
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        if self.fixed_batch_size is None and isinstance(batch_dim, int) and batch_dim > 0:
+            self.fixed_batch_size = batch_dim
         
         # Imprime el proveedor que realmente se está usando (ej. CUDAExecutionProvider)
         print(f"[Detector] Modelo cargado y listo en: {self.session.get_providers()[0]}")
         print(f"[Detector] Nombre de Input: {self.input_name} | Nombre de Output: {self.output_name}")
+        print(f"[Detector] Tamaño de lote del modelo: {self.fixed_batch_size or 'dinámico'}")
 
     def predict_batch(self, preprocessed_batch: np.ndarray) -> np.ndarray:
         # Ejecuta la inferencia en un LOTE de clips preprocesados.
         # Args:
         #     preprocessed_batch (np.array): Lote de clips (N, 3, 32, 224, 224).
+        #         float32 ya normalizado, o uint8 sin normalizar (UINT8_CLIP_TRANSPORT).
         # Returns:
         #     np.array: Lote de probabilidades (N, 3).
         
@@ -69,14 +99,15 @@ class ViolenceDetector:
                 self._load_model()
         # --- Fin de Carga Perezosa ---
 
-        # 1. Preparar el diccionario de entrada
-        inputs = {self.input_name: preprocessed_batch}
+        # 0. Clips en uint8: escalar y normalizar aquí (vectorizado, todo el lote)
+        if preprocessed_batch.dtype == np.uint8:
+            preprocessed_batch = normalize_clip_batch(preprocessed_batch)
 
-        # 2. Ejecutar la inferencia
-        logits_batch = self.session.run([self.output_name], inputs)[0]
+        # 1. Ejecutar la inferencia (troceando si el modelo es de lote fijo)
+        logits_batch = self._run_batch(preprocessed_batch)
 
-        # 3. Aplicar sigmoid a todo el lote de logits
+        # 2. Aplicar sigmoid a todo el lote de logits
         probabilities_batch = self._sigmoid(logits_batch)
 
-        # 4. Devolver el array 2D completo de probabilidades (N, 3)
+        # 3. Devolver el array 2D completo de probabilidades (N, 3)
         return probabilities_batch
\ No newline at end of file
@@ -13,25 +13,30 @@ sys.path.append(model_api_root)
 try:
     # Importamos el módulo (archivo) config.py
     from config import config
+    from onnx_model.batch_runner import FixedBatchRunner
 except ImportError as e:
-    print(f"Error fatal en 'onnx_person_detector.py': No se pudo importar 'config'. {e}")
+    print(f"Error fatal en 'onnx_person_detector.py': No se pudo importar un módulo. {e}")
     sys.exit(1)
 
 
-class PersonDetector:
+class PersonDetector(FixedBatchRunner):
     """
     Clase contenedora para el modelo de detección de personas (YOLOv8n).
     Implementa "Lazy Loading" para coherencia de estilo y carga el modelo
     forzosamente en CPU para no competir con el 'inference_service' de la GPU.
+    La ejecución por lotes y el modo de lote fijo vienen de 'FixedBatchRunner'.
     """
+    log_name = "PersonDetector"
 
-    def __init__(self):
+    def __init__(self, model_path: str | None = None):
         # Constructor (Lazy Loading). No carga el modelo, solo prepara la config.
+        # 'model_path' = None usa el YOLOv8n del proyecto (otro valor: ej. el
+        # modelo sintético del benchmark).
         self.session: onnxruntime.InferenceSession | None = None
         self.lock = threading.Lock() # Asegura que el modelo se cargue solo una vez
   
         # Construimos la ruta al modelo YOLOv8n
-        self.model_path = os.path.join(
+        self.model_path = model_path or os.path.join(
             config.BASE_DIR, 
             "onnx_model", 
             "person_detector", 
@@ -53,9 +58,18 @@ class PersonDetector:
         self.person_class_id = 0  # 'person' es la clase 0 en el dataset COCO
         self.confidence_threshold = 0.4 # Umbral para contar una persona
 
+        # NMS opcional (ver config.py)
+        self.nms_enabled = config.PERSON_NMS_ENABLED
+        self.nms_iou_threshold = config.PERSON_NMS_IOU_THRESHOLD
+
+        # Tamaño de lote fijo del modelo exportado (None = lote dinámico).
+        # Se detecta al cargar el modelo (un export típico de YOLO usa N=1).
+        self.fixed_batch_size: int | None = None
+
     def _load_model(self):
         # Método privado para cargar el modelo. Se llama solo una vez.
-        # Esto se ejecutará DENTRO de cada proceso 'camera_worker'.
+        # Esto se ejecutará DENTRO de cada proceso 'camera_worker'
+        # (o dentro del 'person_detection_service' en modo centralizado).
         print(f"[PersonDetector] Cargando modelo ONNX desde: {self.model_path}...")
         
         if not os.path.exists(self.model_path):
@@ -69,12 +83,21 @@ class PersonDetector:
         )
         self.input_name = self.session.get_inputs()[0].name
         self.output_name = self.session.get_outputs()[0].name
+
+        # Detectar si el modelo se exportó con un tamaño de lote fijo
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        if isinstance(batch_dim, int) and batch_dim > 0:
+            self.fixed_batch_size = batch_dim
         
         # Imprime el proveedor que realmente se está usando (debe ser CPUExecutionProvider)
         print(f"[PersonDetector] Modelo cargado y listo en: {self.session.get_providers()[0]}")
 
-    def _preprocess(self, frame: np.ndarray) -> np.ndarray:
-        # Preprocesa un frame de OpenCV (H, W, C) para YOLOv8 (1, 3, 320, 320)
+    def letterbox(self, frame: np.ndarray) -> tuple[np.ndarray, tuple[float, int, int]]:
+        # Redimensiona un frame de OpenCV (H, W, C) a 320x320 con letterboxing (RGB, uint8).
+        # Devuelve el canvas y los parámetros (scale, left_pad, top_pad) para
+        # poder devolver las cajas a las coordenadas del frame original.
+        # Es público porque el cliente del servicio centralizado lo ejecuta
+        # en el worker y solo envía el canvas (uint8, ~300 KB).
         
         # 1. Redimensionar manteniendo el aspect ratio (con letterboxing)
         img_h, img_w, _ = frame.shape
@@ -92,49 +115,115 @@ class PersonDetector:
         
         # 3. Convertir BGR (OpenCV) a RGB
         canvas_rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
-        
-        # 4. Normalizar (0-255 -> 0.0-1.0) y transponer (HWC -> CHW)
-        input_tensor = canvas_rgb.astype(np.float32) / 255.0
-        input_tensor = input_tensor.transpose(2, 0, 1)
-        
-        # 5. Añadir dimensión de batch (1, C, H, W)
-        input_tensor = np.expand_dims(input_tensor, axis=0)
-        return input_tensor
+        return canvas_rgb, (scale, left_pad, top_pad)
+
+    def _to_tensor(self, canvases: np.ndarray) -> np.ndarray:
+        # Convierte un lote de canvases (B, H, W, C) uint8 en el tensor de YOLOv8 (B, 3, H, W).
+        # Normalizar (0-255 -> 0.0-1.0) y transponer (BHWC -> BCHW)
+        input_tensor = canvases.astype(np.float32) / 255.0
+        return np.ascontiguousarray(input_tensor.transpose(0, 3, 1, 2))
+
+    def _nms(self, boxes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        # Non-Max Suppression vectorizada. 'boxes' en formato (x1, y1, x2, y2).
+        # Devuelve los índices de las cajas que sobreviven, de mayor a menor score.
+        # En cada paso se calcula el IoU de la mejor caja contra TODAS las
+        # restantes a la vez (el bucle solo itera sobre las cajas conservadas).
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        order = np.argsort(-scores, kind="stable")
+        keep = []
+
+        while order.size > 0:
+            best = order[0]
+            keep.append(best)
+            rest = order[1:]
+
+            inter_w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+            inter_h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+            inter = inter_w * inter_h
+            iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-9)
 
-    def _postprocess(self, output: np.ndarray) -> int:
-        # Procesa la salida de YOLO (1, 84, 2100) y devuelve el conteo de personas.
+            order = rest[iou <= self.nms_iou_threshold]
+
+        return np.array(keep, dtype=np.int64)
+
+    def _postprocess(
+        self,
+        output: np.ndarray,
+        letterbox: tuple[float, int, int],
+        frame_shape: tuple[int, ...]
+    ) -> tuple[int, np.ndarray]:
+        # Procesa la salida de YOLO para UNA imagen (84, 2100).
         # 84 = 4 (bbox) + 80 (clases)
         # 2100 = propuestas de detección para 320x320
+        # Devuelve (conteo de personas, cajas (K, 5) -> x1, y1, x2, y2, score)
+        # con las cajas en coordenadas del frame original.
         
-        # Transponer la salida a (1, 2100, 84) para iterar fácilmente
-        output = output.transpose(0, 2, 1)
+        # 1. Transponer a (2100, 84): una fila por propuesta
+        proposals = output.T
+        class_scores = proposals[:, 4:]
         
-        person_count = 0
+        # 2. Clase ganadora y su score, para todas las propuestas a la vez
+        class_ids = np.argmax(class_scores, axis=1)
+        confidences = np.take_along_axis(class_scores, class_ids[:, np.newaxis], axis=1)[:, 0]
         
-        # Iterar sobre las 2100 propuestas de detección
-        for det in output[0]:
-            # det[0:4] son BBox (cx, cy, w, h)
-            # det[4:] son los 80 scores de clase
-            
-            class_scores = det[4:]
-            class_id = np.argmax(class_scores)
-            confidence = class_scores[class_id]
-            
-            # Comprobar si es una persona Y si supera nuestro umbral
-            if (confidence > self.confidence_threshold and 
-                class_id == self.person_class_id):
-                
-                person_count += 1
+        # 3. Quedarse con las personas que superan nuestro umbral
+        mask = (class_ids == self.person_class_id) & (confidences > self.confidence_threshold)
+        cx, cy, w, h = proposals[mask, :4].T
+        scores = confidences[mask]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        
+        # 4. (Opcional) NMS para no contar varias veces a la misma persona.
+        # Sin NMS es un conteo simple: para un pre-filtro de ">= 2"
+        # es más rápido y suficiente.
+        if self.nms_enabled and len(boxes) > 1:
+            keep = self._nms(boxes, scores)
+            boxes, scores = boxes[keep], scores[keep]
         
-        # Nota: Esto es un conteo simple sin NMS (Non-Max Suppression)
-        # Para un pre-filtro de ">= 2" es mucho más rápido y suficiente.
-        return person_count
+        # 5. Deshacer el letterbox (coordenadas 320x320 -> frame original)
+        scale, left_pad, top_pad = letterbox
+        boxes = (boxes - np.array([left_pad, top_pad, left_pad, top_pad], dtype=boxes.dtype)) / scale
+        img_h, img_w = frame_shape[:2]
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, img_w)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, img_h)
+        
+        detections = np.concatenate([boxes, scores[:, np.newaxis]], axis=1).astype(np.float32)
+        return len(detections), detections
 
-    def count_persons(self, frame: np.ndarray) -> int:
+    def detect_persons_batch(
+        self,
+        canvases: np.ndarray,
+        letterboxes: list,
+        frame_shapes: list
+    ) -> list[tuple[int, np.ndarray]]:
+        # Detecta personas en un LOTE de canvases ya letterboxeados (B, 320, 320, 3).
+        # Devuelve una lista de B tuplas (conteo, cajas), ver '_postprocess'.
+        # A diferencia de 'detect_persons', los errores se propagan al llamador.
+        
+        # --- Carga Perezosa (Lazy Loading) ---
+        with self.lock:
+            if self.session is None:
+                self._load_model()
+
+        # 1. Convertir el lote a tensor (B, 3, 320, 320)
+        input_tensor = self._to_tensor(canvases)
+
+        # 2. Ejecutar inferencia en CPU (troceando si el modelo es de lote fijo)
+        outputs = self._run_batch(input_tensor)
+
+        # 3. Post-procesar cada imagen del lote (84, 2100)
+        return [
+            self._postprocess(outputs[i], letterboxes[i], frame_shapes[i])
+            for i in range(len(outputs))
+        ]
+
+    def detect_persons(self, frame: np.ndarray) -> tuple[int, np.ndarray]:
         """
-        Función principal. Recibe un frame de OpenCV (BGR, HWC) y 
-        devuelve el número de personas detectadas.
+        Recibe un frame de OpenCV (BGR, HWC) y devuelve el número de
+        personas detectadas y sus cajas (K, 5): x1, y1, x2, y2, score,
+        en coordenadas del frame. Si hay un error, el conteo es -1.
         """
+        no_boxes = np.empty((0, 5), dtype=np.float32)
         
         # --- Carga Perezosa (Lazy Loading) ---
         # (Sigue el estilo de onnx_detector.py)
@@ -144,28 +233,27 @@ class PersonDetector:
                     self._load_model()
                 except Exception as e:
                     print(f"[PersonDetector] CRÍTICO: Fallo al cargar el modelo: {e}")
-                    return -1 # Devolvemos -1 para indicar un error
+                    return -1, no_boxes # Devolvemos -1 para indicar un error
         
         if self.session is None:
             print("[PersonDetector] ERROR: Sesión no cargada. Omitiendo conteo.")
-            return -1 # El modelo no se pudo cargar
+            return -1, no_boxes # El modelo no se pudo cargar
 
         try:
-            # 1. Preprocesar frame
-            input_tensor = self._preprocess(frame)
-            
-            # 2. Preparar inputs
-            inputs = {self.input_name: input_tensor}
+            # 1. Preprocesar frame (letterbox)
+            canvas_rgb, letterbox = self.letterbox(frame)
             
-            # 3. Ejecutar inferencia en CPU
-            # La salida es una lista, tomamos el primer (y único) elemento [0]
-            output_data = self.session.run([self.output_name], inputs)[0]
-            
-            # 4. Post-procesar y contar
-            count = self._postprocess(output_data)
-            
-            return count
+            # 2. Ejecutar como un lote de 1 y tomar el primer (y único) resultado
+            return self.detect_persons_batch(canvas_rgb[np.newaxis], [letterbox], [frame.shape])[0]
         
         except Exception as e:
             print(f"[PersonDetector] ERROR durante la inferencia: {e}")
-            return -1 # Devolver -1 para indicar un error en la inferencia
\ No newline at end of file
+            return -1, no_boxes # Devolver -1 para indicar un error en la inferencia
+
+    def count_persons(self, frame: np.ndarray) -> int:
+        """
+        Función principal. Recibe un frame de OpenCV (BGR, HWC) y 
+        devuelve el número de personas detectadas.
+        """
+        count, _ = self.detect_persons(frame)
+        return count
@@ -0,0 +1,59 @@
+import numpy as np
+from typing import List, Union
+
+
+class FrameRingBuffer:
+    # Búfer circular de frames sobre UN solo array preasignado (N, H, W, 3) uint8.
+    # Reemplaza a los 'deque' de frames sueltos del 'camera_worker':
+    # cada frame se copia una sola vez al llegar y las ventanas de
+    # inferencia y pre-rollo son vistas (sin copia) sobre el mismo array.
+    #
+    # IMPORTANTE: Las vistas devueltas apuntan a posiciones que se
+    # sobrescriben cuando el búfer da la vuelta. Quien necesite conservar
+    # un frame más allá de la iteración actual debe copiarlo.
+
+    def __init__(self, capacity: int):
+        # Constructor. El array se reserva con el primer frame (aún no
+        # conocemos la resolución de la fuente).
+        if capacity <= 0:
+            raise ValueError(f"FrameRingBuffer 'capacity' debe ser > 0, no {capacity}")
+
+        self.capacity = capacity
+        self.frames: Union[np.ndarray, None] = None
+        self.next_index = 0 # Posición donde se escribirá el próximo frame
+        self.count = 0      # Número de frames válidos en el búfer
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _allocate(self, frame: np.ndarray):
+        # Reserva el array contiguo para la resolución de 'frame'
+        self.frames = np.empty((self.capacity,) + frame.shape, dtype=frame.dtype)
+        self.next_index = 0
+        self.count = 0
+        print(f"[FrameRingBuffer] {self.capacity} frames de {frame.shape} reservados ({self.frames.nbytes / 1e6:.1f} MB).")
+
+    def append(self, frame: np.ndarray) -> np.ndarray:
+        # Copia 'frame' en la siguiente posición y devuelve la vista de esa posición.
+        if self.frames is None or self.frames.shape[1:] != frame.shape or self.frames.dtype != frame.dtype:
+            # Primer frame, o la fuente cambió de resolución (ej. FileReader pasó
+            # a otro video): se reserva de nuevo y el búfer vuelve a llenarse.
+            self._allocate(frame)
+
+        slot = self.frames[self.next_index]
+        slot[...] = frame
+
+        self.next_index = (self.next_index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return slot
+
+    def latest(self, num_frames: int) -> List[np.ndarray]:
+        # Devuelve vistas a los últimos 'num_frames' frames, del más antiguo al más nuevo.
+        num_frames = min(num_frames, self.count)
+        start = (self.next_index - num_frames) % self.capacity
+        return [self.frames[(start + i) % self.capacity] for i in range(num_frames)]
+
+    def clear(self):
+        # Vacía el búfer (mantiene el array reservado)
+        self.next_index = 0
+        self.count = 0
@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 import sys
 import os
+from typing import Dict, Union
 
 # Agregamos la raíz del proyecto ('model_api') al path de Python
 # Sube 2 niveles: .../processing -> .../model_api
@@ -38,59 +39,160 @@ def _center_crop(frame: np.ndarray, crop_size: int) -> np.ndarray:
     
     return frame[start_y:start_y + crop_size, start_x:start_x + crop_size]
 
-def preprocess_clip(frames: list) -> np.ndarray:
-    # Preprocesa una lista de N frames (del búfer) para que coincida 
-    # con la 'val_transform' del notebook de entrenamiento.
-    # Aplica sub-muestreo para normalizar a TARGET_FPS (30).
-    #
-    # Args:
-    #     frames (list): Lista de frames de video (de OpenCV).
-    # Returns:
-    #     np.ndarray: Un tensor con forma (3, 32, 224, 224), listo para la GPU.
-    
-    num_frames_in = len(frames)
-    
-    # 1. Calcular los índices de los 32 frames que queremos (Normalización de FPS)
-    indices = np.linspace(
+def _sample_indices(num_frames_in: int) -> np.ndarray:
+    # Calcula los índices de los 32 frames que queremos (Normalización de FPS)
+    return np.linspace(
         0,                 
         num_frames_in - 1, 
         num=config.CLIP_LEN
     ).astype(int) 
+
+def _transform_frame(frame: np.ndarray) -> np.ndarray:
+    # Aplica la parte "por frame" del preprocesamiento (sin normalizar).
+    # Devuelve un frame RGB uint8 con forma (224, 224, 3).
+
+    # 1. Convertir de BGR (OpenCV) a RGB 
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     
-    # 2. Seleccionar solo esos frames
-    sampled_frames = [frames[i] for i in indices]
-    
-    processed_frames = []
-    
-    for frame in sampled_frames:
-        # 3. Convertir de BGR (OpenCV) a RGB 
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # 4. Replicar T.Resize(size=256)
-        frame_resized = _resize_maintaining_aspect_ratio(
-            frame_rgb, 
-            config.INPUT_RESIZE
-        )
-        
-        # 5. Replicar T.CenterCrop(size=224)
-        frame_cropped = _center_crop(
-            frame_resized, 
-            config.INPUT_CROP_SIZE
-        )
-        
-        processed_frames.append(frame_cropped)
+    # 2. Replicar T.Resize(size=256)
+    frame_resized = _resize_maintaining_aspect_ratio(
+        frame_rgb, 
+        config.INPUT_RESIZE
+    )
     
-    # 6. Apilar todos los frames en un solo array (T, H, W, C)
+    # 3. Replicar T.CenterCrop(size=224)
+    return _center_crop(
+        frame_resized, 
+        config.INPUT_CROP_SIZE
+    )
+
+def _normalize_clip(processed_frames: list, out: Union[np.ndarray, None] = None) -> np.ndarray:
+    # Aplica la parte "por clip" del preprocesamiento a frames ya transformados.
+
+    # 1. Apilar todos los frames en un solo array (T, H, W, C)
     clip_array = np.stack(processed_frames, axis=0)
 
-    # 7. Escalar píxeles a [0, 1]
+    # 2. Escalar píxeles a [0, 1]
     clip_array = clip_array.astype(np.float32) / 255.0
     
-    # 8. Normalizar con la media y std de ImageNet
+    # 3. Normalizar con la media y std de ImageNet
     clip_array = (clip_array - config.NORM_MEAN) / config.NORM_STD
     
-    # 9. Permutar dimensiones a (C, T, H, W) como espera el modelo
+    # 4. Permutar dimensiones a (C, T, H, W) como espera el modelo
+    clip_array = np.transpose(clip_array, (3, 0, 1, 2))
+    
+    # 5. Devolver el tensor SIN la dimensión de lote (Batch)
+    if out is not None:
+        out[...] = clip_array
+        return out
+    return clip_array.astype(np.float32)
+
+def _stack_clip_uint8(processed_frames: list, out: Union[np.ndarray, None] = None) -> np.ndarray:
+    # Variante de '_normalize_clip' para el transporte en uint8: solo apila y
+    # permuta a (C, T, H, W). La normalización se hace después, en el proceso
+    # de inferencia, con 'normalize_clip_batch()'.
+    clip_array = np.stack(processed_frames, axis=0)
     clip_array = np.transpose(clip_array, (3, 0, 1, 2))
+
+    if out is not None:
+        out[...] = clip_array
+        return out
+    return np.ascontiguousarray(clip_array)
+
+def normalize_clip_batch(clips: np.ndarray) -> np.ndarray:
+    # Escala y normaliza (ImageNet) clips uint8 con forma (..., 3, T, H, W).
+    # Aplica exactamente las mismas operaciones float32 que '_normalize_clip',
+    # así que el resultado es idéntico al de 'preprocess_clip()'.
+    mean = config.NORM_MEAN.reshape(3, 1, 1, 1)
+    std = config.NORM_STD.reshape(3, 1, 1, 1)
+
+    clips = clips.astype(np.float32) / 255.0
+    return (clips - mean) / std
+
+def preprocess_clip(frames: list, out: Union[np.ndarray, None] = None, as_uint8: bool = False) -> np.ndarray:
+    # Preprocesa una lista de N frames (del búfer) para que coincida 
+    # con la 'val_transform' del notebook de entrenamiento.
+    # Aplica sub-muestreo para normalizar a TARGET_FPS (30).
+    #
+    # Args:
+    #     frames (list): Lista de frames de video (de OpenCV).
+    #     out (np.ndarray, opcional): Array (3, 32, 224, 224) float32 donde escribir
+    #         el resultado (ej. un slot de 'SharedClipPool'). Evita una copia extra.
+    #     as_uint8 (bool): Si es True, devuelve el clip en uint8 SIN normalizar
+    #         (4 veces más pequeño). Se normaliza luego con 'normalize_clip_batch()'.
+    # Returns:
+    #     np.ndarray: Un tensor con forma (3, 32, 224, 224), listo para la GPU.
+    #         Si se pasó 'out', se devuelve ese mismo array.
     
-    # 10. Devolver el tensor SIN la dimensión de lote (Batch)
-    return clip_array.astype(np.float32)
\ No newline at end of file
+    # 1. Seleccionar los 32 frames del búfer (Normalización de FPS)
+    indices = _sample_indices(len(frames))
+    
+    # 2. BGR->RGB, Resize y CenterCrop de cada frame
+    processed_frames = [_transform_frame(frames[i]) for i in indices]
+    
+    # 3. Escalar, normalizar y permutar a (C, T, H, W)
+    if as_uint8:
+        return _stack_clip_uint8(processed_frames, out)
+    return _normalize_clip(processed_frames, out)
+
+
+class FramePreprocessCache:
+    # Caché por cámara de frames ya transformados (RGB + Resize + CenterCrop).
+    # Con la ventana deslizante (CLIP_LEN=32, STRIDE=16) cada frame aparece en
+    # varias ventanas consecutivas; con esta caché se transforma UNA sola vez,
+    # la primera vez que el muestreo 'np.linspace' lo selecciona.
+    # El resultado es idéntico (bit a bit) al de 'preprocess_clip()'.
+
+    def __init__(self):
+        # Frames transformados (uint8, 224x224x3), indexados por su número
+        # absoluto de frame en el stream de la cámara
+        self.frames: Dict[int, np.ndarray] = {}
+        self.last_first_index: Union[int, None] = None
+
+    def preprocess_clip(
+        self,
+        frames: list,
+        first_frame_index: int,
+        out: Union[np.ndarray, None] = None,
+        as_uint8: bool = False
+    ) -> np.ndarray:
+        # Igual que 'preprocess_clip()', reutilizando los frames ya transformados.
+        # Args:
+        #     frames (list): Lista de frames de video (el búfer de inferencia).
+        #     first_frame_index (int): Número absoluto de frame de 'frames[0]'.
+        #     out (np.ndarray, opcional): Array de destino (ver 'preprocess_clip').
+        #     as_uint8 (bool): Devolver el clip en uint8 (ver 'preprocess_clip').
+        # Returns:
+        #     np.ndarray: Un tensor con forma (3, 32, 224, 224).
+
+        # 1. Si la numeración retrocede (el contador volvió a empezar), los
+        #    números guardados ya corresponden a otros frames: vaciar la caché
+        if self.last_first_index is not None and first_frame_index < self.last_first_index:
+            self.frames.clear()
+        self.last_first_index = first_frame_index
+
+        # Olvidar los frames que ya salieron de la ventana
+        expired = [index for index in self.frames if index < first_frame_index]
+        for index in expired:
+            del self.frames[index]
+
+        # 2. Transformar solo los frames muestreados que aún no están en caché
+        processed_frames = []
+        for i in _sample_indices(len(frames)):
+            frame_index = first_frame_index + int(i)
+            processed = self.frames.get(frame_index)
+            if processed is None:
+                # Copia compacta: el recorte es una vista del frame redimensionado
+                processed = np.ascontiguousarray(_transform_frame(frames[i]))
+                self.frames[frame_index] = processed
+            processed_frames.append(processed)
+
+        # 3. Escalar, normalizar y permutar a (C, T, H, W)
+        if as_uint8:
+            return _stack_clip_uint8(processed_frames, out)
+        return _normalize_clip(processed_frames, out)
+
+    def clear(self):
+        # Vacía la caché (ej. si se reinicia el stream)
+        self.frames.clear()
+        self.last_first_index = None
@@ -0,0 +1,33 @@
+import time
+from multiprocessing import Queue
+from queue import Empty
+from typing import Any, List
+
+
+def collect_batch(source_queue: Queue, max_batch_size: int, timeout_seconds: float) -> List[Any]:
+    # Recolecta elementos de una cola hasta llenar el lote o agotar el timeout.
+    # Args:
+    #     source_queue (Queue): Cola de la que se leen los elementos (ej. 'inference_queue').
+    #     max_batch_size (int): Número máximo de elementos por lote.
+    #     timeout_seconds (float): Tiempo máximo de espera para completar el lote.
+    # Returns:
+    #     list: Lote con entre 1 y 'max_batch_size' elementos.
+
+    # 1. El primer elemento se espera de forma bloqueante.
+    #    (No tiene sentido lanzar un lote vacío a la GPU)
+    batch = [source_queue.get()]
+
+    # 2. El timeout empieza a contar desde que llega el primer elemento,
+    #    así un clip nunca espera más de 'timeout_seconds' por sus compañeros.
+    deadline = time.monotonic() + timeout_seconds
+
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(source_queue.get(timeout=remaining))
+        except Empty:
+            break
+
+    return batch
@@ -2,8 +2,7 @@ import time
 import os
 import sys
 from multiprocessing import Queue
-from queue import Empty
-from collections import deque
+from queue import Empty, Full
 import numpy as np
 from typing import Union, List
 
@@ -14,14 +13,21 @@ sys.path.append(model_api_root)
 
 try:
     from config import config
-    from processing.video_processor import preprocess_clip
-    from services.event_recorder import EventRecorder
+    from processing.video_processor import FramePreprocessCache
+    from processing.frame_ring_buffer import FrameRingBuffer
+    from services.event_recorder import EventRecorder, RecorderWriterPool
+    from services.event_catalog import EventCatalog
+    from services.preroll_encoder import PrerollEncoder
     from services.stream_reader.file_reader import FileReader
+    from services.stream_reader.rtsp_reader import RtspReader
     from services.stream_reader.base_reader import BaseReader
+    from services.shared_clip_pool import SharedClipPool
+    from services.metrics_reporter import MetricsReporter
     
     # --- ¡NUEVO IMPORT! ---
     # Importamos el wrapper del detector de personas que creamos
     from onnx_model.onnx_person_detector import PersonDetector
+    from services.person_detection_service import RemotePersonDetector
 
 except ImportError as e:
     print(f"Error fatal en 'camera_worker.py': No se pudo importar un módulo. {e}")
@@ -37,22 +43,44 @@ def run_camera_worker(
     # --- ¡NUEVO PARÁMETRO! ---
     # Necesitamos la 'results_queue' para enviar los resultados "neutrales"
     # (0,0,0) cuando no hay personas, sin pasar por la GPU.
-    results_queue: Queue 
+    results_queue: Queue,
+
+    # Pool de memoria compartida para enviar clips sin serializarlos.
+    # Si es None, el tensor viaja completo por la 'inference_queue' (pickle).
+    clip_pool: Union[SharedClipPool, None] = None,
+
+    # Colas del 'person_detection_service' (solo en PERSON_DETECTION_MODE = "service").
+    # Si son None, el worker ejecuta su propio PersonDetector (modo "local").
+    person_request_queue: Union[Queue, None] = None,
+    person_response_queue: Union[Queue, None] = None,
+
+    # Cola de métricas hacia la API (None = métricas desactivadas)
+    metrics_queue: Union[Queue, None] = None
 ):
     # Esta función se ejecuta en un proceso de CPU dedicado por cada cámara.
     print(f"[Worker-{camera_id}] Proceso iniciado.")
 
     stream_reader: Union[BaseReader, None] = None 
     current_recorder: Union[EventRecorder, None] = None
-    person_detector: Union[PersonDetector, None] = None
+    recorder_pool: Union[RecorderWriterPool, None] = None
+    event_catalog: Union[EventCatalog, None] = None
+    preroll: Union[PrerollEncoder, None] = None
+    person_detector: Union[PersonDetector, RemotePersonDetector, None] = None
+    metrics = MetricsReporter(metrics_queue)
     
     try:
         # --- 1. Inicialización ---
         
         # 1a. Cargar el detector de personas (se cargará en CPU)
         try:
-            person_detector = PersonDetector()
-            print(f"[Worker-{camera_id}] Detector de personas (YOLOv8n) inicializado.")
+            if person_request_queue is not None and person_response_queue is not None:
+                # Modo "service": una sola sesión YOLO compartida por todas las cámaras
+                person_detector = RemotePersonDetector(camera_id, person_request_queue, person_response_queue)
+                print(f"[Worker-{camera_id}] Usando el servicio centralizado de detección de personas.")
+            else:
+                # Modo "local": sesión YOLO propia de este worker
+                person_detector = PersonDetector()
+                print(f"[Worker-{camera_id}] Detector de personas (YOLOv8n) inicializado.")
         except Exception as e:
             print(f"[Worker-{camera_id}] CRÍTICO: No se pudo cargar PersonDetector: {e}")
             return # Salir del worker si el filtro de conteo falla
@@ -62,8 +90,9 @@ def run_camera_worker(
         # 1b. Fábrica (factory) para construir el lector de video adecuado
         if reader_type == "file":
             stream_reader = FileReader(source_path)
-        # elif reader_type == "rtsp":
-        #     stream_reader = RtspReader(source_path) # Para producción
+        elif reader_type == "rtsp":
+            # Para producción (cámaras en vivo); con RTSP_REALTIME_PACING, un archivo local hace de cámara
+            stream_reader = RtspReader(source_path, realtime_pacing=config.RTSP_REALTIME_PACING)
         else:
             raise ValueError(f"Tipo de lector no válido: {reader_type}")
 
@@ -77,13 +106,34 @@ def run_camera_worker(
         INFERENCE_BUFFER_SIZE = int(CLIP_DURATION_SEC * source_fps)
         PRE_ROLL_BUFFER_SIZE = int(config.PRE_ROLL_SECONDS * source_fps)
 
-        inference_buffer = deque(maxlen=INFERENCE_BUFFER_SIZE)
-        pre_roll_buffer = deque(maxlen=PRE_ROLL_BUFFER_SIZE)
+        if config.PRE_ROLL_ENCODED:
+            # Pre-rollo comprimido (JPEG) en su propio búfer: el búfer circular
+            # solo necesita cubrir la ventana de inferencia.
+            preroll = PrerollEncoder(PRE_ROLL_BUFFER_SIZE)
+            frame_ring = FrameRingBuffer(INFERENCE_BUFFER_SIZE)
+        else:
+            # Un solo búfer circular preasignado para ambas ventanas:
+            # la de inferencia y la de pre-rollo son vistas de sus últimos frames.
+            frame_ring = FrameRingBuffer(max(INFERENCE_BUFFER_SIZE, PRE_ROLL_BUFFER_SIZE))
         
         print(f"[Worker-{camera_id}] Búfer de Inferencia: {INFERENCE_BUFFER_SIZE} frames.")
         print(f"[Worker-{camera_id}] Búfer de Pre-Rollo: {PRE_ROLL_BUFFER_SIZE} frames.")
 
+        # Hilos de escritura de las grabaciones de esta cámara (+ índice de eventos)
+        if config.EVENT_CATALOG_ENABLED:
+            try:
+                event_catalog = EventCatalog()
+            except Exception as e:
+                # Se sigue grabando; solo no se indexan los eventos
+                print(f"[Worker-{camera_id}] ADVERTENCIA: No se pudo abrir el catálogo de eventos: {e}")
+        recorder_pool = RecorderWriterPool(catalog=event_catalog)
+
+        # Caché de frames ya preprocesados (las ventanas se solapan cada STRIDE)
+        frame_cache = FramePreprocessCache()
+
         frame_counter = 0
+        dropped_clips = 0 # Clips descartados porque la 'inference_queue' estaba llena
+        reported_preroll_drops = 0 # Frames omitidos por el 'PrerollEncoder' ya enviados a /metrics
         delay_por_frame = 1.0 / source_fps # "Freno" para simular FPS reales
         last_known_probs = np.array([0.0] * len(config.CLASSES))
 
@@ -92,16 +142,24 @@ def run_camera_worker(
             loop_start_time = time.time()
             
             # 2a. Leer Frame
+            read_start = time.perf_counter()
             ret, frame = stream_reader.read()
             if not ret:
                 print(f"[Worker-{camera_id}] El stream de video ha terminado.")
                 break
+            metrics.observe("decode_seconds", camera_id, time.perf_counter() - read_start)
+            metrics.increment("frames_total", camera_id)
             
             frame_counter += 1
             
             # 2b. Almacenar en Búferes
-            inference_buffer.append(frame)
-            pre_roll_buffer.append(frame)
+            # (El frame se copia una sola vez al array del búfer)
+            frame_ring.append(frame)
+            if preroll is not None:
+                preroll.add(frame) # Se codifica en el hilo del 'PrerollEncoder'
+                if preroll.dropped_frames > reported_preroll_drops:
+                    metrics.increment("preroll_frames_dropped_total", camera_id, preroll.dropped_frames - reported_preroll_drops)
+                    reported_preroll_drops = preroll.dropped_frames
 
             # 2c. Lógica de Grabación (Revisar comandos de la API)
             # (Esta lógica permanece 100% idéntica a tu código original)
@@ -114,26 +172,40 @@ def run_camera_worker(
                     
                     elif command == "START_RECORDING" and current_recorder is None:
                         print(f"[Worker-{camera_id}] Recibida orden: START_RECORDING")
+                        if preroll is not None:
+                            # Solo se toman referencias (JPEG ya codificados y frames aún
+                            # en cola), sin esperar al codificador; el pool los escribe.
+                            pre_roll_frames = preroll.snapshot()
+                        else:
+                            pre_roll_frames = frame_ring.latest(PRE_ROLL_BUFFER_SIZE)
                         current_recorder = EventRecorder(
                             camera_id=camera_id,
-                            pre_roll_frames=list(pre_roll_buffer),
-                            source_fps=source_fps
+                            pre_roll_frames=pre_roll_frames,
+                            source_fps=source_fps,
+                            writer_pool=recorder_pool,
+                            frame_size=(frame.shape[1], frame.shape[0]),
+                            pre_roll_owned=preroll is not None
                         )
                         current_recorder.start()
                     
                     elif command == "STOP_RECORDING" and current_recorder is not None:
                         print(f"[Worker-{camera_id}] Recibida orden: STOP_RECORDING")
-                        current_recorder.close()
+                        current_recorder.close() # No bloquea: el pool termina de escribir
                         current_recorder = None
                 
                 except Empty:
                     break 
             
             if current_recorder is not None:
-                current_recorder.add_frame(frame, last_known_probs) 
+                # Se pasa el frame decodificado (no la vista del búfer), porque la
+                # cola del grabador puede ir por detrás de la vuelta del búfer.
+                if not current_recorder.add_frame(frame, last_known_probs):
+                    metrics.increment("recorder_frames_dropped_total", camera_id)
+            # Incluye las grabaciones ya cerradas que el pool sigue escribiendo
+            metrics.set_gauge("recorder_backlog_frames", camera_id, recorder_pool.backlog_frames())
 
             # --- 2d. LÓGICA DE INFERENCIA Y FILTRADO (¡MODIFICADA!) ---
-            if (len(inference_buffer) == INFERENCE_BUFFER_SIZE and 
+            if (len(frame_ring) >= INFERENCE_BUFFER_SIZE and 
                 frame_counter % config.STRIDE == 0):
                 
                 person_count = -1 # Valor de error por defecto
@@ -141,7 +213,9 @@ def run_camera_worker(
                     # 1. Ejecutar el pre-filtro de conteo de personas (en CPU)
                     #    Usamos el 'frame' más reciente.
                     if person_detector:
+                        detect_start = time.perf_counter()
                         person_count = person_detector.count_persons(frame)
+                        metrics.observe("person_detection_seconds", camera_id, time.perf_counter() - detect_start)
                     else:
                         print(f"[Worker-{camera_id}] ERROR: person_detector no está inicializado.")
                 
@@ -151,17 +225,53 @@ def run_camera_worker(
                 # 2. Decidir el camino de inferencia
                 if person_count >= 2:
                     # 2a. SÍ HAY PERSONAS -> Enviar a la GPU para análisis Swin3D
+                    slot = None
                     try:
-                        tensor = preprocess_clip(list(inference_buffer))
+                        # Número absoluto del frame más antiguo del búfer
+                        first_frame_index = frame_counter - INFERENCE_BUFFER_SIZE
+                        inference_window = frame_ring.latest(INFERENCE_BUFFER_SIZE)
+                        preprocess_start = time.perf_counter()
+
+                        if clip_pool is not None:
+                            # Reservar un slot de memoria compartida y escribir el clip en él
+                            slot = clip_pool.acquire(timeout=config.SHARED_CLIP_ACQUIRE_TIMEOUT_SECONDS)
+                            if slot is None:
+                                raise BufferError("No hay slots libres en el pool (inferencia atrasada)")
+                            tensor = frame_cache.preprocess_clip(
+                                inference_window, first_frame_index,
+                                out=clip_pool.view(slot), as_uint8=config.UINT8_CLIP_TRANSPORT
+                            )
+                        else:
+                            tensor = frame_cache.preprocess_clip(
+                                inference_window, first_frame_index, as_uint8=config.UINT8_CLIP_TRANSPORT
+                            )
+                        metrics.observe("preprocess_seconds", camera_id, time.perf_counter() - preprocess_start)
                         
-                        if not np.isfinite(tensor).all():
+                        # (Un clip uint8 no puede contener NaN/Inf)
+                        if tensor.dtype != np.uint8 and not np.isfinite(tensor).all():
                             print(f"[Worker-{camera_id}] ADVERTENCIA: Tensor corrupto (NaN/Inf). Omitiendo clip.")
                         else:
-                            # Enviar a la cola de la GPU (inference_service)
-                            inference_queue.put((camera_id, tensor))
+                            # Enviar a la cola de la GPU (inference_service).
+                            # Con 'clip_pool' solo viaja el índice del slot.
+                            # La cola está acotada: si está llena, el clip se descarta.
+                            payload = slot if slot is not None else tensor
+                            inference_queue.put_nowait((camera_id, payload, time.time()))
+                            slot = None # El slot ahora pertenece al 'inference_service'
+                            metrics.increment("clips_sent_total", camera_id)
                     
+                    except Full:
+                        dropped_clips += 1
+                        metrics.increment("clips_dropped_total", camera_id)
+                        print(f"[Worker-{camera_id}] ADVERTENCIA: 'inference_queue' llena. Clip descartado (total: {dropped_clips}).")
+                    except BufferError as e:
+                        metrics.increment("clips_dropped_total", camera_id)
+                        print(f"[Worker-{camera_id}] Error al pre-procesar clip: {e}")
                     except Exception as e:
                         print(f"[Worker-{camera_id}] Error al pre-procesar clip: {e}")
+                    finally:
+                        # Si el clip no se envió, devolver el slot al pool
+                        if slot is not None:
+                            clip_pool.release(slot)
                 
                 elif person_count < 0:
                     # 2b. HUBO UN ERROR EN YOLO -> No hacer nada (solo log)
@@ -172,14 +282,23 @@ def run_camera_worker(
                     # Enviar un resultado neutral (0,0,0) directamente al EventManager
                     # para mantener la cámara "viva" en el frontend.
                     neutral_probs = np.array([0.0] * len(config.CLASSES))
-                    results_queue.put((camera_id, neutral_probs))
+                    try:
+                        results_queue.put_nowait((camera_id, neutral_probs, time.time()))
+                    except Full:
+                        print(f"[Worker-{camera_id}] ADVERTENCIA: 'results_queue' llena. Resultado neutral descartado.")
                     
                     # También actualizamos last_known_probs por si estamos grabando
                     last_known_probs = neutral_probs
             
             # --- FIN DE LA MODIFICACIÓN ---
 
+            # Enviar las métricas acumuladas a la API (cada METRICS_FLUSH_INTERVAL_SECONDS)
+            metrics.maybe_flush()
+
             # 2e. Controlar los FPS
+            # (Una fuente en vivo ya marca el ritmo: read() espera al siguiente frame)
+            if stream_reader.is_live:
+                continue
             time_elapsed = time.time() - loop_start_time
             sleep_time = delay_por_frame - time_elapsed
             if sleep_time > 0:
@@ -194,6 +313,13 @@ def run_camera_worker(
         print(f"[Worker-{camera_id}] Liberando recursos...")
         if current_recorder is not None:
             current_recorder.close()
+        if recorder_pool is not None:
+            recorder_pool.shutdown() # Espera a que se terminen de escribir las grabaciones
+        if event_catalog is not None:
+            event_catalog.close()
+        if preroll is not None:
+            preroll.release()
         if stream_reader is not None:
             stream_reader.release()
+        metrics.flush()
         print(f"[Worker-{camera_id}] Proceso terminado.")
\ No newline at end of file
@@ -0,0 +1,156 @@
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple, Union
+
+
+class ClipAdmissionBuffer:
+    # Control de admisión entre la 'inference_queue' y el detector.
+    # Vive dentro del proceso 'inference_service': un hilo lo alimenta con
+    # todo lo que llega por la cola y el bucle de inferencia saca lotes de él.
+    #
+    # Políticas:
+    #   - Como máximo 'max_pending_per_camera' clips pendientes por cámara.
+    #     Si llega uno más nuevo, REEMPLAZA al más antiguo (coalescing):
+    #     un clip viejo de una cámara ya no sirve si hay uno más reciente.
+    #   - Los clips con más de 'max_age_seconds' de antigüedad se descartan
+    #     (sus resultados describirían el pasado).
+    # Cada descarte llama a 'on_discard(payload)' (ej. para liberar el slot
+    # de memoria compartida) y se cuenta por cámara.
+    #
+    # 'take_batch' no espera el timeout completo si el lote no se va a llenar
+    # (con menos cámaras que MAX_BATCH_SIZE nunca se llena, y cada resultado
+    # sumaría BATCH_TIMEOUT_SECONDS de latencia). Deja de esperar cuando:
+    #   - ninguna cámara activa (que envió un clip en los últimos
+    #     'active_window_seconds') puede aportar otro clip al lote, o
+    #   - no llegó ningún clip nuevo en 'quiet_seconds' (None = no se usa).
+
+    def __init__(
+        self,
+        max_pending_per_camera: int,
+        max_age_seconds: Union[float, None],
+        on_discard: Union[Callable[[Any], None], None] = None,
+        active_window_seconds: float = 2.0,
+        quiet_seconds: Union[float, None] = None
+    ):
+        self.max_pending_per_camera = max_pending_per_camera
+        self.max_age_seconds = max_age_seconds
+        self.on_discard = on_discard
+        self.active_window_seconds = active_window_seconds
+        self.quiet_seconds = quiet_seconds
+
+        self.condition = threading.Condition()
+        # Clips pendientes por cámara: deque de (payload, enqueued_at)
+        self.pending: Dict[str, Deque[Tuple[Any, float]]] = {}
+        # Contadores por cámara
+        self.stats: Dict[str, Dict[str, int]] = {}
+        # Último clip recibido de cada cámara (monotonic), para saber cuáles están activas
+        self.last_offer: Dict[str, float] = {}
+        self.offers = 0 # Clips recibidos en total (para detectar que no llega nada nuevo)
+
+    def _camera_stats(self, camera_id: str) -> Dict[str, int]:
+        if camera_id not in self.stats:
+            self.stats[camera_id] = {"received": 0, "coalesced": 0, "dropped_stale": 0, "served": 0}
+        return self.stats[camera_id]
+
+    def _discard(self, payload: Any):
+        if self.on_discard is not None:
+            self.on_discard(payload)
+
+    def _num_pending(self) -> int:
+        return sum(len(clips) for clips in self.pending.values())
+
+    def _active_cameras_full(self) -> bool:
+        # True si ninguna cámara activa puede sumar otro clip al lote sin
+        # reemplazar uno pendiente (esperar más solo agregaría latencia)
+        active_since = time.monotonic() - self.active_window_seconds
+        return all(
+            len(self.pending.get(camera_id, ())) >= self.max_pending_per_camera
+            for camera_id, last_offer in self.last_offer.items()
+            if last_offer >= active_since
+        )
+
+    def offer(self, camera_id: str, payload: Any, enqueued_at: float):
+        # Admite un clip nuevo de 'camera_id' (reemplazando al más antiguo si hace falta)
+        with self.condition:
+            clips = self.pending.setdefault(camera_id, deque())
+            stats = self._camera_stats(camera_id)
+            stats["received"] += 1
+            self.last_offer[camera_id] = time.monotonic()
+            self.offers += 1
+
+            while len(clips) >= self.max_pending_per_camera:
+                old_payload, _ = clips.popleft()
+                stats["coalesced"] += 1
+                self._discard(old_payload)
+
+            clips.append((payload, enqueued_at))
+            self.condition.notify_all()
+
+    def _drop_stale(self):
+        # Descarta los clips que superan la antigüedad máxima
+        if self.max_age_seconds is None:
+            return
+        oldest_allowed = time.time() - self.max_age_seconds
+
+        for camera_id, clips in self.pending.items():
+            while clips and clips[0][1] < oldest_allowed:
+                old_payload, _ = clips.popleft()
+                self._camera_stats(camera_id)["dropped_stale"] += 1
+                self._discard(old_payload)
+
+    def _select(self, max_batch_size: int) -> List[Tuple[str, Any, float]]:
+        # Elige qué clips pendientes forman el lote: los más antiguos primero (FIFO).
+        candidates = [
+            (enqueued_at, camera_id)
+            for camera_id, clips in self.pending.items()
+            for _, enqueued_at in clips
+        ]
+        candidates.sort()
+
+        batch = []
+        for _, camera_id in candidates[:max_batch_size]:
+            payload, enqueued_at = self.pending[camera_id].popleft()
+            batch.append((camera_id, payload, enqueued_at))
+        return batch
+
+    def take_batch(self, max_batch_size: int, timeout_seconds: float) -> List[Tuple[str, Any, float]]:
+        # Espera (bloqueante) al primer clip y luego hasta llenar el lote, agotar
+        # el timeout o que no tenga sentido seguir esperando (ver arriba).
+        # Devuelve una lista de (camera_id, payload, enqueued_at).
+        # Puede devolver una lista vacía si todos los clips pendientes caducaron.
+        with self.condition:
+            while self._num_pending() == 0:
+                self.condition.wait()
+
+            deadline = time.monotonic() + timeout_seconds
+            while self._num_pending() < max_batch_size and not self._active_cameras_full():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                offers_before = self.offers
+                if self.quiet_seconds is not None:
+                    remaining = min(remaining, self.quiet_seconds)
+                self.condition.wait(remaining)
+                if self.quiet_seconds is not None and self.offers == offers_before:
+                    break # No llegó nada nuevo: enviar lo que hay
+
+            self._drop_stale()
+            batch = self._select(max_batch_size)
+            for camera_id, _, _ in batch:
+                self._camera_stats(camera_id)["served"] += 1
+            return batch
+
+    def stats_snapshot(self) -> Dict[str, Dict[str, int]]:
+        # Copia de los contadores por cámara (para exportarlos a /metrics)
+        with self.condition:
+            return {camera_id: dict(s) for camera_id, s in self.stats.items()}
+
+    def format_stats(self) -> str:
+        # Resumen legible de los contadores por cámara (para los logs)
+        with self.condition:
+            return " | ".join(
+                f"{camera_id}: recibidos={s['received']} servidos={s['served']} "
+                f"reemplazados={s['coalesced']} caducados={s['dropped_stale']}"
+                for camera_id, s in sorted(self.stats.items())
+            )
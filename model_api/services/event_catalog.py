@@ -0,0 +1,217 @@
+import base64
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+import sys
+import os
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'event_catalog.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera_id TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    top_class TEXT,
+    top_probability REAL NOT NULL DEFAULT 0,
+    total_records INTEGER NOT NULL DEFAULT 0,
+    dropped_frames INTEGER NOT NULL DEFAULT 0,
+    video_file TEXT NOT NULL,
+    log_file TEXT,
+    journal_file TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events (start_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_events_camera_start ON events (camera_id, start_time DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS event_peaks (
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    class_name TEXT NOT NULL,
+    peak_probability REAL NOT NULL,
+    PRIMARY KEY (event_id, class_name)
+);
+CREATE INDEX IF NOT EXISTS idx_event_peaks_class ON event_peaks (class_name, peak_probability, event_id);
+"""
+
+_EVENT_COLUMNS = (
+    "id, camera_id, start_time, end_time, top_class, top_probability, "
+    "total_records, dropped_frames, video_file, log_file, journal_file"
+)
+
+
+class EventCatalog:
+    # Índice de eventos grabados en SQLite (modo WAL).
+    # Cada 'camera_worker' inserta un registro al terminar de escribir un evento
+    # (desde el 'RecorderWriterPool'), y la API consulta el catálogo por cámara,
+    # rango de tiempo y clase, con paginación por cursor, sin listar directorios
+    # ni abrir los .json de cada evento.
+    #
+    # Varios procesos escriben a la vez: WAL permite leer mientras otro escribe,
+    # y 'busy_timeout' espera el lock de escritura en lugar de fallar.
+
+    def __init__(self, db_path: Union[str, None] = None):
+        self.db_path = db_path or config.EVENT_CATALOG_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        self.lock = threading.Lock() # Una conexión compartida entre hilos
+        self.connection = sqlite3.connect(
+            self.db_path,
+            timeout=config.EVENT_CATALOG_BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False
+        )
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("PRAGMA foreign_keys=ON")
+            self.connection.executescript(_SCHEMA)
+
+    def record_event(self, summary: dict) -> int:
+        # Inserta un evento a partir del resumen que escribe el 'EventJournal'.
+        # Devuelve el id asignado.
+        peaks: Dict[str, float] = summary.get("peak_probabilities", {})
+        top_class, top_probability = max(peaks.items(), key=lambda item: item[1], default=(None, 0.0))
+
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO events (camera_id, start_time, end_time, top_class, top_probability, "
+                "total_records, dropped_frames, video_file, log_file, journal_file) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    summary["camera_id"],
+                    _to_timestamp(summary["event_start_time"]),
+                    _to_timestamp(summary["event_end_time"]),
+                    top_class,
+                    float(top_probability),
+                    int(summary.get("total_records", 0)),
+                    int(summary.get("dropped_frames", 0)),
+                    summary["video_file"],
+                    summary.get("log_file"),
+                    summary.get("journal_file"),
+                )
+            )
+            event_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO event_peaks (event_id, class_name, peak_probability) VALUES (?, ?, ?)",
+                [(event_id, class_name, float(p)) for class_name, p in peaks.items()]
+            )
+        return event_id
+
+    def query_events(
+        self,
+        camera_id: Union[str, None] = None,
+        start: Union[float, None] = None,
+        end: Union[float, None] = None,
+        event_class: Union[str, None] = None,
+        min_probability: Union[float, None] = None,
+        limit: Union[int, None] = None,
+        cursor: Union[str, None] = None
+    ) -> Tuple[List[dict], Union[str, None]]:
+        # Eventos del más reciente al más antiguo. 'start'/'end' (epoch) filtran
+        # por hora de inicio. 'event_class' deja solo los eventos cuyo pico de esa
+        # clase llegó a 'min_probability' (por defecto ALERT_THRESHOLD); sin
+        # 'event_class', 'min_probability' no tiene a qué aplicarse y es un error.
+        # Devuelve (eventos, cursor_siguiente); el cursor es None en la última página.
+        if min_probability is not None and event_class is None:
+            raise ValueError("'min_probability' requiere 'event_class'.")
+        limit = max(1, min(limit or config.EVENT_CATALOG_PAGE_SIZE, config.EVENT_CATALOG_MAX_PAGE_SIZE))
+
+        conditions, params = [], []
+        if camera_id is not None:
+            conditions.append("camera_id = ?")
+            params.append(camera_id)
+        if start is not None:
+            conditions.append("start_time >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("start_time < ?")
+            params.append(end)
+        if event_class is not None:
+            conditions.append(
+                "id IN (SELECT event_id FROM event_peaks WHERE class_name = ? AND peak_probability >= ?)"
+            )
+            params.extend([event_class, config.ALERT_THRESHOLD if min_probability is None else min_probability])
+        if cursor is not None:
+            # Seguir después del último evento de la página anterior (orden: start_time, id)
+            cursor_time, cursor_id = _decode_cursor(cursor)
+            conditions.append("(start_time < ? OR (start_time = ? AND id < ?))")
+            params.extend([cursor_time, cursor_time, cursor_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT {_EVENT_COLUMNS} FROM events {where} ORDER BY start_time DESC, id DESC LIMIT ?"
+
+        with self.lock:
+            rows = self.connection.execute(sql, params + [limit + 1]).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            events = self._rows_to_events(rows)
+
+        next_cursor = _encode_cursor(rows[-1]["start_time"], rows[-1]["id"]) if has_more else None
+        return events, next_cursor
+
+    def get_event(self, event_id: int) -> Union[dict, None]:
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT {_EVENT_COLUMNS} FROM events WHERE id = ?", (event_id,)
+            ).fetchone()
+            return self._rows_to_events([row])[0] if row is not None else None
+
+    def _rows_to_events(self, rows: List[sqlite3.Row]) -> List[dict]:
+        # (llamar con el lock tomado)
+        # Los picos de todos los eventos de la página salen de UNA consulta
+        # ('IN (...)'), no de una por fila. La página tiene como mucho
+        # EVENT_CATALOG_MAX_PAGE_SIZE ids, por debajo del límite de parámetros de SQLite.
+        if not rows:
+            return []
+        event_ids = [row["id"] for row in rows]
+        placeholders = ", ".join("?" * len(event_ids))
+        peaks_by_event: Dict[int, Dict[str, float]] = {event_id: {} for event_id in event_ids}
+        for event_id, class_name, p in self.connection.execute(
+            f"SELECT event_id, class_name, peak_probability FROM event_peaks WHERE event_id IN ({placeholders})",
+            event_ids
+        ):
+            peaks_by_event[event_id][class_name] = p
+
+        events = []
+        for row in rows:
+            event = dict(row)
+            event["start_time"] = datetime.fromtimestamp(row["start_time"]).isoformat()
+            event["end_time"] = datetime.fromtimestamp(row["end_time"]).isoformat()
+            event["peak_probabilities"] = peaks_by_event[row["id"]]
+            events.append(event)
+        return events
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def _to_timestamp(value: Union[str, float, int]) -> float:
+    # Acepta ISO 8601 (como en los resúmenes .json) o epoch en segundos
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _encode_cursor(start_time: float, event_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{start_time!r}:{event_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_time, event_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return float(start_time), int(event_id)
+    except Exception:
+        raise ValueError(f"Cursor no válido: '{cursor}'")
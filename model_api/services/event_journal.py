@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from typing import Iterator, List, Tuple, Union
+import sys
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'event_journal.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+JOURNAL_VERSION = 1
+
+
+class EventJournal:
+    # Log de predicciones de un evento, escrito de forma incremental (append-only).
+    #
+    # Archivo '<evento>.jsonl':
+    #   línea 1  -> cabecera: {"type": "header", "version", "camera_id", "classes", ...}
+    #   resto    -> un registro compacto por frame escrito: {"t": ms_desde_inicio, "p": [p0, p1, p2]}
+    # Se hace 'flush' cada EVENT_LOG_FLUSH_RECORDS registros o EVENT_LOG_FLUSH_SECONDS,
+    # así un corte del proceso solo pierde los últimos registros y no todo el log.
+    #
+    # Al cerrar se escribe además '<evento>.json' con un resumen pequeño
+    # (duración, conteos, máximos por clase), legible sin recorrer los registros.
+
+    def __init__(self, journal_path: str, summary_path: str, header: dict):
+        self.journal_path = journal_path
+        self.summary_path = summary_path
+        self.header = dict(header)
+        self.flush_records = max(1, config.EVENT_LOG_FLUSH_RECORDS)
+        self.flush_seconds = config.EVENT_LOG_FLUSH_SECONDS
+
+        self.total_records = 0
+        self.unflushed_records = 0
+        self.last_flush = time.monotonic()
+        self.last_timestamp_ms = 0
+        self.peak_probabilities: List[float] = [0.0] * len(config.CLASSES)
+
+        self.file = open(journal_path, "w", encoding="utf-8")
+        self.file.write(json.dumps({"type": "header", "version": JOURNAL_VERSION, **self.header}) + "\n")
+        self.file.flush()
+
+    def append(self, timestamp_ms: int, probabilities) -> None:
+        values = [round(float(p), 4) for p in probabilities]
+        self.file.write(json.dumps({"t": timestamp_ms, "p": values}, separators=(",", ":")) + "\n")
+
+        self.total_records += 1
+        self.unflushed_records += 1
+        self.last_timestamp_ms = timestamp_ms
+        for i, value in enumerate(values[:len(self.peak_probabilities)]):
+            if value > self.peak_probabilities[i]:
+                self.peak_probabilities[i] = value
+
+        if (self.unflushed_records >= self.flush_records or
+                time.monotonic() - self.last_flush >= self.flush_seconds):
+            self.flush()
+
+    def flush(self) -> None:
+        self.file.flush()
+        if config.EVENT_LOG_FSYNC:
+            os.fsync(self.file.fileno())
+        self.unflushed_records = 0
+        self.last_flush = time.monotonic()
+
+    def close(self, extra_summary: Union[dict, None] = None) -> dict:
+        # Cierra el journal y escribe el resumen. Devuelve el resumen.
+        self.flush()
+        self.file.close()
+
+        summary = {
+            **self.header,
+            "journal_file": os.path.basename(self.journal_path),
+            "journal_version": JOURNAL_VERSION,
+            "total_records": self.total_records,
+            "duration_ms": self.last_timestamp_ms,
+            "peak_probabilities": dict(zip(config.CLASSES, self.peak_probabilities)),
+            **(extra_summary or {}),
+        }
+        with open(self.summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+        return summary
+
+
+def read_event_journal(journal_path: str) -> Tuple[dict, Iterator[Tuple[int, List[float]]]]:
+    # Lee un journal: devuelve (cabecera, iterador de (timestamp_ms, probabilidades)).
+    # Ignora una última línea incompleta (evento cortado a mitad de escritura).
+    f = open(journal_path, "r", encoding="utf-8")
+    header = json.loads(f.readline())
+
+    def records():
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                yield record["t"], record["p"]
+
+    return header, records()
@@ -2,11 +2,12 @@ import cv2
 import numpy as np
 import os
 import sys
-import json
 import time
+from collections import deque
 from datetime import datetime
 import threading
 import queue
+from typing import Deque, Set, Tuple, Union
 
 # Agregamos la raíz del proyecto ('model_api') al path de Python
 # Sube 2 niveles: .../services -> .../model_api
@@ -15,27 +16,147 @@ sys.path.append(model_api_root)
 
 try:
     from config import config
+    from services.event_journal import EventJournal
+    from services.event_catalog import EventCatalog
 except ImportError as e:
-    print(f"Error fatal en 'event_recorder.py': No se pudo importar 'config'. {e}")
+    print(f"Error fatal en 'event_recorder.py': No se pudo importar un módulo. {e}")
     sys.exit(1)
 
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
 
-class EventRecorder(threading.Thread):
-    # Esta clase se ejecuta en un HILO (thread) separado para no bloquear al 'camera_worker'.
-    # Implementa su propio control de FPS (sleep) para no saturar cv2.VideoWriter.
-    
-    def __init__(self, camera_id: str, pre_roll_frames: list, source_fps: float):
-        # Inicializa el hilo grabador
-        super().__init__(daemon=True)
-        
+
+class RecorderWriterPool:
+    # Hilos de escritura compartidos por todas las grabaciones de un 'camera_worker'.
+    # Cada 'EventRecorder' tiene su propia cola acotada de frames; cuando tiene
+    # trabajo, se pone (una sola vez) en la cola 'ready' del pool. Un hilo lo
+    # toma, escribe hasta RECORDER_WRITE_BATCH_FRAMES frames y, si quedan más,
+    # lo vuelve a encolar. Así varias grabaciones (ej. una que se está cerrando
+    # y la siguiente) comparten los hilos, y cada archivo lo escribe un solo
+    # hilo a la vez (los frames quedan en orden).
+    #
+    # No hay "freno" por FPS: el pool vacía las colas tan rápido como el disco
+    # lo permita. Los FPS del video los fija el 'cv2.VideoWriter'.
+    #
+    # Con 'catalog', cada grabación terminada se indexa en el 'EventCatalog'.
+
+    def __init__(
+        self,
+        num_threads: Union[int, None] = None,
+        batch_frames: Union[int, None] = None,
+        catalog: Union[EventCatalog, None] = None
+    ):
+        self.num_threads = max(1, num_threads or config.RECORDER_WRITER_THREADS)
+        self.batch_frames = max(1, batch_frames or config.RECORDER_WRITE_BATCH_FRAMES)
+        self.catalog = catalog
+
+        self.ready: "queue.Queue[Union[EventRecorder, None]]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.recorders: Set["EventRecorder"] = set() # Grabaciones sin terminar (abiertas o cerrándose)
+        self.idle = threading.Condition(self.lock) # Se notifica cuando una grabación termina
+
+        self.threads = [
+            threading.Thread(target=self._writer_loop, name=f"recorder-writer-{i}", daemon=True)
+            for i in range(self.num_threads)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def register(self, recorder: "EventRecorder"):
+        with self.lock:
+            self.recorders.add(recorder)
+
+    def schedule(self, recorder: "EventRecorder"):
+        # Lo llama el 'EventRecorder' cuando pasa a tener trabajo pendiente
+        self.ready.put(recorder)
+
+    def _writer_loop(self):
+        while True:
+            recorder = self.ready.get()
+            if recorder is None:
+                break
+            try:
+                state = recorder._drain(self.batch_frames)
+            except Exception as e:
+                print(f"[Recorder Pool] Error inesperado en '{recorder.camera_id}': {e}")
+                state = "done"
+                recorder._abort()
+
+            if state == "pending":
+                self.ready.put(recorder) # Turno para la siguiente grabación
+            elif state == "done":
+                with self.lock:
+                    self.recorders.discard(recorder)
+                    self.idle.notify_all()
+
+    def backlog_frames(self) -> int:
+        # Frames en cola de todas las grabaciones (incluidas las que se están cerrando)
+        with self.lock:
+            recorders = list(self.recorders)
+        return sum(recorder.backlog_frames() for recorder in recorders)
+
+    def shutdown(self, timeout: Union[float, None] = None) -> bool:
+        # Espera (como mucho 'timeout') a que terminen las grabaciones cerradas
+        # y detiene los hilos. Devuelve False si quedaron grabaciones a medias.
+        timeout = config.RECORDER_SHUTDOWN_TIMEOUT_SECONDS if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.recorders:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.idle.wait(remaining)
+            pending = len(self.recorders)
+
+        for _ in self.threads:
+            self.ready.put(None)
+        for thread in self.threads:
+            thread.join(timeout=max(0.1, deadline - time.monotonic()))
+
+        if pending:
+            print(f"[Recorder Pool] ADVERTENCIA: {pending} grabación(es) sin terminar al cerrar.")
+        return pending == 0
+
+
+class EventRecorder:
+    # Una grabación de evento. Ya no es un hilo propio: el 'camera_worker' encola
+    # frames con 'add_frame()' (instantáneo) y los hilos del 'RecorderWriterPool'
+    # los escriben en disco. La cola es acotada (RECORDER_QUEUE_MAX_FRAMES) y,
+    # si se llena, se aplica RECORDER_OVERFLOW_POLICY en lugar de crecer sin límite.
+
+    def __init__(
+        self,
+        camera_id: str,
+        pre_roll_frames: list,
+        source_fps: float,
+        writer_pool: RecorderWriterPool,
+        frame_size: Union[Tuple[int, int], None] = None,
+        max_queue_frames: Union[int, None] = None,
+        overflow_policy: Union[str, None] = None,
+        pre_roll_owned: bool = False
+    ):
+        # Inicializa la grabación.
+        # 'pre_roll_frames' puede traer vistas del 'FrameRingBuffer' del worker
+        # (np.ndarray), que se escriben aquí mismo antes de que el búfer dé la
+        # vuelta, o el pre-rollo del 'PrerollEncoder' ('pre_roll_owned' = True):
+        # JPEG (bytes), frames aún sin codificar (np.ndarray propios) y None por
+        # cada frame omitido. Ese pre-rollo lo escribe el pool, sin frenar al worker.
+        # 'frame_size' = (ancho, alto); si no se pasa, se toma del pre-rollo.
         self.camera_id = camera_id
+        self.writer_pool = writer_pool
         self.is_open = False
-        self.frame_queue = queue.Queue()
-        self.stop_event = threading.Event()
-        
-        # Lógica de control de FPS para este hilo
         self.source_fps = source_fps
-        self.delay_por_frame = 1.0 / self.source_fps
+
+        self.max_queue_frames = max(1, max_queue_frames or config.RECORDER_QUEUE_MAX_FRAMES)
+        self.overflow_policy = overflow_policy or config.RECORDER_OVERFLOW_POLICY
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"RECORDER_OVERFLOW_POLICY no válida: '{self.overflow_policy}'. Opciones: {OVERFLOW_POLICIES}")
+
+        # Cola de (frame, probabilidades, timestamp) y estado compartido con el pool
+        self.lock = threading.Lock()
+        self.frames: Deque[tuple] = deque()
+        self.scheduled = False # True mientras está en la cola 'ready' del pool o siendo escrita
+        self.closing = False
+        self.dropped_frames = 0 # Frames descartados por la política de desbordamiento
 
         # Asegurarse de que los directorios de guardado existan
         os.makedirs(config.SAVE_CLIP_PATH, exist_ok=True)
@@ -44,125 +165,215 @@ class EventRecorder(threading.Thread):
         # Generar nombres de archivo únicos
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_basename = f"{camera_id}_{timestamp}"
-        
+
         self.video_path = os.path.join(config.SAVE_CLIP_PATH, f"{file_basename}.mp4")
-        self.log_path = os.path.join(config.SAVE_LOG_PATH, f"{file_basename}.json")
+        self.log_path = os.path.join(config.SAVE_LOG_PATH, f"{file_basename}.json") # Resumen
+        self.journal_path = os.path.join(config.SAVE_LOG_PATH, f"{file_basename}.jsonl") # Registros
+        self.journal: Union[EventJournal, None] = None
+
+        # Pre-rollo pendiente de escribir (lo escribe el pool)
+        self.deferred_pre_roll: list = []
+        self.pre_roll_gap_frames = 0 # Huecos del pre-rollo (frames que el codificador omitió)
 
         try:
-            if not pre_roll_frames:
+            if not pre_roll_frames and frame_size is None:
                 print(f"[Recorder] ERROR: No se puede iniciar el grabador sin frames de pre-rollo.")
                 return
-            
+
+            deferred = pre_roll_owned or any(not isinstance(frame, np.ndarray) for frame in pre_roll_frames)
+
             # Obtener dimensiones del primer frame
-            h, w, _ = pre_roll_frames[0].shape
-            
+            if frame_size is not None:
+                w, h = frame_size
+            else:
+                first = next(frame for frame in pre_roll_frames if frame is not None)
+                h, w, _ = (self._decode(first) if isinstance(first, (bytes, bytearray)) else first).shape
+
             # Definir el codec (mp4v para .mp4)
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             self.video_writer = cv2.VideoWriter(self.video_path, fourcc, self.source_fps, (w, h))
-            
+
             if not self.video_writer.isOpened():
                 raise IOError(f"No se pudo abrir VideoWriter en: {self.video_path}")
 
-            self.is_open = True
             self.start_time = time.time()
-            self.logs = []
-            
-            # Escribir el búfer de pre-rollo inmediatamente
+            self.journal = EventJournal(self.journal_path, self.log_path, header={
+                "camera_id": camera_id,
+                "event_start_time": datetime.fromtimestamp(self.start_time).isoformat(),
+                "video_file": os.path.basename(self.video_path),
+                "log_file": os.path.basename(self.log_path),
+                "source_fps": self.source_fps,
+                "frame_size": [w, h],
+                "classes": list(config.CLASSES),
+            })
+            self.is_open = True
+
             print(f"[Recorder] Grabación iniciada: {file_basename}.mp4")
-            for frame in pre_roll_frames:
-                self.video_writer.write(frame)
-            
-            print(f"[Recorder] {len(pre_roll_frames)} frames de pre-rollo guardados.")
+            if deferred:
+                # Pre-rollo del 'PrerollEncoder': lo escribe el pool en el primer turno
+                self.deferred_pre_roll = list(pre_roll_frames)
+            else:
+                # Escribir el búfer de pre-rollo inmediatamente
+                # (Los frames son vistas del 'FrameRingBuffer' del worker: deben
+                # consumirse aquí, antes de que el búfer dé la vuelta)
+                for frame in pre_roll_frames:
+                    self.video_writer.write(frame)
+                print(f"[Recorder] {len(pre_roll_frames)} frames de pre-rollo guardados.")
 
         except Exception as e:
             print(f"[Recorder] CRÍTICO: Error al inicializar: {e}")
             self.is_open = False
 
-    def add_frame(self, frame: np.ndarray, probabilities: np.ndarray):
+    def start(self):
+        # Registra la grabación en el pool (y agenda el pre-rollo comprimido, si hay)
+        if not self.is_open:
+            return
+        self.writer_pool.register(self)
+        with self.lock:
+            if self.deferred_pre_roll and not self.scheduled:
+                self.scheduled = True
+                self.writer_pool.schedule(self)
+
+    def add_frame(self, frame: np.ndarray, probabilities: np.ndarray) -> bool:
         # Añade un frame y sus probabilidades a la cola de grabación.
-        # Esta operación es (casi) instantánea y no bloquea al 'camera_worker'.
-        if self.is_open:
-            self.frame_queue.put((frame, probabilities))
-
-    def run(self):
-        # Este es el bucle que se ejecuta en el hilo de fondo.
-        # Saca frames de la cola y los escribe en el disco, respetando los FPS.
-        print(f"[Recorder Thread-{self.camera_id}] Hilo de grabación iniciado (sincronizado a {self.source_fps:.2f} FPS).")
-        
-        while not self.stop_event.is_set():
-            # Iniciamos el cronómetro del bucle del hilo
-            loop_start_time = time.time()
-            
+        # Esta operación es instantánea y no bloquea al 'camera_worker'.
+        # Devuelve False si se descartó un frame por la cola llena.
+        if not self.is_open:
+            return False
+
+        accepted = True
+        with self.lock:
+            if len(self.frames) >= self.max_queue_frames:
+                self.dropped_frames += 1
+                accepted = False
+                if self.overflow_policy == "drop_newest":
+                    return False
+                self.frames.popleft() # "drop_oldest"
+
+            # El timestamp se toma aquí: el pool escribe más tarde y a otro ritmo
+            self.frames.append((frame, probabilities, time.time()))
+            if not self.scheduled:
+                self.scheduled = True
+                self.writer_pool.schedule(self)
+        return accepted
+
+    @staticmethod
+    def _decode(jpeg: bytes) -> np.ndarray:
+        return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def _write_deferred_pre_roll(self):
+        # Decodifica (JPEG) y escribe el pre-rollo. Cada hueco (None) repite el
+        # frame anterior, así el video conserva la duración real del pre-rollo.
+        written = 0
+        last_frame = None
+        for item in self.deferred_pre_roll:
+            if item is None:
+                frame = last_frame
+                self.pre_roll_gap_frames += 1
+            elif isinstance(item, np.ndarray):
+                frame = item
+            else:
+                frame = self._decode(item)
+            if frame is not None:
+                self.video_writer.write(frame)
+                last_frame = frame
+                written += 1
+        self.deferred_pre_roll = []
+        print(f"[Recorder-{self.camera_id}] {written} frames de pre-rollo guardados "
+              f"({self.pre_roll_gap_frames} huecos del codificador).")
+
+    def backlog_frames(self) -> int:
+        # Frames en cola que el pool aún no escribió en disco
+        return len(self.frames) + len(self.deferred_pre_roll)
+
+    def _drain(self, max_frames: int) -> str:
+        # Turno de escritura en un hilo del pool. Devuelve:
+        # "pending" = quedan frames (volver a encolar), "idle" = cola vacía,
+        # "done" = la grabación se cerró y ya se finalizó.
+        if self.deferred_pre_roll:
+            try:
+                self._write_deferred_pre_roll()
+            except Exception as e:
+                print(f"[Recorder-{self.camera_id}] Error al escribir el pre-rollo: {e}")
+                self.deferred_pre_roll = []
+
+        for _ in range(max_frames):
+            with self.lock:
+                if not self.frames:
+                    break
+                frame, probabilities, frame_time = self.frames.popleft()
+
             try:
-                # Espera por un nuevo frame (con timeout de 0.1s)
-                # El timeout es para que el bucle 'while' pueda comprobar el 'stop_event'
-                frame, probabilities = self.frame_queue.get(timeout=0.1)
-                
                 # Escribir el frame de video (la operación lenta)
                 self.video_writer.write(frame)
-                
-                # Guardar el log de predicción
-                log_entry = {
-                    "timestamp_ms": int((time.time() - self.start_time) * 1000),
-                    "probabilities": {
-                        config.CLASSES[0]: float(probabilities[0]),
-                        config.CLASSES[1]: float(probabilities[1]),
-                        config.CLASSES[2]: float(probabilities[2]),
-                    }
-                }
-                self.logs.append(log_entry)
-                
-            except queue.Empty:
-                # No llegaron frames en 0.1s. No hacemos 'sleep' y
-                # volvemos a comprobar la cola y el 'stop_event'.
-                continue
             except Exception as e:
                 # Captura un error de escritura (ej. disco lleno) sin matar el hilo
-                print(f"[Recorder Thread-{self.camera_id}] Error al escribir frame: {e}")
-            
-            # Aplicar el "freno" (sleep)
-            # Esperamos el resto del tiempo asignado (ej. 33.3ms)
-            time_elapsed = time.time() - loop_start_time
-            sleep_time = self.delay_por_frame - time_elapsed
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-        
-        print(f"[Recorder Thread-{self.camera_id}] Hilo de grabación detenido.")
+                print(f"[Recorder-{self.camera_id}] Error al escribir frame: {e}")
+                continue
+
+            # Guardar el registro de predicción (el journal vuelca a disco cada tanto)
+            self.journal.append(int((frame_time - self.start_time) * 1000), probabilities)
+
+        with self.lock:
+            if self.frames:
+                return "pending"
+            if not self.closing:
+                self.scheduled = False
+                return "idle"
+
+        self._finalize()
+        return "done"
 
     def close(self):
-        # Avisa al hilo 'run' que debe parar y espera a que termine.
+        # Marca la grabación como cerrada y vuelve enseguida: el pool escribe
+        # lo que quede en cola y luego finaliza el video y el log.
         if not self.is_open:
             return
-            
-        print(f"[Recorder] Recibida orden de cierre para: {os.path.basename(self.video_path)}...")
-        
-        try:
-            # 1. Avisar al hilo 'run' que debe parar
+
+        print(f"[Recorder] Recibida orden de cierre para: {os.path.basename(self.video_path)} "
+              f"({self.backlog_frames()} frames en cola)")
+
+        with self.lock:
             self.is_open = False
-            self.stop_event.set()
-            
-            # 2. Esperar a que el hilo 'run' termine (procese lo que queda en la cola)
-            self.join() 
-            
-            # 3. Ahora que el hilo está muerto, cerrar el archivo de video
+            self.closing = True
+            if not self.scheduled:
+                self.scheduled = True
+                self.writer_pool.schedule(self)
+
+    def _finalize(self):
+        # Cierra el archivo de video, el journal y guarda el resumen .json (en un hilo del pool)
+        try:
             self.video_writer.release()
-            
-            # 4. Crear y guardar el archivo .json
-            summary = {
-                "camera_id": self.camera_id,
-                "event_start_time": datetime.fromtimestamp(self.start_time).isoformat(),
+            summary = self.journal.close({
                 "event_end_time": datetime.now().isoformat(),
-                "video_file": os.path.basename(self.video_path),
-                "log_file": os.path.basename(self.log_path),
-                "total_logs": len(self.logs),
-                "logs": self.logs
-            }
-            
-            with open(self.log_path, 'w') as f:
-                json.dump(summary, f, indent=4)
-                
+                "dropped_frames": self.dropped_frames,
+                "pre_roll_gap_frames": self.pre_roll_gap_frames,
+            })
+            if self.writer_pool.catalog is not None:
+                try:
+                    event_id = self.writer_pool.catalog.record_event(summary)
+                    print(f"[Recorder] Evento indexado en el catálogo (id={event_id}).")
+                except Exception as e:
+                    # El video y el log ya están en disco: solo falta el índice
+                    print(f"[Recorder] ERROR al indexar el evento en el catálogo: {e}")
+
             print(f"[Recorder] Grabación finalizada. Video guardado en: {self.video_path}")
-            print(f"[Recorder] Log de evento guardado en: {self.log_path}")
+            print(f"[Recorder] Log de evento guardado en: {self.journal_path} (resumen: {self.log_path})")
+            if self.dropped_frames:
+                print(f"[Recorder] ADVERTENCIA: {self.dropped_frames} frames descartados por cola llena "
+                      f"(política '{self.overflow_policy}').")
 
         except Exception as e:
-            print(f"[Recorder] Error al cerrar: {e}")
\ No newline at end of file
+            print(f"[Recorder] Error al cerrar: {e}")
+
+    def _abort(self):
+        # Error inesperado en el pool: liberar el archivo y vaciar la cola
+        with self.lock:
+            self.is_open = False
+            self.frames.clear()
+        try:
+            self.video_writer.release()
+            if self.journal is not None:
+                self.journal.close({"event_end_time": datetime.now().isoformat(), "aborted": True})
+        except Exception:
+            pass
@@ -0,0 +1,166 @@
+import threading
+from multiprocessing import Queue
+from queue import Full
+from typing import Dict, List, Union
+import sys
+import os
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from services.shared_clip_pool import SharedClipPool
+except ImportError as e:
+    print(f"Error fatal en 'inference_dispatcher.py': No se pudo importar 'shared_clip_pool'. {e}")
+    sys.exit(1)
+
+
+class InferenceDispatcher:
+    # Despachador de clips hacia un pool de procesos 'inference_service'.
+    # Vive en su propio proceso ('run_inference_dispatcher'), no en el de la
+    # API: cada clip que pasa por aquí se des-serializa y se vuelve a
+    # serializar, y eso competiría por el GIL con el event loop de FastAPI.
+    # Son dos hilos de fondo:
+    #   - Uno vacía la 'inference_queue' común y reenvía cada clip a la cola
+    #     del proceso de inferencia asignado a su cámara. La asignación es fija:
+    #     si los clips de una cámara se repartieran entre procesos, cada
+    #     'ClipAdmissionBuffer' vería solo parte de su stream (el clip nuevo ya
+    #     no reemplazaría al viejo, ni la planificación sería por cámara) y sus
+    #     resultados podrían llegar desordenados a la 'results_queue'.
+    #     'routing' solo decide a qué proceso va una cámara la primera vez:
+    #       "least_loaded"    -> el proceso con menos clips en curso.
+    #       "camera_affinity" -> el proceso con menos cámaras asignadas.
+    #   - Otro reenvía los cambios de estado de las cámaras ('scheduler_queue')
+    #     a TODOS los procesos, porque cualquiera puede recibir clips de ellas.
+    #
+    # 'in_flight' es un multiprocessing.Array('i', N) compartido: el despachador
+    # suma 1 al enviar un clip y el proceso de inferencia resta 1 cuando lo
+    # termina (servido o descartado).
+
+    def __init__(
+        self,
+        inference_queue: Queue,
+        worker_queues: List[Queue],
+        in_flight,
+        routing: str = "least_loaded",
+        clip_pool: Union[SharedClipPool, None] = None,
+        scheduler_queue: Union[Queue, None] = None,
+        worker_scheduler_queues: Union[List[Queue], None] = None
+    ):
+        if routing not in ("least_loaded", "camera_affinity"):
+            raise ValueError(f"Tipo de reparto no válido: {routing}")
+
+        self.inference_queue = inference_queue
+        self.worker_queues = worker_queues
+        self.in_flight = in_flight
+        self.routing = routing
+        self.clip_pool = clip_pool
+        self.scheduler_queue = scheduler_queue
+        self.worker_scheduler_queues = worker_scheduler_queues or []
+
+        self.affinity: Dict[str, int] = {} # Cámara -> proceso (fijo)
+        self.dispatched = [0] * len(worker_queues) # Clips enviados a cada proceso
+        self.dropped_clips = 0 # Clips descartados porque la cola del proceso estaba llena
+
+    def start(self) -> threading.Thread:
+        # Inicia los hilos de fondo (daemon: mueren con el proceso) y devuelve
+        # el hilo de reparto
+        dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        dispatch_thread.start()
+        if self.scheduler_queue is not None and self.worker_scheduler_queues:
+            threading.Thread(target=self._forward_camera_states, daemon=True).start()
+        print(f"[Dispatcher] Repartiendo clips entre {len(self.worker_queues)} procesos de inferencia ('{self.routing}').")
+        return dispatch_thread
+
+    def _route(self, camera_id: str) -> int:
+        # Devuelve el índice del proceso de inferencia asignado a 'camera_id'
+        # (lo asigna la primera vez que se ve la cámara)
+        worker = self.affinity.get(camera_id)
+        if worker is not None:
+            return worker
+
+        if self.routing == "camera_affinity":
+            loads = [0] * len(self.worker_queues)
+            for assigned in self.affinity.values():
+                loads[assigned] += 1
+        else:
+            with self.in_flight.get_lock():
+                loads = list(self.in_flight)
+        worker = min(range(len(loads)), key=lambda index: loads[index])
+
+        self.affinity[camera_id] = worker
+        print(f"[Dispatcher] Cámara {camera_id} asignada al proceso {worker}.")
+        return worker
+
+    def _dispatch_loop(self):
+        # item = (camera_id, payload, enqueued_at), igual que en la 'inference_queue'
+        while True:
+            try:
+                item = self.inference_queue.get()
+            except (EOFError, OSError):
+                break # La cola se cerró (el proceso se está apagando)
+
+            try:
+                camera_id, payload, _ = item
+                worker = self._route(camera_id)
+
+                with self.in_flight.get_lock():
+                    self.in_flight[worker] += 1
+                try:
+                    self.worker_queues[worker].put_nowait(item)
+                    self.dispatched[worker] += 1
+                except Full:
+                    with self.in_flight.get_lock():
+                        self.in_flight[worker] -= 1
+                    if isinstance(payload, int) and self.clip_pool is not None:
+                        self.clip_pool.release(payload)
+                    self.dropped_clips += 1
+                    print(f"[Dispatcher] ADVERTENCIA: Cola del proceso {worker} llena. Clip de {camera_id} descartado (total: {self.dropped_clips}).")
+
+            except Exception as e:
+                print(f"[Dispatcher] Error al repartir un clip: {e}")
+
+    def _forward_camera_states(self):
+        # item = (camera_id, "RECORDING" | "IDLE")
+        while True:
+            try:
+                item = self.scheduler_queue.get()
+            except (EOFError, OSError):
+                break
+
+            for worker_queue in self.worker_scheduler_queues:
+                try:
+                    worker_queue.put_nowait(item)
+                except Full:
+                    pass
+                except Exception as e:
+                    print(f"[Dispatcher] Error al reenviar un estado de cámara: {e}")
+
+
+def run_inference_dispatcher(
+    inference_queue: Queue,
+    worker_queues: List[Queue],
+    in_flight,
+    routing: str = "least_loaded",
+    clip_pool: Union[SharedClipPool, None] = None,
+    scheduler_queue: Union[Queue, None] = None,
+    worker_scheduler_queues: Union[List[Queue], None] = None
+):
+    # Esta función se ejecuta en un proceso dedicado (lo lanza 'run_app.py'
+    # cuando INFERENCE_NUM_WORKERS > 1). Bloquea hasta que se cierra la
+    # 'inference_queue' o se detiene el proceso.
+    dispatcher = InferenceDispatcher(
+        inference_queue,
+        worker_queues,
+        in_flight,
+        routing=routing,
+        clip_pool=clip_pool,
+        scheduler_queue=scheduler_queue,
+        worker_scheduler_queues=worker_scheduler_queues
+    )
+    try:
+        dispatcher.start().join()
+    except (KeyboardInterrupt, SystemExit):
+        print("[Dispatcher] Deteniendo...")
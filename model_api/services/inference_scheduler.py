@@ -0,0 +1,144 @@
+import time
+import sys
+import os
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple, Union
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from services.clip_admission import ClipAdmissionBuffer
+except ImportError as e:
+    print(f"Error fatal en 'inference_scheduler.py': No se pudo importar 'clip_admission'. {e}")
+    sys.exit(1)
+
+
+class FairClipScheduler(ClipAdmissionBuffer):
+    # Planificador justo entre cámaras para el 'inference_service'.
+    # Mantiene las mismas políticas de admisión que 'ClipAdmissionBuffer'
+    # (una cola por cámara, reemplazo y caducidad), pero en lugar de servir
+    # en orden FIFO global, reparte los lotes con "Weighted Fair Queueing":
+    #
+    #   - Cada cámara tiene un "tiempo virtual". Servir un clip lo avanza en
+    #     1 / peso. Siempre se sirve la cámara con menor tiempo virtual, así
+    #     unas pocas cámaras muy activas no pueden acaparar los lotes.
+    #   - Una cámara que vuelve de estar inactiva parte (como mucho un turno
+    #     por detrás) del tiempo virtual global: no acumula "crédito" mientras
+    #     no envía clips.
+    #   - Las cámaras con un evento activo ("RECORDING" en el 'event_manager')
+    #     multiplican su peso por 'priority_boost'.
+    #
+    # Solo cambia el resultado bajo contención, cuando hay más clips pendientes
+    # que lugares en el lote: cámaras x max_pending_per_camera > MAX_BATCH_SIZE
+    # (con los valores por defecto, más de 16 cámaras por proceso). Por debajo
+    # todo clip pendiente entra en el siguiente lote, igual que con "fifo".
+    # En ese régimen "fifo" deja sin servir siempre a las mismas cámaras y
+    # "fair" las alterna, sirviendo primero a las que graban
+    # ('python run_benchmark.py scheduler --cameras 32').
+
+    def __init__(
+        self,
+        max_pending_per_camera: int,
+        max_age_seconds: Union[float, None],
+        on_discard: Union[Callable[[Any], None], None] = None,
+        camera_weights: Union[Dict[str, float], None] = None,
+        priority_boost: float = 1.0,
+        rate_window_seconds: float = 60.0,
+        active_window_seconds: float = 2.0,
+        quiet_seconds: Union[float, None] = None
+    ):
+        super().__init__(max_pending_per_camera, max_age_seconds, on_discard, active_window_seconds, quiet_seconds)
+        self.camera_weights = camera_weights or {}
+        self.priority_boost = priority_boost
+        self.rate_window_seconds = rate_window_seconds
+
+        self.priority_cameras: set = set() # Cámaras con un evento activo
+        self.virtual_times: Dict[str, float] = {}
+        self.global_virtual_time = 0.0
+
+        # Estadísticas de servicio por cámara
+        self.served_times: Dict[str, Deque[float]] = {} # Momentos en que se sirvió un clip
+        self.total_wait: Dict[str, float] = {}          # Suma de esperas en cola (s)
+
+    def set_priority(self, camera_id: str, active: bool):
+        # Activa o desactiva el impulso de prioridad de una cámara
+        with self.condition:
+            if active:
+                self.priority_cameras.add(camera_id)
+            else:
+                self.priority_cameras.discard(camera_id)
+
+    def _weight(self, camera_id: str) -> float:
+        weight = self.camera_weights.get(camera_id, 1.0)
+        if camera_id in self.priority_cameras:
+            weight *= self.priority_boost
+        return weight
+
+    def offer(self, camera_id: str, payload: Any, enqueued_at: float):
+        with self.condition:
+            # Una cámara que estaba inactiva no acumula crédito: como mucho
+            # queda un turno (1 / peso) por detrás del tiempo virtual global
+            if not self.pending.get(camera_id):
+                self.virtual_times[camera_id] = max(
+                    self.virtual_times.get(camera_id, 0.0),
+                    self.global_virtual_time - 1.0 / self._weight(camera_id)
+                )
+            super().offer(camera_id, payload, enqueued_at)
+
+    def _select(self, max_batch_size: int) -> List[Tuple[str, Any, float]]:
+        # Elige los clips del lote por menor tiempo virtual (desempate: el más antiguo)
+        batch = []
+        now_wall = time.time()
+        now = time.monotonic()
+
+        while len(batch) < max_batch_size:
+            ready = [camera_id for camera_id, clips in self.pending.items() if clips]
+            if not ready:
+                break
+
+            camera_id = min(
+                ready,
+                key=lambda c: (self.virtual_times.get(c, 0.0), self.pending[c][0][1])
+            )
+            payload, enqueued_at = self.pending[camera_id].popleft()
+
+            virtual_time = self.virtual_times.get(camera_id, 0.0)
+            self.global_virtual_time = max(self.global_virtual_time, virtual_time)
+            self.virtual_times[camera_id] = virtual_time + 1.0 / self._weight(camera_id)
+
+            # Estadísticas de servicio
+            self.served_times.setdefault(camera_id, deque()).append(now)
+            self.total_wait[camera_id] = self.total_wait.get(camera_id, 0.0) + max(0.0, now_wall - enqueued_at)
+
+            batch.append((camera_id, payload, enqueued_at))
+        return batch
+
+    def service_rates(self) -> Dict[str, Dict[str, float]]:
+        # Estadísticas por cámara: clips/s servidos en la ventana reciente,
+        # espera media en cola (s) y si tiene prioridad activa.
+        with self.condition:
+            now = time.monotonic()
+            rates = {}
+            for camera_id, times in self.served_times.items():
+                while times and times[0] < now - self.rate_window_seconds:
+                    times.popleft()
+                served = self.stats.get(camera_id, {}).get("served", 0)
+                rates[camera_id] = {
+                    "clips_per_second": len(times) / self.rate_window_seconds,
+                    "mean_wait_seconds": self.total_wait.get(camera_id, 0.0) / served if served else 0.0,
+                    "priority": float(camera_id in self.priority_cameras),
+                }
+            return rates
+
+    def format_stats(self) -> str:
+        # Añade la tasa de servicio al resumen de admisión
+        rates = self.service_rates()
+        service = " | ".join(
+            f"{camera_id}: {r['clips_per_second']:.2f} clips/s, espera media {r['mean_wait_seconds'] * 1000:.0f} ms"
+            + (" (PRIORIDAD)" if r["priority"] else "")
+            for camera_id, r in sorted(rates.items())
+        )
+        return f"{super().format_stats()} || Servicio: {service}"
@@ -1,6 +1,9 @@
 import numpy as np
 import time
+import threading
 from multiprocessing import Queue
+from queue import Full
+from typing import Union
 import sys
 import os
 
@@ -9,59 +12,233 @@ import os
 model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(model_api_root)
 
-def run_inference_service(inference_queue: Queue, results_queue: Queue):
+from services.shared_clip_pool import SharedClipPool
+
+def run_inference_service(
+    inference_queue: Queue,
+    results_queue: Queue,
+    clip_pool: Union[SharedClipPool, None] = None,
+    scheduler_queue: Union[Queue, None] = None,
+    worker_id: Union[int, None] = None,
+    in_flight=None,
+    intra_op_num_threads: Union[int, None] = None,
+    inter_op_num_threads: Union[int, None] = None,
+    metrics_queue: Union[Queue, None] = None
+):
     # Esta función se ejecuta en un proceso de GPU dedicado.
-    # PROCESA CLIPS DE UNO EN UNO (Batch Size = 1)
-    # Esta es la corrección para el error [ONNXRuntimeError... Reshape node]
-    # que indica que el modelo exportado no soporta 'batching' dinámico.
+    # Junta clips de VARIAS cámaras en un lote (micro-batching) hasta
+    # llenar 'MAX_BATCH_SIZE' o agotar 'BATCH_TIMEOUT_SECONDS'.
+    # Si el modelo exportado no soporta 'batching' dinámico (el error
+    # [ONNXRuntimeError... Reshape node]), 'ViolenceDetector' trocea el lote.
+    # Si se recibe un 'clip_pool' (SharedClipPool), los items de la cola traen
+    # el índice del slot en lugar del tensor, y el clip se lee sin copiarlo.
+    # Entre la cola y el detector hay un 'ClipAdmissionBuffer': como máximo un
+    # clip pendiente por cámara (el más nuevo) y se descartan los caducados.
+    # Con INFERENCE_SCHEDULER = "fair" se usa 'FairClipScheduler', que reparte
+    # los lotes de forma justa entre cámaras y prioriza las que están grabando
+    # un evento (el 'event_manager' avisa por 'scheduler_queue').
+    # Con INFERENCE_NUM_WORKERS > 1 hay varios procesos como este, cada uno con
+    # su propia cola ('InferenceDispatcher'): 'worker_id' es su índice y
+    # 'in_flight' el contador compartido de clips en curso por proceso.
     
     # Importaciones movidas DENTRO de la función
     # Esto previene 'deadlocks' de CUDA al iniciar el proceso en Windows
     try:
         from onnx_model.onnx_detector import ViolenceDetector
+        from services.clip_admission import ClipAdmissionBuffer
+        from services.inference_scheduler import FairClipScheduler
+        from services.metrics_reporter import MetricsReporter
         from config import config
     except ImportError as e:
         print(f"[InferenceService] Error de importación: {e}")
         return
 
-    print("[InferenceService] Proceso iniciado.")
+    tag = "InferenceService" if worker_id is None else f"InferenceService-{worker_id}"
+    print(f"[{tag}] Proceso iniciado.")
     try:
         # 1. Crear la instancia del detector
         # (El modelo real se cargará en la primera predicción - Lazy Loading)
-        detector = ViolenceDetector()
+        detector = ViolenceDetector(intra_op_num_threads, inter_op_num_threads)
     except Exception as e:
-        print(f"[InferenceService] CRÍTICO: No se pudo instanciar ViolenceDetector: {e}")
+        print(f"[{tag}] CRÍTICO: No se pudo instanciar ViolenceDetector: {e}")
         return  
 
-    print(f"[InferenceService] Esperando el primer clip para cargar el modelo...")
+    def mark_done(num_clips: int):
+        # Descuenta clips terminados del contador del despachador
+        if in_flight is not None and num_clips:
+            with in_flight.get_lock():
+                in_flight[worker_id] -= num_clips
+
+    def release_payload(payload):
+        # Libera el slot de memoria compartida de un clip descartado
+        if isinstance(payload, int):
+            clip_pool.release(payload)
+        mark_done(1)
+
+    # 2. Buffer de admisión, alimentado por un hilo que vacía la 'inference_queue'
+    # item = (camera_id, tensor_data, enqueued_at) o (camera_id, slot, enqueued_at)
+    if config.INFERENCE_SCHEDULER == "fair":
+        admission = FairClipScheduler(
+            max_pending_per_camera=config.INFERENCE_MAX_PENDING_PER_CAMERA,
+            max_age_seconds=config.INFERENCE_MAX_CLIP_AGE_SECONDS,
+            on_discard=release_payload,
+            camera_weights=config.INFERENCE_CAMERA_WEIGHTS,
+            priority_boost=config.INFERENCE_PRIORITY_BOOST,
+            rate_window_seconds=config.INFERENCE_RATE_WINDOW_SECONDS,
+            active_window_seconds=config.INFERENCE_ACTIVE_CAMERA_SECONDS,
+            quiet_seconds=config.INFERENCE_BATCH_QUIET_SECONDS
+        )
+    else:
+        admission = ClipAdmissionBuffer(
+            max_pending_per_camera=config.INFERENCE_MAX_PENDING_PER_CAMERA,
+            max_age_seconds=config.INFERENCE_MAX_CLIP_AGE_SECONDS,
+            on_discard=release_payload,
+            active_window_seconds=config.INFERENCE_ACTIVE_CAMERA_SECONDS,
+            quiet_seconds=config.INFERENCE_BATCH_QUIET_SECONDS
+        )
+    feeder = threading.Thread(
+        target=_feed_admission_buffer,
+        args=(inference_queue, admission),
+        daemon=True
+    )
+    feeder.start()
+
+    # 2b. Hilo que recibe los cambios de estado de las cámaras (prioridad)
+    if scheduler_queue is not None and isinstance(admission, FairClipScheduler):
+        priority_listener = threading.Thread(
+            target=_listen_camera_states,
+            args=(scheduler_queue, admission),
+            daemon=True
+        )
+        priority_listener.start()
+
+    # Métricas por cámara hacia la API (no hace nada si 'metrics_queue' es None)
+    metrics = MetricsReporter(metrics_queue)
+
+    print(f"[{tag}] Esperando el primer clip para cargar el modelo...")
+    dropped_results = 0
+    reported_admission = {} # Contadores de admisión ya enviados a /metrics
+    last_stats_time = time.monotonic()
     
-    # 2. Bucle infinito para procesar clips (uno por uno)
+    # 3. Bucle infinito para procesar lotes de clips
     while True:
         try:
-            # 1. Obtener UN clip (bloqueante)
-            # item = (camera_id, tensor_data)
+            # 1. Obtener un LOTE de clips (bloqueante hasta el primero)
             # tensor_data tiene forma (3, 32, 224, 224)
-            camera_id, clip_tensor = inference_queue.get()
+            batch_items = admission.take_batch(
+                config.MAX_BATCH_SIZE,
+                config.BATCH_TIMEOUT_SECONDS
+            )
+            if not batch_items:
+                _report_admission_stats(metrics, admission, reported_admission)
+                metrics.maybe_flush()
+                continue # Todos los clips pendientes caducaron
 
-            # 2. Crear un Lote de 1
-            # Añadimos la dimensión 'N' (N=1)
-            batch_tensor = np.expand_dims(clip_tensor, axis=0) # Forma -> (1, 3, 32, 224, 224)
+            # Espera de cada clip desde que el worker lo encoló
+            batch_start = time.time()
+            for camera_id, _, enqueued_at in batch_items:
+                metrics.observe("queue_wait_seconds", camera_id, max(0.0, batch_start - enqueued_at))
 
-            # 3. Predecir (Lote de 1)
-            # La primera vez que se llame, cargará el modelo.
-            # batch_probs tendrá forma (1, 3)
-            batch_probs = detector.predict_batch(batch_tensor)
+            camera_ids = [camera_id for camera_id, _, _ in batch_items]
+            slots = [payload for _, payload, _ in batch_items if isinstance(payload, int)]
+
+            try:
+                # 2. Apilar los clips en un solo tensor
+                # Los slots de memoria compartida se leen como vistas (sin copia)
+                clips = [
+                    clip_pool.view(payload) if isinstance(payload, int) else payload
+                    for _, payload, _ in batch_items
+                ]
+                if len(clips) == 1:
+                    batch_tensor = clips[0][np.newaxis] # Vista, sin copia -> (1, 3, 32, 224, 224)
+                else:
+                    batch_tensor = np.stack(clips, axis=0) # Forma -> (N, 3, 32, 224, 224)
+
+                # 3. Predecir el lote completo
+                # La primera vez que se llame, cargará el modelo.
+                # batch_probs tendrá forma (N, 3)
+                inference_start = time.perf_counter()
+                batch_probs = detector.predict_batch(batch_tensor)
+                inference_seconds = time.perf_counter() - inference_start
+            finally:
+                # Liberar los slots (incluso si la predicción falló)
+                for slot in slots:
+                    clip_pool.release(slot)
+                mark_done(len(batch_items))
             
-            # 4. Poner en la Cola de Resultados
-            # Extraemos la primera (y única) predicción del lote
-            probabilities = batch_probs[0] # Forma -> (3,)
-            results_queue.put((camera_id, probabilities))
+            # 4. Repartir los resultados a la Cola de Resultados (uno por cámara)
+            # (La cola está acotada: si la API no da abasto, se descarta el resultado)
+            produced_at = time.time()
+            for camera_id, probabilities in zip(camera_ids, batch_probs):
+                metrics.observe("inference_seconds", camera_id, inference_seconds)
+                metrics.increment("clips_inferred_total", camera_id)
+                try:
+                    results_queue.put_nowait((camera_id, probabilities, produced_at)) # Forma -> (3,)
+                except Full:
+                    dropped_results += 1
+                    metrics.increment("results_dropped_total", camera_id)
+                    print(f"[{tag}] ADVERTENCIA: 'results_queue' llena. Resultado de {camera_id} descartado (total: {dropped_results}).")
+
+            # 5. Resumen periódico de la admisión de clips
+            if time.monotonic() - last_stats_time >= config.INFERENCE_STATS_INTERVAL_SECONDS:
+                print(f"[{tag}] Admisión: {admission.format_stats()}")
+                last_stats_time = time.monotonic()
+            _report_admission_stats(metrics, admission, reported_admission)
+            metrics.maybe_flush()
 
         except (KeyboardInterrupt, SystemExit):
-            print("[InferenceService] Deteniendo...")
+            print(f"[{tag}] Deteniendo...")
             break
         except Exception as e:
             # Si un tensor corrupto (NaN) logra pasar, este 'try'
-            # lo atrapará y solo fallará ese clip, no todo el servicio.
-            print(f"[InferenceService] Error en el bucle principal: {e}")
-            time.sleep(0.1) # Pausa breve para evitar inundar logs si hay un error
\ No newline at end of file
+            # lo atrapará y solo fallará ese lote, no todo el servicio.
+            print(f"[{tag}] Error en el bucle principal: {e}")
+            time.sleep(0.1) # Pausa breve para evitar inundar logs si hay un error
+
+
+def _report_admission_stats(metrics, admission, reported: dict):
+    # Pasa a /metrics lo que cambió en los contadores de admisión por cámara
+    # (reemplazados y caducados) desde la última vez. 'reported' guarda los
+    # valores ya enviados, porque los contadores del reporter son incrementos.
+    # Las tasas del planificador son gauges: se envía el último valor.
+    if not metrics.enabled:
+        return
+    for camera_id, stats in admission.stats_snapshot().items():
+        for stat, metric in (("coalesced", "clips_coalesced_total"), ("dropped_stale", "clips_dropped_stale_total")):
+            delta = stats[stat] - reported.get((camera_id, stat), 0)
+            if delta:
+                metrics.increment(metric, camera_id, delta)
+                reported[(camera_id, stat)] = stats[stat]
+
+    # Con 'FairClipScheduler', además la tasa de servicio por cámara (gauges)
+    if hasattr(admission, "service_rates"):
+        for camera_id, rates in admission.service_rates().items():
+            metrics.set_gauge("scheduler_clips_per_second", camera_id, rates["clips_per_second"])
+            metrics.set_gauge("scheduler_mean_wait_seconds", camera_id, rates["mean_wait_seconds"])
+
+
+def _feed_admission_buffer(inference_queue: Queue, admission):
+    # Hilo de fondo: mueve todo lo que llega por la 'inference_queue' al
+    # buffer de admisión, para que la cola entre procesos se mantenga vacía
+    # y el reemplazo por cámara ocurra aquí.
+    while True:
+        try:
+            camera_id, payload, enqueued_at = inference_queue.get()
+            admission.offer(camera_id, payload, enqueued_at)
+        except (EOFError, OSError):
+            break # La cola se cerró (el proceso se está apagando)
+        except Exception as e:
+            print(f"[InferenceService] Error al recibir un clip: {e}")
+
+
+def _listen_camera_states(scheduler_queue: Queue, scheduler):
+    # Hilo de fondo: aplica los cambios de estado que envía el 'event_manager'.
+    # item = (camera_id, "RECORDING" | "IDLE")
+    while True:
+        try:
+            camera_id, state = scheduler_queue.get()
+            scheduler.set_priority(camera_id, state == "RECORDING")
+        except (EOFError, OSError):
+            break # La cola se cerró (el proceso se está apagando)
+        except Exception as e:
+            print(f"[InferenceService] Error al recibir un estado de cámara: {e}")
@@ -0,0 +1,138 @@
+import bisect
+import time
+from multiprocessing import Queue
+from queue import Full
+from typing import Dict, List, Tuple, Union
+import sys
+import os
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'metrics_reporter.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+
+# Catálogo de métricas del pipeline: nombre -> (tipo, descripción).
+# Todas llevan la etiqueta 'camera'. Los histogramas son en segundos y usan
+# los límites de config.METRICS_LATENCY_BUCKETS.
+METRIC_DEFINITIONS: Dict[str, Tuple[str, str]] = {
+    # camera_worker
+    "decode_seconds": ("histogram", "Tiempo de lectura/decodificación de un frame"),
+    "person_detection_seconds": ("histogram", "Tiempo del pre-filtro de conteo de personas"),
+    "preprocess_seconds": ("histogram", "Tiempo de preprocesado de un clip"),
+    "frames_total": ("counter", "Frames leídos"),
+    "clips_sent_total": ("counter", "Clips enviados a la 'inference_queue'"),
+    "clips_dropped_total": ("counter", "Clips descartados en el worker (cola llena o sin slot)"),
+    "recorder_backlog_frames": ("gauge", "Frames pendientes de escribir en el pool de grabación de eventos"),
+    "recorder_frames_dropped_total": ("counter", "Frames descartados por la cola llena de una grabación"),
+    "preroll_frames_dropped_total": ("counter", "Frames que el codificador del pre-rollo omitió por ir atrasado (quedan como huecos)"),
+    # inference_service
+    "queue_wait_seconds": ("histogram", "Espera de un clip desde el worker hasta entrar en un lote"),
+    "inference_seconds": ("histogram", "Tiempo de inferencia del lote que incluyó el clip"),
+    "clips_inferred_total": ("counter", "Clips procesados por el detector de violencia"),
+    "results_dropped_total": ("counter", "Resultados descartados por 'results_queue' llena"),
+    "clips_coalesced_total": ("counter", "Clips reemplazados en la admisión por uno más nuevo de la misma cámara"),
+    "clips_dropped_stale_total": ("counter", "Clips descartados en la admisión por superar INFERENCE_MAX_CLIP_AGE_SECONDS"),
+    "scheduler_clips_per_second": ("gauge", "Clips/s servidos en INFERENCE_RATE_WINDOW_SECONDS (solo con INFERENCE_SCHEDULER = 'fair')"),
+    "scheduler_mean_wait_seconds": ("gauge", "Espera media en cola de los clips servidos (solo con INFERENCE_SCHEDULER = 'fair')"),
+    # API (event_manager)
+    "result_to_broadcast_seconds": ("histogram", "Tiempo desde que se produjo un resultado hasta su envío por WebSocket"),
+    "results_broadcast_total": ("counter", "Resultados enviados a los clientes WebSocket"),
+    # API (ConnectionManager)
+    "ws_clients": ("gauge", "Clientes WebSocket conectados"),
+    "ws_client_lag_seconds": ("gauge", "Antigüedad del mensaje pendiente más viejo entre los clientes de la cámara (sin contar el intervalo de envío)"),
+    "ws_client_queue_messages": ("gauge", "Mensajes en la cola de salida del cliente más atrasado"),
+    "ws_messages_dropped_total": ("counter", "Mensajes descartados por clientes lentos (política 'drop_oldest')"),
+    "ws_slow_clients_disconnected_total": ("counter", "Clientes desconectados por lentos"),
+    "ws_messages_coalesced_total": ("counter", "Resultados reemplazados por uno más nuevo antes de enviarse (clientes con 'max_rate')"),
+}
+
+# Clave de una serie: (nombre de la métrica, camera_id)
+SeriesKey = Tuple[str, str]
+
+
+class MetricsReporter:
+    # Acumula métricas dentro de un proceso ('camera_worker', 'inference_service')
+    # y cada METRICS_FLUSH_INTERVAL_SECONDS envía un resumen a la API por la
+    # 'metrics_queue'. Los histogramas se agregan aquí (conteos por bucket),
+    # así cada observación cuesta una búsqueda binaria y no un mensaje entre
+    # procesos.
+    #
+    # Mensaje = {"histograms": {clave: (conteos_por_bucket, suma, total)},
+    #            "counters": {clave: incremento}, "gauges": {clave: valor}}
+    # Histogramas y contadores viajan como incrementos desde el último envío;
+    # los gauges, como el último valor.
+
+    def __init__(self, metrics_queue: Union[Queue, None], flush_interval_seconds: Union[float, None] = None):
+        # Con 'metrics_queue' = None el reporter no hace nada (métricas desactivadas)
+        self.metrics_queue = metrics_queue
+        self.enabled = metrics_queue is not None
+        self.flush_interval_seconds = (
+            config.METRICS_FLUSH_INTERVAL_SECONDS if flush_interval_seconds is None else flush_interval_seconds
+        )
+        self.buckets: List[float] = list(config.METRICS_LATENCY_BUCKETS)
+
+        self.histograms: Dict[SeriesKey, List] = {}
+        self.counters: Dict[SeriesKey, float] = {}
+        self.gauges: Dict[SeriesKey, float] = {}
+        self.last_flush = time.monotonic()
+        self.dropped_reports = 0
+
+    def observe(self, name: str, camera_id: str, seconds: float):
+        # Registra una duración en el histograma 'name'
+        if not self.enabled:
+            return
+        key = (name, camera_id)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            # [conteos por bucket (+Inf al final), suma, total]
+            histogram = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self.histograms[key] = histogram
+        histogram[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def increment(self, name: str, camera_id: str, amount: float = 1):
+        if not self.enabled:
+            return
+        key = (name, camera_id)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, camera_id: str, value: float):
+        if not self.enabled:
+            return
+        self.gauges[(name, camera_id)] = value
+
+    def maybe_flush(self):
+        # Envía el resumen si ya pasó el intervalo (llamar en cada vuelta del bucle)
+        if self.enabled and time.monotonic() - self.last_flush >= self.flush_interval_seconds:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled:
+            return
+        self.last_flush = time.monotonic()
+        if not (self.histograms or self.counters or self.gauges):
+            return
+
+        report = {
+            "histograms": {key: (h[0], h[1], h[2]) for key, h in self.histograms.items()},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+        try:
+            self.metrics_queue.put_nowait(report)
+        except Full:
+            # La API no está leyendo: se acumula hasta el siguiente intervalo
+            # (nunca se bloquea el pipeline por las métricas)
+            self.dropped_reports += 1
+            return
+
+        self.histograms.clear()
+        self.counters.clear()
@@ -0,0 +1,358 @@
+import hashlib
+import json
+import multiprocessing
+import time
+import sys
+import os
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+    from processing.video_processor import FramePreprocessCache
+    from processing.frame_ring_buffer import FrameRingBuffer
+    from services.stream_reader.file_reader import FileReader
+except ImportError as e:
+    print(f"Error fatal en 'offline_scorer.py': No se pudo importar un módulo. {e}")
+    sys.exit(1)
+
+
+# Modo offline: puntúa un archivo de videos lo más rápido posible.
+# Reutiliza 'FileReader', 'FramePreprocessCache' y 'ViolenceDetector' sin las
+# pausas de tiempo real del 'camera_worker' y sin el pre-filtro de personas
+# (se puntúan TODAS las ventanas). Los videos se reparten entre un pool de
+# procesos; cada proceso junta las ventanas de su video en lotes.
+#
+# Salida (en 'output_dir'):
+#   - "jsonl": 'scores.jsonl', una línea por ventana.
+#   - "npz":   un '.npz' columnar por video (start_frame, end_frame,
+#              start_seconds, end_seconds, scores (W, num_clases)). El nombre
+#              lleva la ruta completa del video y un hash corto de la clave
+#              (ej. 'a__b.avi-1f2e3d4c.npz'); queda anotado en el manifiesto.
+#   - 'manifest.jsonl': una línea por video terminado (ruta, tamaño, mtime
+#     y modelo). Al reanudar se omiten los videos que ya están en el
+#     manifiesto con el mismo archivo y el mismo modelo.
+
+SCORES_FILENAME = "scores.jsonl"
+MANIFEST_FILENAME = "manifest.jsonl"
+
+# Detector del proceso del pool (uno por proceso, se crea en el initializer)
+_process_detector = None
+
+
+def score_video(video_path: str, detector, batch_size: int) -> Dict[str, Any]:
+    # Puntúa todas las ventanas (CLIP_LEN frames, cada STRIDE) de un video.
+    # Devuelve las columnas de la salida (listas / arrays del mismo largo).
+    reader = FileReader([video_path], prefetch=True, loop=False)
+    try:
+        fps = reader.get_fps()
+        if fps == 0 or fps > 1000:
+            fps = config.TARGET_FPS
+        window_size = int(config.CLIP_LEN / config.TARGET_FPS * fps)
+
+        frame_ring = FrameRingBuffer(window_size)
+        frame_cache = FramePreprocessCache()
+
+        start_frames: List[int] = []
+        score_batches: List[np.ndarray] = []
+        pending_clips: List[np.ndarray] = []
+
+        def run_pending():
+            score_batches.append(detector.predict_batch(np.stack(pending_clips, axis=0)))
+            pending_clips.clear()
+
+        frame_counter = 0
+        while True:
+            ret, frame = reader.read()
+            if not ret:
+                break
+            frame_counter += 1
+            frame_ring.append(frame)
+
+            if len(frame_ring) < window_size or frame_counter % config.STRIDE != 0:
+                continue
+
+            first_frame_index = frame_counter - window_size
+            pending_clips.append(frame_cache.preprocess_clip(
+                frame_ring.latest(window_size), first_frame_index, as_uint8=config.UINT8_CLIP_TRANSPORT
+            ))
+            start_frames.append(first_frame_index)
+            if len(pending_clips) >= batch_size:
+                run_pending()
+
+        if pending_clips:
+            run_pending()
+    finally:
+        reader.release()
+
+    start = np.asarray(start_frames, dtype=np.int64)
+    scores = (
+        np.concatenate(score_batches, axis=0).astype(np.float32)
+        if score_batches else np.empty((0, len(config.CLASSES)), dtype=np.float32)
+    )
+    return {
+        "fps": float(fps),
+        "num_frames": frame_counter,
+        "start_frame": start,
+        "end_frame": start + window_size - 1,
+        "start_seconds": start / fps,
+        "end_seconds": (start + window_size) / fps,
+        "scores": scores,
+    }
+
+
+def _init_scoring_process(model_path: Union[str, None], intra_op_num_threads: Union[int, None]):
+    # Initializer del pool: un ViolenceDetector por proceso (se carga en el primer lote)
+    global _process_detector
+    from onnx_model.onnx_detector import ViolenceDetector
+    _process_detector = ViolenceDetector(intra_op_num_threads, 1, model_path=model_path)
+
+
+def _score_video_task(task: tuple) -> Dict[str, Any]:
+    # Tarea del pool: (clave, ruta, tamaño de lote) -> resultado o error
+    video_key, video_path, batch_size = task
+    start = time.perf_counter()
+    try:
+        result = score_video(video_path, _process_detector, batch_size)
+        return {"video": video_key, "result": result, "error": None, "seconds": time.perf_counter() - start}
+    except Exception as e:
+        return {"video": video_key, "result": None, "error": str(e), "seconds": time.perf_counter() - start}
+
+
+def model_fingerprint(model_path: str) -> str:
+    # Identifica la versión del modelo (un modelo nuevo invalida las puntuaciones)
+    stat = os.stat(model_path)
+    return f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def _file_signature(video_path: str) -> Dict[str, Any]:
+    stat = os.stat(video_path)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+class OfflineScoreStore:
+    # Escribe las puntuaciones y el manifiesto de una ejecución (reanudable).
+
+    def __init__(self, output_dir: str, output_format: str, model_id: str):
+        if output_format not in ("jsonl", "npz"):
+            raise ValueError(f"Formato de salida no válido: {output_format}")
+
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.model_id = model_id
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.scores_path = os.path.join(output_dir, SCORES_FILENAME)
+
+        # Videos ya terminados: clave -> entrada del manifiesto (la última gana)
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # Línea cortada por una interrupción
+                    self.completed[entry["video"]] = entry
+
+        self.scores_file = None
+        self.manifest_file = None
+
+    def open(self, rescore_keys: set):
+        # Abre los archivos de salida. 'rescore_keys' son los videos que se
+        # puntúan en esta ejecución (sus líneas anteriores se descartan).
+        if self.output_format == "jsonl":
+            self._compact_scores(rescore_keys)
+            self.scores_file = open(self.scores_path, "a", encoding="utf-8")
+        self.manifest_file = open(self.manifest_path, "a", encoding="utf-8")
+
+    def is_done(self, video_key: str, video_path: str) -> bool:
+        # True si el video ya se puntuó (mismo archivo y mismo modelo)
+        entry = self.completed.get(video_key)
+        if entry is None or entry.get("model") != self.model_id:
+            return False
+        signature = _file_signature(video_path)
+        return entry.get("size") == signature["size"] and entry.get("mtime") == signature["mtime"]
+
+    def _compact_scores(self, rescore_keys: set):
+        # Quita de 'scores.jsonl' las líneas de videos que no llegaron al
+        # manifiesto con el modelo actual (ejecución interrumpida u otro modelo)
+        # o que se van a volver a puntuar en esta ejecución ('rescore_keys'),
+        # para que no queden duplicadas. Las de videos terminados que no están
+        # en esta ejecución se conservan.
+        if not os.path.exists(self.scores_path):
+            return
+
+        temp_path = self.scores_path + ".tmp"
+        kept = removed = 0
+        with open(self.scores_path, "r", encoding="utf-8") as src, open(temp_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                try:
+                    video_key = json.loads(line)["video"]
+                except (json.JSONDecodeError, KeyError):
+                    removed += 1
+                    continue
+                entry = self.completed.get(video_key)
+                valid = entry is not None and entry.get("model") == self.model_id
+                if valid and video_key not in rescore_keys:
+                    dst.write(line)
+                    kept += 1
+                else:
+                    removed += 1
+        os.replace(temp_path, self.scores_path)
+        if removed:
+            print(f"[OfflineScorer] {removed} ventanas de videos incompletos o por repuntuar eliminadas de '{SCORES_FILENAME}' ({kept} conservadas).")
+
+    def _npz_filename(self, video_key: str) -> str:
+        # Nombre completo (con extensión) + hash de la clave: 'x.avi' y 'x.mp4',
+        # o 'a/b.avi' y 'a__b.avi', no comparten archivo
+        safe_name = video_key.replace(os.sep, "__").replace("/", "__")
+        key_hash = hashlib.sha1(video_key.encode("utf-8")).hexdigest()[:8]
+        return f"{safe_name}-{key_hash}.npz"
+
+    def _check_npz_collision(self, video_key: str, filename: str):
+        # Nunca pisar el '.npz' de otro video (el manifiesto diría que ambos están bien)
+        for other_key, entry in self.completed.items():
+            if other_key != video_key and entry.get("output") == filename:
+                raise ValueError(f"'{video_key}' y '{other_key}' usarían el mismo archivo de salida '{filename}'.")
+
+    def write(self, video_key: str, video_path: str, result: Dict[str, Any], seconds: float):
+        # Escribe las ventanas del video y, solo después, su línea en el manifiesto
+        num_windows = len(result["start_frame"])
+
+        if self.output_format == "jsonl":
+            lines = []
+            for i in range(num_windows):
+                lines.append(json.dumps({
+                    "video": video_key,
+                    "window_index": i,
+                    "start_frame": int(result["start_frame"][i]),
+                    "end_frame": int(result["end_frame"][i]),
+                    "start_seconds": round(float(result["start_seconds"][i]), 3),
+                    "end_seconds": round(float(result["end_seconds"][i]), 3),
+                    "scores": {
+                        class_name: float(result["scores"][i, c])
+                        for c, class_name in enumerate(config.CLASSES)
+                    },
+                }))
+            if lines:
+                self.scores_file.write("\n".join(lines) + "\n")
+                self.scores_file.flush()
+                os.fsync(self.scores_file.fileno())
+        else:
+            # Escritura atómica: un '.npz' a medias nunca queda con el nombre final
+            npz_filename = self._npz_filename(video_key)
+            self._check_npz_collision(video_key, npz_filename)
+            npz_path = os.path.join(self.output_dir, npz_filename)
+            temp_path = npz_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(
+                    f,
+                    start_frame=result["start_frame"],
+                    end_frame=result["end_frame"],
+                    start_seconds=result["start_seconds"],
+                    end_seconds=result["end_seconds"],
+                    scores=result["scores"],
+                    classes=np.asarray(config.CLASSES),
+                )
+            os.replace(temp_path, npz_path)
+
+        entry = {
+            "video": video_key,
+            "model": self.model_id,
+            **_file_signature(video_path),
+            "fps": result["fps"],
+            "frames": result["num_frames"],
+            "windows": num_windows,
+            "seconds": round(seconds, 3),
+        }
+        if self.output_format == "npz":
+            entry["output"] = npz_filename
+        self.manifest_file.write(json.dumps(entry) + "\n")
+        self.manifest_file.flush()
+        self.completed[video_key] = entry
+
+    def close(self):
+        if self.scores_file is not None:
+            self.scores_file.close()
+        if self.manifest_file is not None:
+            self.manifest_file.close()
+
+
+def run_offline_scoring(
+    video_paths: List[str],
+    input_root: str,
+    output_dir: str,
+    output_format: str = "jsonl",
+    num_workers: Union[int, None] = None,
+    batch_size: Union[int, None] = None,
+    model_path: Union[str, None] = None
+) -> Dict[str, Any]:
+    # Puntúa 'video_paths' (las claves de la salida son relativas a 'input_root')
+    # y devuelve un resumen de la ejecución.
+    model_path = model_path or config.ONNX_MODEL_PATH
+    num_workers = max(1, num_workers or config.OFFLINE_NUM_WORKERS)
+    batch_size = max(1, batch_size or config.OFFLINE_BATCH_SIZE)
+    # Los núcleos se reparten entre los procesos del pool
+    intra_threads = max(1, (os.cpu_count() or 1) // num_workers)
+
+    store = OfflineScoreStore(output_dir, output_format, model_fingerprint(model_path))
+
+    tasks = []
+    done_keys = set()
+    for video_path in video_paths:
+        video_key = os.path.relpath(video_path, input_root)
+        if store.is_done(video_key, video_path):
+            done_keys.add(video_key)
+        else:
+            tasks.append((video_key, video_path, batch_size))
+    skipped = len(done_keys)
+    # Los videos más grandes primero: reparte mejor la carga entre procesos
+    tasks.sort(key=lambda task: os.path.getsize(task[1]), reverse=True)
+
+    print(f"[OfflineScorer] {len(tasks)} videos por puntuar, {skipped} ya puntuados (omitidos). "
+          f"{num_workers} procesos x {intra_threads} hilos, lotes de {batch_size}.")
+
+    summary = {"scored": 0, "skipped": skipped, "failed": 0, "windows": 0, "wall_seconds": 0.0}
+    start = time.perf_counter()
+    paths_by_key = {task[0]: task[1] for task in tasks}
+
+    try:
+        store.open(set(paths_by_key))
+        if tasks:
+            # 'spawn', igual que 'run_app.py' (seguro con CUDA)
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(
+                processes=min(num_workers, len(tasks)),
+                initializer=_init_scoring_process,
+                initargs=(model_path, intra_threads)
+            ) as pool:
+                for done, outcome in enumerate(pool.imap_unordered(_score_video_task, tasks), start=1):
+                    video_key = outcome["video"]
+                    if outcome["error"] is not None:
+                        summary["failed"] += 1
+                        print(f"[OfflineScorer] ERROR en '{video_key}': {outcome['error']}")
+                        continue
+
+                    try:
+                        store.write(video_key, paths_by_key[video_key], outcome["result"], outcome["seconds"])
+                    except ValueError as e:
+                        summary["failed"] += 1
+                        print(f"[OfflineScorer] ERROR en '{video_key}': {e}")
+                        continue
+                    num_windows = len(outcome["result"]["start_frame"])
+                    summary["scored"] += 1
+                    summary["windows"] += num_windows
+                    print(f"[OfflineScorer] ({done}/{len(tasks)}) '{video_key}': {num_windows} ventanas en {outcome['seconds']:.1f}s")
+    finally:
+        store.close()
+
+    summary["wall_seconds"] = time.perf_counter() - start
+    return summary
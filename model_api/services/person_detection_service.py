@@ -0,0 +1,124 @@
+import numpy as np
+import time
+from multiprocessing import Queue
+from queue import Empty
+from typing import Dict
+import sys
+import os
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+    from onnx_model.onnx_person_detector import PersonDetector
+    from services.batching import collect_batch
+except ImportError as e:
+    print(f"Error fatal en 'person_detection_service.py': No se pudo importar un módulo. {e}")
+    sys.exit(1)
+
+
+class RemotePersonDetector:
+    # Cliente del 'person_detection_service' para usar dentro de un 'camera_worker'.
+    # Tiene la misma interfaz que 'PersonDetector' (count_persons / detect_persons),
+    # pero en lugar de ejecutar YOLO localmente, hace el letterbox en el worker,
+    # envía el canvas (uint8) al servicio y espera su respuesta.
+
+    def __init__(self, camera_id: str, request_queue: Queue, response_queue: Queue):
+        self.camera_id = camera_id
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.timeout_seconds = config.PERSON_SERVICE_RESPONSE_TIMEOUT_SECONDS
+
+        # Solo se usa para el letterbox (el modelo nunca se carga en el worker)
+        self.preprocessor = PersonDetector()
+
+        # Número de secuencia para descartar respuestas atrasadas
+        # (ej. la respuesta de una petición que ya expiró por timeout)
+        self.sequence = 0
+
+    def detect_persons(self, frame: np.ndarray) -> tuple[int, np.ndarray]:
+        # Igual que 'PersonDetector.detect_persons'. Devuelve (-1, cajas vacías) si hay error.
+        no_boxes = np.empty((0, 5), dtype=np.float32)
+
+        try:
+            self.sequence += 1
+            canvas_rgb, letterbox = self.preprocessor.letterbox(frame)
+            self.request_queue.put((self.camera_id, self.sequence, canvas_rgb, letterbox, frame.shape))
+
+            deadline = time.monotonic() + self.timeout_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"[PersonDetector-{self.camera_id}] ERROR: El servicio no respondió a tiempo.")
+                    return -1, no_boxes
+
+                sequence, count, boxes = self.response_queue.get(timeout=remaining)
+                if sequence == self.sequence:
+                    return count, boxes
+                # Respuesta de una petición anterior: se descarta
+
+        except Empty:
+            print(f"[PersonDetector-{self.camera_id}] ERROR: El servicio no respondió a tiempo.")
+            return -1, no_boxes
+        except Exception as e:
+            print(f"[PersonDetector-{self.camera_id}] ERROR al consultar el servicio: {e}")
+            return -1, no_boxes
+
+    def count_persons(self, frame: np.ndarray) -> int:
+        # Igual que 'PersonDetector.count_persons'
+        count, _ = self.detect_persons(frame)
+        return count
+
+
+def run_person_detection_service(request_queue: Queue, response_queues: Dict[str, Queue]):
+    # Esta función se ejecuta en un proceso de CPU dedicado (modo "service").
+    # Una sola sesión YOLOv8n atiende a TODAS las cámaras: junta los frames
+    # de varias cámaras en un lote (B, 3, 320, 320) y devuelve el conteo
+    # de cada uno a la cola de respuestas de su cámara.
+    print("[PersonService] Proceso iniciado.")
+
+    try:
+        # El modelo real se cargará en el primer lote (Lazy Loading)
+        detector = PersonDetector()
+    except Exception as e:
+        print(f"[PersonService] CRÍTICO: No se pudo instanciar PersonDetector: {e}")
+        return
+
+    while True:
+        try:
+            # 1. Obtener un LOTE de peticiones (bloqueante hasta la primera)
+            # item = (camera_id, sequence, canvas_rgb, letterbox, frame_shape)
+            batch_items = collect_batch(
+                request_queue,
+                config.PERSON_MAX_BATCH_SIZE,
+                config.PERSON_BATCH_TIMEOUT_SECONDS
+            )
+
+            canvases = np.stack([item[2] for item in batch_items], axis=0) # Forma -> (B, 320, 320, 3)
+            letterboxes = [item[3] for item in batch_items]
+            frame_shapes = [item[4] for item in batch_items]
+
+            # 2. Detectar en todo el lote con una sola llamada a la sesión
+            try:
+                detections = detector.detect_persons_batch(canvases, letterboxes, frame_shapes)
+            except Exception as e:
+                print(f"[PersonService] ERROR durante la inferencia: {e}")
+                detections = [(-1, np.empty((0, 5), dtype=np.float32))] * len(batch_items)
+
+            # 3. Devolver cada resultado a la cámara que lo pidió
+            for (camera_id, sequence, *_), (count, boxes) in zip(batch_items, detections):
+                response_queue = response_queues.get(camera_id)
+                if response_queue is None:
+                    print(f"[PersonService] ERROR: No se encontró cola de respuesta para {camera_id}.")
+                    continue
+                response_queue.put((sequence, count, boxes))
+
+        except (KeyboardInterrupt, SystemExit):
+            print("[PersonService] Deteniendo...")
+            break
+        except Exception as e:
+            print(f"[PersonService] Error en el bucle principal: {e}")
+            time.sleep(0.1) # Pausa breve para evitar inundar logs si hay un error
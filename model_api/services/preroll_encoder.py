@@ -0,0 +1,153 @@
+import cv2
+import threading
+import numpy as np
+from collections import deque
+from typing import Deque, List, Tuple, Union
+import sys
+import os
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 2 niveles: .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(model_api_root)
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'preroll_encoder.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+
+class PrerollEncoder:
+    # Búfer de pre-rollo COMPRIMIDO para el 'camera_worker'.
+    # Un hilo de fondo codifica cada frame a JPEG y lo agrupa en segmentos de
+    # 'segment_frames' frames. Solo se guardan los segmentos necesarios para
+    # cubrir 'capacity_frames' (los últimos PRE_ROLL_SECONDS).
+    #
+    # Al iniciar un evento, 'snapshot()' devuelve el pre-rollo SIN esperar al
+    # codificador: los segmentos cerrados y el segmento en curso (JPEG, bytes)
+    # y, a continuación, los frames que todavía no se codificaron (np.ndarray,
+    # sin copia). No se copia ni se codifica nada en el worker: el
+    # 'EventRecorder' decodifica los JPEG y escribe todo en el pool.
+    #
+    # Si el codificador va atrasado y su cola está llena, el frame se omite,
+    # pero su lugar queda marcado con un None (un "hueco") para que el video
+    # conserve la duración real; 'dropped_frames' cuenta esos frames.
+
+    def __init__(
+        self,
+        capacity_frames: int,
+        segment_frames: Union[int, None] = None,
+        jpeg_quality: Union[int, None] = None,
+        queue_frames: Union[int, None] = None
+    ):
+        self.capacity_frames = max(1, capacity_frames)
+        self.segment_frames = max(1, segment_frames or config.PRE_ROLL_SEGMENT_FRAMES)
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality or config.PRE_ROLL_JPEG_QUALITY]
+        self.max_pending = max(1, queue_frames or config.PRE_ROLL_ENCODER_QUEUE_FRAMES)
+
+        self.condition = threading.Condition()
+        # Frames por codificar: [frame, huecos_después] (frames omitidos tras él)
+        self.pending: Deque[list] = deque()
+        self.encoding: Union[list, None] = None # Frame que el hilo codifica ahora (fuera del lock)
+
+        # Segmentos cerrados (tuplas de bytes JPEG o None = hueco) + el segmento en curso
+        self.segments: Deque[Tuple[Union[bytes, None], ...]] = deque()
+        self.current_segment: List[Union[bytes, None]] = []
+        self.stored_frames = 0 # Frames en 'segments' (sin contar el segmento en curso)
+
+        self.frame_shape: Union[Tuple[int, ...], None] = None
+        self.dropped_frames = 0 # Frames omitidos porque el codificador iba atrasado
+
+        self.stop_event = threading.Event()
+        self.encode_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.encode_thread.start()
+
+    def add(self, frame: np.ndarray):
+        # Encola un frame para codificarlo. No copia: el worker no debe
+        # modificar 'frame' después (los lectores entregan un array nuevo
+        # en cada read()). Si la cola está llena, el frame se omite y se marca
+        # como hueco detrás del último frame encolado.
+        with self.condition:
+            if self.frame_shape is not None and frame.shape != self.frame_shape:
+                # Cambió la resolución (ej. FileReader pasó a otro video):
+                # el pre-rollo anterior ya no se puede mezclar en el mismo archivo.
+                self._reset_locked()
+            self.frame_shape = frame.shape
+
+            if len(self.pending) >= self.max_pending:
+                self.dropped_frames += 1
+                self.pending[-1][1] += 1
+                return
+            self.pending.append([frame, 0])
+            self.condition.notify_all()
+
+    def _reset_locked(self):
+        self.pending.clear()
+        self.encoding = None # Si el hilo lo estaba codificando, se descarta al terminar
+        self.segments.clear()
+        self.current_segment = []
+        self.stored_frames = 0
+
+    def _encode_loop(self):
+        while not self.stop_event.is_set():
+            with self.condition:
+                while not self.pending and not self.stop_event.is_set():
+                    self.condition.wait()
+                if self.stop_event.is_set():
+                    break
+                item = self.pending.popleft()
+                shape = self.frame_shape
+                self.encoding = item
+
+            # La codificación se hace fuera del lock (cv2 libera el GIL)
+            frame = item[0]
+            ok, encoded = cv2.imencode(".jpg", frame, self.encode_params)
+
+            with self.condition:
+                self.encoding = None
+                if frame.shape == shape == self.frame_shape:
+                    # Un frame que no se pudo codificar también queda como hueco
+                    self._store_locked(encoded.tobytes() if ok else None)
+                    for _ in range(item[1]):
+                        self._store_locked(None)
+                self.condition.notify_all()
+
+    def _store_locked(self, jpeg: Union[bytes, None]):
+        self.current_segment.append(jpeg)
+        if len(self.current_segment) < self.segment_frames:
+            return
+
+        # Cerrar el segmento y descartar los más antiguos que ya no hacen falta
+        self.segments.append(tuple(self.current_segment))
+        self.stored_frames += len(self.current_segment)
+        self.current_segment = []
+        while self.segments and self.stored_frames - len(self.segments[0]) >= self.capacity_frames:
+            self.stored_frames -= len(self.segments.popleft())
+
+    def snapshot(self) -> List[Union[bytes, np.ndarray, None]]:
+        # Devuelve el pre-rollo (del más antiguo al más nuevo), como mucho
+        # 'capacity_frames', sin esperar al codificador: JPEG (bytes) de lo ya
+        # codificado, np.ndarray de lo que sigue en cola (incluido el frame que
+        # se está codificando) y None por cada frame omitido. Así no queda un
+        # hueco entre el pre-rollo y los frames en vivo del grabador.
+        with self.condition:
+            frames: list = [jpeg for segment in self.segments for jpeg in segment]
+            frames.extend(self.current_segment)
+            queued = ([self.encoding] if self.encoding is not None else []) + list(self.pending)
+            for frame, gaps_after in queued:
+                frames.append(frame)
+                frames.extend([None] * gaps_after)
+        return frames[-self.capacity_frames:]
+
+    def memory_bytes(self) -> int:
+        # Memoria ocupada por los JPEG guardados (para logs / métricas)
+        with self.condition:
+            return sum(len(jpeg) for segment in self.segments for jpeg in segment if jpeg is not None) + \
+                sum(len(jpeg) for jpeg in self.current_segment if jpeg is not None)
+
+    def release(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        self.encode_thread.join(timeout=2.0)
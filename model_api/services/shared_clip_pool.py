@@ -0,0 +1,143 @@
+import errno
+import os
+import numpy as np
+from multiprocessing import Queue, shared_memory
+from queue import Empty
+from typing import Tuple, Union
+
+# Donde Linux monta la memoria compartida POSIX (tmpfs). En Docker es de 64 MB
+# por defecto, salvo que se use '--shm-size'.
+_SHM_DIR = "/dev/shm"
+
+
+class SharedClipPool:
+    # Pool de "slots" de memoria compartida para transportar clips entre procesos.
+    # El 'camera_worker' escribe el clip preprocesado directamente en un slot
+    # y por la 'inference_queue' solo viaja el índice del slot (un entero),
+    # en lugar de serializar (pickle) ~19 MB por clip.
+    #
+    # Ciclo de vida de un slot:
+    #   worker: acquire() -> escribe en view(slot) -> inference_queue.put((cam, slot))
+    #   inferencia: view(slot) (sin copia) -> predict_batch() -> release(slot)
+    #
+    # Se crea en el proceso principal ('run_app.py') con 'create()' y se pasa a los
+    # procesos hijos como argumento; cada hijo se conecta al bloque por su nombre.
+
+    def __init__(self, shm_name: str, num_slots: int, clip_shape: Tuple[int, ...], dtype: str, free_slots: Queue):
+        # Constructor interno. Usar 'SharedClipPool.create()' para crear un pool nuevo.
+        self.shm_name = shm_name
+        self.num_slots = num_slots
+        self.clip_shape = tuple(clip_shape)
+        self.dtype = np.dtype(dtype)
+        self.free_slots = free_slots # Cola con los índices de los slots libres
+
+        self._is_owner = False
+        self._shm: Union[shared_memory.SharedMemory, None] = None
+        self._slots: Union[np.ndarray, None] = None
+
+    @classmethod
+    def create(cls, num_slots: int, clip_shape: Tuple[int, ...], dtype: str = "float32") -> "SharedClipPool":
+        # Reserva el bloque de memoria compartida y marca todos los slots como libres.
+        # Lanza OSError (ENOSPC) si /dev/shm no tiene lugar para todos los slots.
+        slot_bytes = int(np.prod(clip_shape)) * np.dtype(dtype).itemsize
+        total_bytes = slot_bytes * num_slots
+        _check_shm_space(total_bytes)
+
+        shm = shared_memory.SharedMemory(create=True, size=total_bytes)
+        try:
+            _reserve_pages(shm, total_bytes)
+        except OSError:
+            shm.close()
+            shm.unlink()
+            raise
+
+        free_slots = Queue()
+        for slot in range(num_slots):
+            free_slots.put(slot)
+
+        pool = cls(shm.name, num_slots, clip_shape, dtype, free_slots)
+        pool._is_owner = True
+        pool._attach(shm)
+
+        print(f"[SharedClipPool] {num_slots} slots de {slot_bytes / 1e6:.1f} MB creados en '{shm.name}'.")
+        return pool
+
+    def __getstate__(self):
+        # Al pasar el pool a otro proceso solo viajan el nombre y los metadatos,
+        # nunca el contenido del bloque compartido.
+        return {
+            "shm_name": self.shm_name,
+            "num_slots": self.num_slots,
+            "clip_shape": self.clip_shape,
+            "dtype": self.dtype.str,
+            "free_slots": self.free_slots,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _attach(self, shm: Union[shared_memory.SharedMemory, None] = None):
+        # Se conecta (una sola vez por proceso) al bloque de memoria compartida
+        if self._slots is not None:
+            return
+        self._shm = shm if shm is not None else shared_memory.SharedMemory(name=self.shm_name)
+        self._slots = np.ndarray(
+            (self.num_slots,) + self.clip_shape,
+            dtype=self.dtype,
+            buffer=self._shm.buf
+        )
+
+    def acquire(self, timeout: float = 0.0) -> Union[int, None]:
+        # Reserva un slot libre. Devuelve None si no hay ninguno libre a tiempo
+        # (la inferencia va atrasada y todos los slots están en uso).
+        try:
+            if timeout > 0:
+                return self.free_slots.get(timeout=timeout)
+            return self.free_slots.get_nowait()
+        except Empty:
+            return None
+
+    def view(self, slot: int) -> np.ndarray:
+        # Devuelve una vista (SIN copia) del slot, con forma 'clip_shape'
+        self._attach()
+        return self._slots[slot]
+
+    def release(self, slot: int):
+        # Devuelve el slot al pool para que un worker lo pueda reutilizar
+        self.free_slots.put(slot)
+
+    def close(self):
+        # Cierra la conexión de este proceso con el bloque compartido.
+        # Solo el proceso creador (owner) libera el bloque del sistema.
+        if self._shm is None:
+            return
+        self._slots = None
+        self._shm.close()
+        if self._is_owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+def _check_shm_space(total_bytes: int):
+    # 'SharedMemory(create=True)' solo hace ftruncate: el bloque es "disperso" y
+    # se crea aunque /dev/shm no tenga lugar. El error aparecería después, como
+    # un SIGBUS que mata al worker la primera vez que escribe en un slot.
+    # Por eso se mira el espacio libre ANTES de elegir este transporte.
+    if not os.path.isdir(_SHM_DIR):
+        return # Otros sistemas (ej. Windows): no hay tmpfs que revisar
+    stats = os.statvfs(_SHM_DIR)
+    free_bytes = stats.f_bavail * stats.f_frsize
+    if free_bytes < total_bytes:
+        raise OSError(
+            errno.ENOSPC,
+            f"{_SHM_DIR} tiene {free_bytes / 1e6:.0f} MB libres y el pool necesita {total_bytes / 1e6:.0f} MB"
+        )
+
+
+def _reserve_pages(shm: shared_memory.SharedMemory, total_bytes: int):
+    # Reserva de verdad las páginas del bloque (posix_fallocate devuelve ENOSPC
+    # en lugar de un SIGBUS posterior). Cubre el caso en que otro proceso ocupa
+    # /dev/shm entre la revisión y la creación.
+    fd = getattr(shm, "_fd", -1)
+    if fd >= 0 and hasattr(os, "posix_fallocate"):
+        os.posix_fallocate(fd, 0, total_bytes)
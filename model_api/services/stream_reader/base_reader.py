@@ -6,6 +6,10 @@ class BaseReader(ABC):
     # Define la interfaz abstracta (el "contrato") para todos los lectores de video.
     # Cualquier clase que herede de BaseReader debe implementar estos métodos.
     # Esto permite que el 'camera_worker' los use de forma intercambiable.
+
+    # True si la fuente es en vivo (cámara): entrega frames a su propio ritmo,
+    # así que el 'camera_worker' no debe frenarse con 'sleep' para simular los FPS.
+    is_live: bool = False
     
     @abstractmethod
     def __init__(self, source: Any):
@@ -1,6 +1,8 @@
 import cv2
 import os
 import sys
+import queue
+import threading
 import numpy as np
 from typing import List, Union
 
@@ -16,12 +18,24 @@ except ImportError:
     # Fallback si la importación relativa falla (ej. al ejecutar como script)
     from services.stream_reader.base_reader import BaseReader
 
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'file_reader.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
 class FileReader(BaseReader):
     # Implementación de BaseReader para leer desde una LISTA de archivos de video.
     # Reproduce los videos en secuencia y vuelve al inicio de la lista (looping).
+    # Con 'loop' = False, el stream termina al acabar el último video.
+    #
+    # Con 'prefetch' activado, un hilo de fondo decodifica por adelantado en una
+    # cola acotada y abre el siguiente video de la lista antes de que termine el
+    # actual, así el bucle del worker nunca se frena al cambiar de archivo.
     
-    def __init__(self, source: Union[str, List[str]]):
+    def __init__(self, source: Union[str, List[str]], prefetch: Union[bool, None] = None, loop: bool = True):
         # Constructor que acepta una sola ruta (str) o una lista de rutas (List[str])
+        # 'prefetch' = None usa el valor de config.FILE_READER_PREFETCH.
         
         if isinstance(source, str):
             # Retrocompatibilidad: si es un solo string, lo convierte en lista
@@ -34,20 +48,49 @@ class FileReader(BaseReader):
         if not self.video_paths:
             raise ValueError("FileReader 'source' no puede ser una lista vacía.")
 
+        self.prefetch = config.FILE_READER_PREFETCH if prefetch is None else prefetch
+        self.loop = loop
+
         self.current_video_index = 0
         self.cap: Union[cv2.VideoCapture, None] = None # Se inicializará con _open_video
         self.source_fps: float = 30.0 # Valor por defecto
+
+        # Siguiente video abierto por adelantado: (ruta, cap o None si falló)
+        self.next_video: Union[tuple, None] = None
         
         # Abrir el primer video de la lista
+        # (Se hace aquí, de forma síncrona, para que get_fps() sea válido)
         self._open_video(self.video_paths[self.current_video_index])
 
+        # Iniciar el hilo de decodificación por adelantado
+        if self.prefetch:
+            self.frame_queue: queue.Queue = queue.Queue(maxsize=config.FILE_READER_PREFETCH_FRAMES)
+            self.stop_event = threading.Event()
+            self.finished = False # True cuando el hilo ya entregó el fin del stream
+            self.decode_thread = threading.Thread(target=self._decode_loop, daemon=True)
+            self.decode_thread.start()
+
+    def _open_capture(self, file_path: str) -> Union[cv2.VideoCapture, None]:
+        # Abre un archivo de video. Devuelve None si no se pudo abrir.
+        cap = cv2.VideoCapture(file_path)
+        if not cap.isOpened():
+            print(f"[FileReader] ADVERTENCIA: No se pudo abrir el video: {file_path}. Omitiendo.")
+            cap.release()
+            return None
+        return cap
+
     def _open_video(self, file_path: str) -> bool:
         # Método helper para abrir un nuevo archivo de video
+        # (usa el video abierto por adelantado si es el que toca)
         self.current_file_path = file_path
-        self.cap = cv2.VideoCapture(self.current_file_path)
+
+        if self.next_video is not None and self.next_video[0] == file_path:
+            self.cap = self.next_video[1]
+            self.next_video = None
+        else:
+            self.cap = self._open_capture(file_path)
         
-        if not self.cap.isOpened():
-            print(f"[FileReader] ADVERTENCIA: No se pudo abrir el video: {file_path}. Omitiendo.")
+        if self.cap is None:
             return False
             
         # Obtenemos los FPS solo del primer video
@@ -58,11 +101,68 @@ class FileReader(BaseReader):
                 self.source_fps = fps
         
         print(f"[FileReader] Video '{os.path.basename(file_path)}' abierto. (Fuente FPS: {self.source_fps:.2f})")
+
+        # Abrir ya el siguiente video (solo con prefetch: sin el hilo de fondo
+        # esto solo movería la espera a otro punto del bucle del worker)
+        if self.prefetch:
+            self._open_next_ahead()
         return True
 
+    def _open_next_ahead(self):
+        # Abre por adelantado el siguiente video de la lista
+        if self.next_video is not None and self.next_video[1] is not None:
+            self.next_video[1].release()
+        next_index = (self.current_video_index + 1) % len(self.video_paths)
+        if next_index == 0 and not self.loop:
+            self.next_video = None # No hay siguiente video (la lista no se repite)
+            return
+        next_path = self.video_paths[next_index]
+        self.next_video = (next_path, self._open_capture(next_path))
+
     def read(self) -> tuple[bool, np.ndarray | None]:
         # Lee el siguiente frame. Si el video actual termina,
         # carga el siguiente video en la lista.
+        if not self.prefetch:
+            return self._read_next_frame()
+
+        # Con prefetch, el frame ya está decodificado en la cola
+        if self.finished:
+            return False, None
+
+        while True:
+            try:
+                frame = self.frame_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not self.decode_thread.is_alive():
+                    self.finished = True
+                    return False, None
+                continue
+
+            if frame is None:
+                # Marca de fin del stream (el hilo no pudo seguir leyendo)
+                self.finished = True
+                return False, None
+            return True, frame
+
+    def _decode_loop(self):
+        # Bucle del hilo de fondo: decodifica frames y los deja en la cola.
+        # Si la cola está llena, espera (la cola acota la memoria usada).
+        while not self.stop_event.is_set():
+            ret, frame = self._read_next_frame()
+            item = frame if ret else None
+
+            while not self.stop_event.is_set():
+                try:
+                    self.frame_queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+            if not ret:
+                break
+
+    def _read_next_frame(self) -> tuple[bool, np.ndarray | None]:
+        # Lectura síncrona del siguiente frame (la lógica original de read()).
         
         if not self.cap or not self.cap.isOpened():
             # Si el video anterior falló al abrir, intenta cargar el siguiente
@@ -83,23 +183,29 @@ class FileReader(BaseReader):
         # Liberar el video anterior
         if self.cap:
             self.cap.release()
+            self.cap = None
             
-        # Avanzar al siguiente video
-        self.current_video_index += 1
-        
-        # Si llegamos al final de la lista, volver al inicio (looping)
-        if self.current_video_index >= len(self.video_paths):
-            print("[FileReader] Lista de videos completada. Reiniciando (Looping)...")
-            self.current_video_index = 0
-        
-        # Abrir el nuevo video
-        new_path = self.video_paths[self.current_video_index]
-        if not self._open_video(new_path):
-            # Si este video falla al abrir, intentar recursivamente con el siguiente
-            return self._get_next_video()
-        
-        # Leer el primer frame del nuevo video
-        return self.cap.read()
+        # Intentar, como máximo, con todos los videos de la lista
+        for _ in range(len(self.video_paths)):
+            # Avanzar al siguiente video
+            self.current_video_index += 1
+            
+            # Si llegamos al final de la lista, volver al inicio (looping)
+            if self.current_video_index >= len(self.video_paths):
+                if not self.loop:
+                    print("[FileReader] Lista de videos completada.")
+                    return False, None
+                print("[FileReader] Lista de videos completada. Reiniciando (Looping)...")
+                self.current_video_index = 0
+            
+            # Abrir el nuevo video (si falla, se intenta con el siguiente)
+            new_path = self.video_paths[self.current_video_index]
+            if self._open_video(new_path):
+                # Leer el primer frame del nuevo video
+                return self.cap.read()
+
+        print("[FileReader] ERROR: No se pudo abrir ningún video de la lista.")
+        return False, None
 
     def get_fps(self) -> float:
         # Retorna los FPS del primer video de la lista.
@@ -107,7 +213,14 @@ class FileReader(BaseReader):
         return self.source_fps
 
     def release(self):
-        # Cierra el archivo de video actual
+        # Detiene el hilo de decodificación y cierra los videos abiertos
+        if self.prefetch:
+            self.stop_event.set()
+            self.decode_thread.join(timeout=2.0)
+
         if self.cap and self.cap.isOpened():
             self.cap.release()
-        print(f"[FileReader] Lector liberado.")
\ No newline at end of file
+        if self.next_video is not None and self.next_video[1] is not None:
+            self.next_video[1].release()
+            self.next_video = None
+        print(f"[FileReader] Lector liberado.")
@@ -0,0 +1,204 @@
+import cv2
+import os
+import sys
+import time
+import threading
+import numpy as np
+from collections import deque
+from typing import Union
+
+# Agregamos la raíz del proyecto ('model_api') al path de Python
+# Sube 3 niveles: .../stream_reader -> .../services -> .../model_api
+model_api_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(model_api_root)
+
+try:
+    # Usamos importación relativa (el punto) para 'base_reader'
+    from .base_reader import BaseReader
+except ImportError:
+    # Fallback si la importación relativa falla (ej. al ejecutar como script)
+    from services.stream_reader.base_reader import BaseReader
+
+try:
+    from config import config
+except ImportError as e:
+    print(f"Error fatal en 'rtsp_reader.py': No se pudo importar 'config'. {e}")
+    sys.exit(1)
+
+
+class RtspReader(BaseReader):
+    # Implementación de BaseReader para streams EN VIVO (rtsp://, http://, o
+    # cualquier fuente que acepte cv2.VideoCapture, incluido un archivo o un pipe).
+    #
+    # Un hilo "grabber" lee la fuente continuamente y solo guarda el frame MÁS
+    # RECIENTE. read() siempre entrega ese último frame y descarta los que el
+    # worker no alcanzó a leer: si el worker va lento, se pierden frames en
+    # lugar de acumular retraso en el decodificador.
+    #
+    # Si la conexión se cae, el grabber reconecta con espera exponencial.
+    # get_fps() devuelve los FPS MEDIDOS (llegada real de frames), no CAP_PROP_FPS.
+
+    is_live = True
+
+    def __init__(self, source: str, realtime_pacing: Union[bool, None] = None):
+        # Constructor. 'source' es la URL (o ruta) del stream.
+        # 'realtime_pacing' frena la lectura a los FPS nominales de la fuente:
+        # sirve para usar un archivo local como "cámara" de prueba (un archivo
+        # se decodifica mucho más rápido que en tiempo real).
+        # None = config.RTSP_REALTIME_PACING.
+        if not isinstance(source, str):
+            raise TypeError(f"RtspReader 'source' debe ser str, no {type(source)}")
+
+        self.source = source
+        self.realtime_pacing = config.RTSP_REALTIME_PACING if realtime_pacing is None else realtime_pacing
+        self.cap: Union[cv2.VideoCapture, None] = None
+        self.nominal_fps: float = 0.0 # CAP_PROP_FPS (solo como respaldo)
+
+        # Último frame disponible y su número de secuencia
+        self.condition = threading.Condition()
+        self.latest_frame: Union[np.ndarray, None] = None
+        self.latest_sequence = 0
+        self.last_read_sequence = 0
+        self.dropped_frames = 0 # Frames que el worker no alcanzó a leer
+
+        # Tiempos de llegada de los últimos frames (para medir los FPS reales)
+        self.frame_times = deque(maxlen=config.RTSP_FPS_WINDOW_FRAMES)
+
+        self.stop_event = threading.Event()
+        self.failed = False # True si se agotaron los reintentos de conexión
+
+        self.grab_thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self.grab_thread.start()
+
+    def _connect(self) -> bool:
+        # Abre (o reabre) la conexión con la fuente
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return False
+
+        # Pedir al backend el búfer interno mínimo (no todos lo respetan)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if 0 < fps <= 1000:
+            self.nominal_fps = fps
+
+        self.cap = cap
+        print(f"[RtspReader] Conectado a '{self.source}'. (FPS nominal: {self.nominal_fps:.2f})")
+        return True
+
+    def _disconnect(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _grab_loop(self):
+        # Bucle del hilo grabber: lee frames y reconecta si la fuente se cae
+        reconnect_delay = config.RTSP_RECONNECT_INITIAL_DELAY_SECONDS
+        failed_attempts = 0
+
+        while not self.stop_event.is_set():
+            # --- 1. (Re)conexión con espera exponencial ---
+            if self.cap is None:
+                if not self._connect():
+                    failed_attempts += 1
+                    max_attempts = config.RTSP_MAX_RECONNECT_ATTEMPTS
+                    if max_attempts is not None and failed_attempts > max_attempts:
+                        print(f"[RtspReader] CRÍTICO: No se pudo conectar a '{self.source}' tras {max_attempts} intentos.")
+                        break
+
+                    print(f"[RtspReader] ADVERTENCIA: Sin conexión con '{self.source}'. Reintentando en {reconnect_delay:.1f}s...")
+                    self.stop_event.wait(reconnect_delay)
+                    reconnect_delay = min(reconnect_delay * 2, config.RTSP_RECONNECT_MAX_DELAY_SECONDS)
+                    continue
+
+                reconnect_delay = config.RTSP_RECONNECT_INITIAL_DELAY_SECONDS
+                failed_attempts = 0
+                # Los tiempos anteriores a la caída no sirven para medir los FPS
+                self.frame_times.clear()
+
+            # --- 2. Leer el siguiente frame ---
+            grab_start = time.monotonic()
+            ret, frame = self.cap.read()
+            if not ret:
+                print(f"[RtspReader] ADVERTENCIA: Se perdió el stream '{self.source}'.")
+                self._disconnect()
+                continue
+
+            # --- 3. Publicar como el frame más reciente ---
+            now = time.monotonic()
+            self.frame_times.append(now)
+            with self.condition:
+                self.latest_frame = frame
+                self.latest_sequence += 1
+                self.condition.notify_all()
+
+            # --- 4. (Opcional) Simular una cámara en tiempo real ---
+            if self.realtime_pacing and self.nominal_fps > 0:
+                sleep_time = (1.0 / self.nominal_fps) - (now - grab_start)
+                if sleep_time > 0:
+                    self.stop_event.wait(sleep_time)
+
+        # Fin del hilo: despertar a quien esté esperando en read()
+        self._disconnect()
+        with self.condition:
+            self.failed = True
+            self.condition.notify_all()
+
+    def read(self) -> tuple[bool, np.ndarray | None]:
+        # Devuelve el frame más reciente que el llamador aún no ha leído.
+        # Espera a que llegue uno nuevo (incluso durante una reconexión).
+        # Retorna (False, None) si el lector se liberó, se agotaron los
+        # reintentos, o pasó RTSP_READ_TIMEOUT_SECONDS sin frames nuevos.
+        timeout = config.RTSP_READ_TIMEOUT_SECONDS
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.condition:
+            while self.latest_sequence == self.last_read_sequence:
+                if self.failed or self.stop_event.is_set():
+                    return False, None
+
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        print(f"[RtspReader] ERROR: Sin frames nuevos de '{self.source}' en {timeout}s.")
+                        return False, None
+                    self.condition.wait(remaining)
+
+            # Contar los frames intermedios que se descartaron
+            self.dropped_frames += self.latest_sequence - self.last_read_sequence - 1
+            self.last_read_sequence = self.latest_sequence
+            return True, self.latest_frame
+
+    def _measured_fps(self) -> float:
+        # FPS reales según los tiempos de llegada de los últimos frames
+        times = list(self.frame_times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def get_fps(self) -> float:
+        # Retorna los FPS medidos de la fuente. La primera vez puede esperar
+        # hasta RTSP_FPS_MEASURE_SECONDS a tener suficientes muestras.
+        # Si no se pudo medir, usa CAP_PROP_FPS (o 0.0 si tampoco existe).
+        deadline = time.monotonic() + config.RTSP_FPS_MEASURE_SECONDS
+        while (len(self.frame_times) < config.RTSP_FPS_MIN_SAMPLES and
+               time.monotonic() < deadline and
+               not self.failed):
+            time.sleep(0.05)
+
+        measured = self._measured_fps()
+        if measured > 0:
+            return measured
+        return self.nominal_fps
+
+    def release(self):
+        # Detiene el hilo grabber y cierra la conexión
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        self.grab_thread.join(timeout=2.0)
+        print(f"[RtspReader] Lector liberado. ({self.dropped_frames} frames descartados por latencia)")
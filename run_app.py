@@ -13,7 +13,10 @@ from typing import List, Dict, Any
 try:
     from model_api.services.inference_service import run_inference_service
     from model_api.services.camera_worker import run_camera_worker
+    from model_api.services.person_detection_service import run_person_detection_service
     from model_api.api import main as api_main  
+    from model_api.services.shared_clip_pool import SharedClipPool
+    from model_api.services.inference_dispatcher import run_inference_dispatcher
     from model_api.config import config        
 except ImportError as e:
     print(f"Error fatal: No se pudo importar un módulo desde 'model_api'. {e}")
@@ -58,6 +61,18 @@ def main(
     
     print("--- Iniciando UrbanSentinel Backend ---")
     worker_processes = []
+    inference_processes = []
+    clip_pool = None
+    person_process = None
+    person_request_queue = None
+    person_response_queues: Dict[str, multiprocessing.Queue] = {}
+
+    # Cola para avisar al 'inference_service' qué cámaras están grabando un
+    # evento (el planificador las prioriza)
+    scheduler_queue = multiprocessing.Queue()
+
+    # Cola de métricas (workers e 'inference_service' -> API, endpoint /metrics)
+    metrics_queue = multiprocessing.Queue(maxsize=config.METRICS_QUEUE_MAXSIZE) if config.METRICS_ENABLED else None
 
     try:
         # --- 1. Inyectar las Colas en el Módulo de la API ---
@@ -66,16 +81,96 @@ def main(
         api_main.inference_queue = inference_queue
         api_main.results_queue = results_queue
         api_main.control_queues = control_queues
+        api_main.scheduler_queue = scheduler_queue
+        api_main.metrics_queue = metrics_queue
         print("Colas inyectadas en el módulo API.")
 
+        # --- 1b. Crear el Pool de Memoria Compartida para los Clips ---
+        # Los workers escriben los clips aquí y solo envían el índice del slot.
+        if config.SHARED_MEMORY_TRANSPORT:
+            try:
+                clip_pool = SharedClipPool.create(
+                    num_slots=config.SHARED_CLIP_POOL_SLOTS,
+                    clip_shape=(3, config.CLIP_LEN, config.INPUT_CROP_SIZE, config.INPUT_CROP_SIZE),
+                    dtype="uint8" if config.UINT8_CLIP_TRANSPORT else "float32"
+                )
+            except Exception as e:
+                # Ej. /dev/shm demasiado pequeño (Docker): 'create()' revisa el espacio
+                # libre y reserva las páginas, así falla aquí y no con un SIGBUS en
+                # un worker. Se usa la cola normal (pickle).
+                print(f"ADVERTENCIA: No se pudo crear la memoria compartida ({e}). Usando transporte por cola.")
+                clip_pool = None
+
         # --- 2. Iniciar el Servicio de Inferencia (GPU) ---
-        print("Iniciando servicio de inferencia (Proceso GPU)...")
-        inference_process = multiprocessing.Process(
-            target=run_inference_service,
-            args=(inference_queue, results_queue),
-            daemon=True # El proceso morirá si el script principal muere
-        )
-        inference_process.start()
+        num_inference_workers = max(1, config.INFERENCE_NUM_WORKERS)
+        if num_inference_workers == 1:
+            print("Iniciando servicio de inferencia (Proceso GPU)...")
+            inference_process = multiprocessing.Process(
+                target=run_inference_service,
+                args=(
+                    inference_queue, results_queue, clip_pool, scheduler_queue,
+                    None, None,
+                    config.INFERENCE_INTRA_OP_THREADS, config.INFERENCE_INTER_OP_THREADS,
+                    metrics_queue
+                ),
+                daemon=True # El proceso morirá si el script principal muere
+            )
+            inference_process.start()
+            inference_processes.append(inference_process)
+        else:
+            # Pool de N procesos de inferencia, cada uno con su propia cola.
+            # Un despachador (en su propio proceso, fuera del de la API) reparte la 'inference_queue'.
+            print(f"Iniciando pool de {num_inference_workers} procesos de inferencia...")
+            intra_threads = config.INFERENCE_INTRA_OP_THREADS
+            if intra_threads is None:
+                # Repartir los núcleos entre los procesos
+                intra_threads = max(1, (os.cpu_count() or 1) // num_inference_workers)
+            inter_threads = config.INFERENCE_INTER_OP_THREADS or 1
+
+            in_flight = multiprocessing.Array('i', num_inference_workers) # Clips en curso por proceso
+            worker_inference_queues = [
+                multiprocessing.Queue(maxsize=config.INFERENCE_QUEUE_MAXSIZE)
+                for _ in range(num_inference_workers)
+            ]
+            worker_scheduler_queues = [multiprocessing.Queue() for _ in range(num_inference_workers)]
+
+            for worker_id in range(num_inference_workers):
+                inference_process = multiprocessing.Process(
+                    target=run_inference_service,
+                    args=(
+                        worker_inference_queues[worker_id], results_queue, clip_pool,
+                        worker_scheduler_queues[worker_id], worker_id, in_flight,
+                        intra_threads, inter_threads, metrics_queue
+                    ),
+                    daemon=True
+                )
+                inference_process.start()
+                inference_processes.append(inference_process)
+
+            dispatcher_process = multiprocessing.Process(
+                target=run_inference_dispatcher,
+                args=(
+                    inference_queue, worker_inference_queues, in_flight,
+                    config.INFERENCE_ROUTING, clip_pool,
+                    scheduler_queue, worker_scheduler_queues
+                ),
+                daemon=True
+            )
+            dispatcher_process.start()
+            inference_processes.append(dispatcher_process) # Se detiene junto con el pool
+
+        # --- 2b. Iniciar el Servicio de Detección de Personas (CPU, opcional) ---
+        # En modo "service" una sola sesión YOLO atiende a todas las cámaras.
+        if config.PERSON_DETECTION_MODE == "service":
+            print("Iniciando servicio centralizado de detección de personas...")
+            person_request_queue = multiprocessing.Queue()
+            person_response_queues = {cam["id"]: multiprocessing.Queue() for cam in cameras_to_run}
+            person_process = multiprocessing.Process(
+                target=run_person_detection_service,
+                args=(person_request_queue, person_response_queues),
+                daemon=True
+            )
+            person_process.start()
 
         # --- 3. Iniciar los Workers de Cámara (CPU) ---
         for cam in cameras_to_run:
@@ -93,7 +188,11 @@ def main(
                     cam["path"], # Le pasamos la LISTA de videos
                     inference_queue,
                     control_queues[cam["id"]],
-                    results_queue  # <-- ¡AQUÍ ESTÁ EL AÑADIDO!
+                    results_queue,  # <-- ¡AQUÍ ESTÁ EL AÑADIDO!
+                    clip_pool,
+                    person_request_queue,
+                    person_response_queues.get(cam["id"]),
+                    metrics_queue
                 ),
                 # --- FIN DE LA MODIFICACIÓN ---
                 
@@ -122,11 +221,16 @@ def main(
     finally:
         # --- 5. Limpieza ---
         print("Enviando señal de terminación a los procesos...")
-        if 'inference_process' in locals() and inference_process.is_alive():
-            inference_process.terminate()
+        for inference_process in inference_processes:
+            if inference_process.is_alive():
+                inference_process.terminate()
+        if person_process is not None and person_process.is_alive():
+            person_process.terminate()
         for worker in worker_processes:
             if worker.is_alive():
                 worker.terminate()
+        if clip_pool is not None:
+            clip_pool.close() # Libera el bloque de memoria compartida
         print("Servicios detenidos. Saliendo.")
 
 
@@ -161,8 +265,8 @@ def main(
 #            print(f"ADVERTENCIA: No se asignaron videos a '{camera_id}'.")
 #
 #    # 3. Crear las Colas de Comunicación
-#    inference_queue = multiprocessing.Queue()
-#    results_queue = multiprocessing.Queue()
+#    inference_queue = multiprocessing.Queue(maxsize=config.INFERENCE_QUEUE_MAXSIZE)
+#    results_queue = multiprocessing.Queue(maxsize=config.RESULTS_QUEUE_MAXSIZE)
 #    control_queues = {cam["id"]: multiprocessing.Queue() for cam in CAMERAS_TO_RUN}
 #    print("Colas de comunicación creadas.")
 #    
@@ -211,8 +315,9 @@ if __name__ == "__main__":
 
     # --- 3. Crear las Colas de Comunicación ---
     # (Esta lógica es idéntica, pero solo creará una control_queue)
-    inference_queue = multiprocessing.Queue()
-    results_queue = multiprocessing.Queue()
+    # (Las colas de inferencia y resultados están acotadas: control de admisión)
+    inference_queue = multiprocessing.Queue(maxsize=config.INFERENCE_QUEUE_MAXSIZE)
+    results_queue = multiprocessing.Queue(maxsize=config.RESULTS_QUEUE_MAXSIZE)
     control_queues = {cam["id"]: multiprocessing.Queue() for cam in CAMERAS_TO_RUN}
     print("Colas de comunicación creadas.")
     
@@ -0,0 +1,127 @@
+import argparse
+import os
+import sys
+
+# --- 1. Importar el Benchmark ---
+try:
+    from model_api.benchmark.pipeline_benchmark import (
+        PipelineBenchmark,
+        save_report,
+        load_report,
+        compare_reports,
+        format_report
+    )
+    from model_api.benchmark.scheduler_benchmark import simulate_scheduler, format_scheduler_report
+except ImportError as e:
+    print(f"Error fatal: No se pudo importar el benchmark desde 'model_api'. {e}")
+    print("Asegúrate de que 'run_benchmark.py' esté en la raíz del proyecto (junto a 'model_api').")
+    sys.exit(1)
+
+# Benchmark de extremo a extremo del pipeline.
+#
+#   Medir (modelos y videos sintéticos, no necesita ningún asset):
+#     python run_benchmark.py run --cameras 4 --frames 300 --output base.json
+#
+#   Medir con los modelos / videos reales:
+#     python run_benchmark.py run --violence-model model_api/onnx_model/swin3d_t.onnx \
+#         --person-model model_api/onnx_model/person_detector/yolov8n.onnx \
+#         --videos model_api/data/videos_prueba --output real.json
+#
+#   Comparar dos ejecuciones (sale con código 1 si hay regresiones):
+#     python run_benchmark.py compare base.json nuevo.json --threshold 0.10
+#
+#   Planificador de inferencia bajo contención ("fifo" vs "fair"):
+#     python run_benchmark.py scheduler --cameras 32
+
+
+def run_command(args) -> int:
+    video_paths = None
+    if args.videos:
+        video_paths = sorted(
+            os.path.join(args.videos, name) for name in os.listdir(args.videos)
+            if name.lower().endswith((".avi", ".mp4"))
+        )
+        if not video_paths:
+            print(f"ERROR: No se encontraron videos en {args.videos}")
+            return 1
+
+    benchmark = PipelineBenchmark(
+        num_cameras=args.cameras,
+        frames_per_camera=args.frames,
+        clients_per_camera=args.clients,
+        violence_model_path=args.violence_model,
+        person_model_path=args.person_model,
+        video_paths=video_paths,
+        work_dir=args.work_dir
+    )
+    report = benchmark.run()
+
+    print(format_report(report))
+    if args.output:
+        save_report(report, args.output)
+        print(f"Reporte guardado en: {args.output}")
+    return 0
+
+
+def compare_command(args) -> int:
+    baseline = load_report(args.baseline)
+    candidate = load_report(args.candidate)
+    regressions = compare_reports(baseline, candidate, args.threshold, args.min_delta_ms)
+
+    if not regressions:
+        print(f"Sin regresiones (umbral {args.threshold:.0%}).")
+        return 0
+
+    print(f"{len(regressions)} regresiones (umbral {args.threshold:.0%}):")
+    for r in regressions:
+        print(f"  {r['stage']:<18}{r['metric']:<24}{r['baseline']:>10.2f} -> {r['candidate']:>10.2f} ({r['change']:+.1%})")
+    return 1
+
+
+def scheduler_command(args) -> int:
+    reports = [
+        simulate_scheduler(
+            scheduler, args.cameras, args.rounds,
+            batch_size=args.batch_size,
+            max_pending_per_camera=args.max_pending,
+            recording_cameras=args.recording
+        )
+        for scheduler in ("fifo", "fair")
+    ]
+    print(format_scheduler_report(reports))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de UrbanSentinel")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Ejecuta el benchmark y guarda el reporte JSON")
+    run_parser.add_argument("--cameras", type=int, default=4, help="Número de cámaras simuladas")
+    run_parser.add_argument("--frames", type=int, default=300, help="Frames por cámara")
+    run_parser.add_argument("--clients", type=int, default=1, help="Clientes WebSocket por cámara")
+    run_parser.add_argument("--violence-model", default=None, help="Modelo Swin3D (por defecto: sintético)")
+    run_parser.add_argument("--person-model", default=None, help="Modelo YOLOv8n (por defecto: sintético)")
+    run_parser.add_argument("--videos", default=None, help="Directorio de videos (por defecto: sintéticos)")
+    run_parser.add_argument("--work-dir", default=None, help="Dónde generar los activos sintéticos (por defecto: temporal)")
+    run_parser.add_argument("--output", default=None, help="Ruta del reporte JSON")
+
+    compare_parser = subparsers.add_parser("compare", help="Compara dos reportes y marca regresiones")
+    compare_parser.add_argument("baseline", help="Reporte de referencia")
+    compare_parser.add_argument("candidate", help="Reporte nuevo")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Cambio relativo tolerado (0.10 = 10%%)")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Cambio absoluto mínimo de latencia (ms)")
+
+    scheduler_parser = subparsers.add_parser("scheduler", help="Compara los planificadores de inferencia bajo contención")
+    scheduler_parser.add_argument("--cameras", type=int, default=32, help="Cámaras por proceso de inferencia")
+    scheduler_parser.add_argument("--recording", type=int, default=1, help="Cámaras grabando un evento (con prioridad)")
+    scheduler_parser.add_argument("--rounds", type=int, default=200, help="Lotes simulados")
+    scheduler_parser.add_argument("--batch-size", type=int, default=None, help="Por defecto: MAX_BATCH_SIZE")
+    scheduler_parser.add_argument("--max-pending", type=int, default=None, help="Por defecto: INFERENCE_MAX_PENDING_PER_CAMERA")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        sys.exit(run_command(args))
+    if args.command == "scheduler":
+        sys.exit(scheduler_command(args))
+    sys.exit(compare_command(args))
@@ -0,0 +1,61 @@
+import argparse
+import glob
+import os
+import sys
+
+# --- 1. Importar el Modo Offline ---
+try:
+    from model_api.services.offline_scorer import run_offline_scoring
+    from model_api.config import config
+except ImportError as e:
+    print(f"Error fatal: No se pudo importar un módulo desde 'model_api'. {e}")
+    print("Asegúrate de que 'run_offline_scoring.py' esté en la raíz del proyecto (junto a 'model_api').")
+    sys.exit(1)
+
+# Puntúa un archivo de videos lo más rápido posible (sin simular tiempo real).
+# Es reanudable: si se interrumpe, volver a ejecutar el mismo comando omite
+# los videos que ya están en el manifiesto (con el mismo modelo).
+#
+#   python run_offline_scoring.py --input model_api/data/videos_prueba --output puntuaciones/
+#   python run_offline_scoring.py --input videos/ --output puntuaciones_npz/ --format npz --workers 4
+
+
+def find_videos(input_path: str) -> list:
+    # Todos los .avi / .mp4 bajo 'input_path' (recursivo), o el archivo en sí
+    if os.path.isfile(input_path):
+        return [input_path]
+    paths = []
+    for extension in ("avi", "mp4"):
+        paths.extend(glob.glob(os.path.join(input_path, "**", f"*.{extension}"), recursive=True))
+    return sorted(paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Puntuación offline de videos con el detector de violencia")
+    parser.add_argument("--input", required=True, help="Directorio de videos (recursivo) o un solo video")
+    parser.add_argument("--output", required=True, help="Directorio de salida (puntuaciones + manifiesto)")
+    parser.add_argument("--format", choices=["jsonl", "npz"], default="jsonl", help="Formato de salida")
+    parser.add_argument("--workers", type=int, default=None, help=f"Procesos (por defecto: {config.OFFLINE_NUM_WORKERS})")
+    parser.add_argument("--batch-size", type=int, default=None, help=f"Ventanas por lote (por defecto: {config.OFFLINE_BATCH_SIZE})")
+    parser.add_argument("--model", default=None, help="Modelo ONNX (por defecto: config.ONNX_MODEL_PATH)")
+    args = parser.parse_args()
+
+    video_paths = find_videos(args.input)
+    if not video_paths:
+        print(f"ERROR: No se encontraron videos en {args.input}")
+        sys.exit(1)
+
+    input_root = args.input if os.path.isdir(args.input) else os.path.dirname(os.path.abspath(args.input))
+    summary = run_offline_scoring(
+        video_paths,
+        input_root,
+        args.output,
+        output_format=args.format,
+        num_workers=args.workers,
+        batch_size=args.batch_size,
+        model_path=args.model
+    )
+
+    print(f"\nListo en {summary['wall_seconds']:.1f}s: {summary['scored']} videos puntuados "
+          f"({summary['windows']} ventanas), {summary['skipped']} omitidos, {summary['failed']} con error.")
+    sys.exit(1 if summary["failed"] else 0)
@@ -7,67 +7,77 @@ from typing import List
 # Definir las 4 cámaras que queremos escuchar
 CAMERAS_TO_TEST = ["cam_01", "cam_02", "cam_03", "cam_04"]
 
-async def listen_to_websocket(uri: str, camera_id: str):
-    # Se conecta a un endpoint WebSocket y muestra los mensajes que recibe.
-    
-    print(f"--- [Cliente para {camera_id}] Intentando conectar a: {uri} ---")
-    
+def print_result(data: dict):
+    # Imprimir el resultado de una cámara de forma bonita
+    print("\n--- ¡Predicción Recibida! ---")
+    print(f"  Cámara: {data.get('camera_id')}")
+
+    probs = data.get('probabilities', {})
+    for class_name, prob in probs.items():
+        # Imprimir solo si la prob es alta para no saturar
+        if prob > 0.5:
+            print(f"  *** {class_name}: {prob:.1%} ***")
+        else:
+            print(f"  {class_name}: {prob:.1%}")
+
+async def listen_to_websocket(uri: str):
+    # Se conecta al endpoint multiplexado ('/ws') y muestra los mensajes que recibe.
+    # Una sola conexión recibe los resultados de todas las cámaras suscritas,
+    # agrupados en mensajes {"type": "results", "results": [...]}.
+
+    print(f"--- [Cliente] Intentando conectar a: {uri} ---")
+
     try:
         # Conectarse al servidor
         async with websockets.connect(uri) as websocket:
-            print(f"--- [Cliente para {camera_id}] ¡Conexión exitosa! Esperando predicciones... ---")
-            
+            print("--- [Cliente] ¡Conexión exitosa! Esperando predicciones... ---")
+
             # Bucle infinito para escuchar mensajes
             while True:
                 try:
                     # Espera a recibir un mensaje del servidor
                     message = await websocket.recv()
                     data = json.loads(message)
-                    
-                    # Imprimir el resultado de forma bonita
-                    print("\n--- ¡Predicción Recibida! ---")
-                    print(f"  Cámara: {data.get('camera_id')}")
-                    
-                    probs = data.get('probabilities', {})
-                    for class_name, prob in probs.items():
-                        # Imprimir solo si la prob es alta para no saturar
-                        if prob > 0.5:
-                            print(f"  *** {class_name}: {prob:.1%} ***")
-                        else:
-                            print(f"  {class_name}: {prob:.1%}")
-                
+
+                    message_type = data.get('type')
+                    if message_type == 'subscribed':
+                        print(f"--- [Cliente] Suscrito a: {data.get('cameras')} ---")
+                    elif message_type == 'error':
+                        print(f"--- [Cliente] Error del servidor: {data.get('detail')} ---")
+                    elif message_type == 'snapshot':
+                        # Historial reciente que llega al conectarse (para dibujar gráficos)
+                        for camera in data.get('cameras', []):
+                            print(f"--- [Cliente] Historial de {camera.get('camera_id')}: {len(camera.get('timestamps', []))} resultados de los últimos {data.get('seconds')}s ---")
+                    elif message_type == 'results':
+                        for result in data.get('results', []):
+                            print_result(result)
+
                 except websockets.exceptions.ConnectionClosed:
-                    print(f"--- [Cliente para {camera_id}] Conexión cerrada por el servidor. ---")
+                    print("--- [Cliente] Conexión cerrada por el servidor. ---")
                     break
                 except Exception as e:
-                    print(f"--- [Cliente para {camera_id}] Error al procesar mensaje: {e} ---")
+                    print(f"--- [Cliente] Error al procesar mensaje: {e} ---")
 
     except Exception as e:
-        print(f"--- [Cliente para {camera_id}] No se pudo conectar al servidor: {e} ---")
+        print(f"--- [Cliente] No se pudo conectar al servidor: {e} ---")
         print("Asegúrate de que 'run_app.py' se esté ejecutando.")
 
 async def main(camera_ids: List[str]):
-    # Lanza tareas de escucha para todas las cámaras en paralelo.
-    
-    tasks = []
-    for cam_id in camera_ids:
-        uri = f"ws://127.0.0.1:8000/ws/{cam_id}"
-        # Creamos una tarea para cada 'listen_to_websocket'
-        tasks.append(listen_to_websocket(uri, cam_id))
-    
-    # 'asyncio.gather' ejecuta todas las tareas en paralelo
-    await asyncio.gather(*tasks)
+    # Una única conexión para todas las cámaras ("*" = todas las que haya)
+    uri = f"ws://127.0.0.1:8000/ws?cameras={','.join(camera_ids)}"
+    await listen_to_websocket(uri)
 
 if __name__ == "__main__":
-    
+
     cameras = CAMERAS_TO_TEST
-    
+
     # Permite anular las cámaras desde la línea de comandos
     # ej: python test_websocket.py cam_01 cam_03
+    #     python test_websocket.py "*"
     if len(sys.argv) > 1:
         cameras = sys.argv[1:]
-    
+
     try:
         asyncio.run(main(cameras))
     except KeyboardInterrupt:
-        print("\nCerrando clientes.")
\ No newline at end of file
+        print("\nCerrando cliente.")
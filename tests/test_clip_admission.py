@@ -0,0 +1,176 @@
+import queue
+import sys
+import os
+import time
+
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from api.metrics import MetricsRegistry
+from services.clip_admission import ClipAdmissionBuffer
+from services.inference_scheduler import FairClipScheduler
+from services.inference_service import _report_admission_stats
+from services.metrics_reporter import MetricsReporter
+from services.shared_clip_pool import SharedClipPool
+
+
+@pytest.fixture(params=["fifo", "fair"])
+def make_buffer(request):
+    def make(**kwargs):
+        kwargs.setdefault("max_pending_per_camera", 1)
+        kwargs.setdefault("max_age_seconds", None)
+        if request.param == "fair":
+            return FairClipScheduler(**kwargs)
+        return ClipAdmissionBuffer(**kwargs)
+    return make
+
+
+def test_newer_clip_replaces_pending_one(make_buffer):
+    discarded = []
+    buffer = make_buffer(on_discard=discarded.append)
+    now = time.time()
+
+    for clip in range(3):
+        buffer.offer("cam_01", f"clip_{clip}", now + clip)
+    buffer.offer("cam_02", "other", now)
+
+    batch = buffer.take_batch(16, timeout_seconds=0.0)
+
+    assert sorted((camera_id, payload) for camera_id, payload, _ in batch) == [("cam_01", "clip_2"), ("cam_02", "other")]
+    assert discarded == ["clip_0", "clip_1"]
+    stats = buffer.stats_snapshot()
+    assert stats["cam_01"] == {"received": 3, "coalesced": 2, "dropped_stale": 0, "served": 1}
+    assert stats["cam_02"]["coalesced"] == 0
+
+
+def test_stale_clips_are_dropped(make_buffer):
+    discarded = []
+    buffer = make_buffer(max_age_seconds=1.0, on_discard=discarded.append)
+
+    buffer.offer("cam_01", "old", time.time() - 5.0)
+    assert buffer.take_batch(16, timeout_seconds=0.0) == []
+
+    buffer.offer("cam_01", "fresh", time.time())
+    assert [payload for _, payload, _ in buffer.take_batch(16, timeout_seconds=0.0)] == ["fresh"]
+    assert discarded == ["old"]
+    assert buffer.stats_snapshot()["cam_01"]["dropped_stale"] == 1
+
+
+def test_discarded_clips_release_their_shared_memory_slots():
+    pool = SharedClipPool.create(num_slots=2, clip_shape=(1, 2, 2), dtype="uint8")
+    try:
+        buffer = ClipAdmissionBuffer(1, max_age_seconds=1.0, on_discard=pool.release)
+        first, second = pool.acquire(timeout=1.0), pool.acquire(timeout=1.0)
+        assert pool.acquire(timeout=0.05) is None
+
+        buffer.offer("cam_01", first, time.time())
+        buffer.offer("cam_01", second, time.time()) # Reemplaza al primero
+        assert pool.acquire(timeout=1.0) == first
+        pool.release(first)
+
+        buffer.pending["cam_01"][0] = (second, time.time() - 5.0) # Lo hace caducar
+        assert buffer.take_batch(16, timeout_seconds=0.0) == []
+        assert sorted([pool.acquire(timeout=1.0), pool.acquire(timeout=1.0)]) == [first, second]
+    finally:
+        pool.close()
+
+
+def test_batch_does_not_wait_when_every_active_camera_is_pending(make_buffer):
+    buffer = make_buffer()
+    buffer.offer("cam_01", "a", time.time())
+    buffer.offer("cam_02", "b", time.time())
+
+    started = time.monotonic()
+    batch = buffer.take_batch(16, timeout_seconds=2.0)
+
+    assert len(batch) == 2
+    assert time.monotonic() - started < 0.5
+
+
+def test_batch_stops_waiting_when_nothing_new_arrives(make_buffer):
+    # cam_02 está activa pero su próximo clip no llega: sin 'quiet_seconds'
+    # se espera el timeout completo, con 'quiet_seconds' se envía enseguida
+    for quiet_seconds, expected_wait in ((None, 0.3), (0.02, 0.0)):
+        buffer = make_buffer(quiet_seconds=quiet_seconds)
+        buffer.offer("cam_02", "previous", time.time())
+        buffer.take_batch(16, timeout_seconds=0.0)
+        buffer.offer("cam_01", "a", time.time())
+
+        started = time.monotonic()
+        batch = buffer.take_batch(16, timeout_seconds=0.3)
+        waited = time.monotonic() - started
+
+        assert [payload for _, payload, _ in batch] == ["a"]
+        assert waited == pytest.approx(expected_wait, abs=0.15)
+
+
+def test_inactive_cameras_do_not_hold_the_batch(make_buffer):
+    buffer = make_buffer(active_window_seconds=0.05)
+    buffer.offer("cam_02", "previous", time.time())
+    buffer.take_batch(16, timeout_seconds=0.0)
+    time.sleep(0.1) # cam_02 deja de contar como activa
+
+    buffer.offer("cam_01", "a", time.time())
+    started = time.monotonic()
+    assert len(buffer.take_batch(16, timeout_seconds=2.0)) == 1
+    assert time.monotonic() - started < 0.5
+
+
+def test_admission_counters_are_exported_as_increments(make_buffer):
+    buffer = make_buffer(max_age_seconds=1.0)
+    metrics = MetricsReporter(queue.Queue(), flush_interval_seconds=0.0)
+    reported = {}
+
+    buffer.offer("cam_01", "a", time.time())
+    buffer.offer("cam_01", "b", time.time())
+    _report_admission_stats(metrics, buffer, reported)
+    _report_admission_stats(metrics, buffer, reported) # Sin cambios: no suma nada
+    assert metrics.counters == {("clips_coalesced_total", "cam_01"): 1}
+
+    buffer.pending["cam_01"][0] = ("b", time.time() - 5.0)
+    buffer.offer("cam_01", "c", time.time())
+    buffer.pending["cam_01"][0] = ("c", time.time() - 5.0)
+    buffer.take_batch(16, timeout_seconds=0.0)
+    _report_admission_stats(metrics, buffer, reported)
+
+    assert metrics.counters == {
+        ("clips_coalesced_total", "cam_01"): 2,
+        ("clips_dropped_stale_total", "cam_01"): 1,
+    }
+
+
+def test_fair_scheduler_service_rates_are_exported_as_gauges():
+    scheduler = FairClipScheduler(max_pending_per_camera=1, max_age_seconds=None, rate_window_seconds=10.0)
+    metrics = MetricsReporter(queue.Queue(), flush_interval_seconds=0.0)
+
+    for _ in range(3):
+        scheduler.offer("cam_01", "a", time.time() - 0.2)
+        scheduler.offer("cam_02", "b", time.time())
+        assert len(scheduler.take_batch(16, timeout_seconds=0.0)) == 2
+    _report_admission_stats(metrics, scheduler, {})
+
+    assert metrics.gauges[("scheduler_clips_per_second", "cam_01")] == pytest.approx(0.3)
+    assert metrics.gauges[("scheduler_clips_per_second", "cam_02")] == pytest.approx(0.3)
+    assert metrics.gauges[("scheduler_mean_wait_seconds", "cam_01")] == pytest.approx(0.2, abs=0.05)
+    assert metrics.gauges[("scheduler_mean_wait_seconds", "cam_02")] == pytest.approx(0.0, abs=0.05)
+
+    # Llegan a /metrics como gauges
+    metrics.flush()
+    registry = MetricsRegistry()
+    registry.merge(metrics.metrics_queue.get_nowait())
+    text = registry.render_prometheus()
+    assert "# TYPE urbansentinel_scheduler_clips_per_second gauge" in text
+    assert 'urbansentinel_scheduler_mean_wait_seconds{camera="cam_02"}' in text
+
+
+def test_fifo_buffer_exports_no_scheduler_gauges():
+    buffer = ClipAdmissionBuffer(max_pending_per_camera=1, max_age_seconds=None)
+    metrics = MetricsReporter(queue.Queue(), flush_interval_seconds=0.0)
+
+    buffer.offer("cam_01", "a", time.time())
+    buffer.take_batch(16, timeout_seconds=0.0)
+    _report_admission_stats(metrics, buffer, {})
+
+    assert metrics.gauges == {}
@@ -0,0 +1,66 @@
+import sys
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from api.clip_streaming import serve_clip
+
+CLIP_BYTES = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    clip_dir = tmp_path / "clips"
+    log_dir = tmp_path / "logs"
+    clip_dir.mkdir()
+    log_dir.mkdir()
+    monkeypatch.setattr(config, "SAVE_CLIP_PATH", str(clip_dir))
+    monkeypatch.setattr(config, "SAVE_LOG_PATH", str(log_dir))
+
+    # Misma ruta que en 'main.py', sin levantar el resto de la API
+    app = FastAPI()
+
+    @app.api_route("/clips/{filename}", methods=["GET", "HEAD"])
+    async def stream_clip(request: Request, filename: str):
+        return await serve_clip(request, filename)
+
+    (clip_dir / "cam_01_evento.mp4").write_bytes(CLIP_BYTES)
+    with TestClient(app) as test_client:
+        yield test_client, log_dir
+
+
+def test_incomplete_clip_returns_409_with_retry_after(client):
+    test_client, _ = client
+
+    for headers in ({}, {"Range": "bytes=0-99"}):
+        response = test_client.get("/clips/cam_01_evento.mp4", headers=headers)
+        assert response.status_code == 409
+        assert response.headers["X-Clip-Complete"] == "false"
+        assert response.headers["Retry-After"] == str(config.CLIP_INCOMPLETE_RETRY_AFTER_SECONDS)
+        assert "Content-Range" not in response.headers
+
+    assert test_client.head("/clips/cam_01_evento.mp4").status_code == 409
+
+
+def test_complete_clip_is_served_with_ranges(client):
+    test_client, log_dir = client
+    (log_dir / "cam_01_evento.json").write_text("{}")
+
+    response = test_client.get("/clips/cam_01_evento.mp4")
+    assert response.status_code == 200
+    assert response.headers["X-Clip-Complete"] == "true"
+    assert response.content == CLIP_BYTES
+
+    response = test_client.get("/clips/cam_01_evento.mp4", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(CLIP_BYTES)}"
+    assert response.content == CLIP_BYTES[100:200]
+
+    etag = response.headers["ETag"]
+    assert test_client.get("/clips/cam_01_evento.mp4", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,105 @@
+import sys
+import os
+from datetime import datetime
+
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from services.event_catalog import EventCatalog
+
+BASE_TIME = 1_700_000_000.0
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = EventCatalog(str(tmp_path / "events.db"))
+    yield catalog
+    catalog.close()
+
+
+def _record(catalog: EventCatalog, camera_id: str, start: float, peaks: dict) -> int:
+    return catalog.record_event({
+        "camera_id": camera_id,
+        "event_start_time": datetime.fromtimestamp(start).isoformat(),
+        "event_end_time": datetime.fromtimestamp(start + 10).isoformat(),
+        "peak_probabilities": peaks,
+        "total_records": 5,
+        "video_file": f"{camera_id}_{int(start)}.mp4",
+    })
+
+
+def _all_pages(catalog: EventCatalog, **filters) -> list:
+    events, cursor, pages = [], None, 0
+    while True:
+        page, cursor = catalog.query_events(cursor=cursor, **filters)
+        events.extend(page)
+        pages += 1
+        if cursor is None:
+            return events
+        assert pages < 100
+
+
+def test_cursor_pagination_has_no_duplicates_or_gaps(catalog):
+    # Varios eventos con la misma hora de inicio: el desempate por id no debe perder ni repetir ninguno
+    expected = []
+    for i in range(23):
+        start = BASE_TIME + (i // 3)
+        expected.append((start, _record(catalog, f"cam_{i % 2:02d}", start, {config.CLASSES[0]: 0.5})))
+    expected.sort(reverse=True)
+
+    events = _all_pages(catalog, limit=4)
+
+    assert [event["id"] for event in events] == [event_id for _, event_id in expected]
+
+
+def test_filters_and_peaks(catalog):
+    violent, calm = config.CLASSES[1], config.CLASSES[0]
+    high = _record(catalog, "cam_01", BASE_TIME, {violent: 0.9, calm: 0.2})
+    low = _record(catalog, "cam_01", BASE_TIME + 1, {violent: 0.4, calm: 0.8})
+    other_camera = _record(catalog, "cam_02", BASE_TIME + 2, {violent: 0.95})
+    late = _record(catalog, "cam_01", BASE_TIME + 100, {violent: 0.99})
+
+    events = _all_pages(catalog, camera_id="cam_01", limit=1)
+    assert [event["id"] for event in events] == [late, low, high]
+    # Cada evento trae sus propios picos (leídos en una sola consulta por página)
+    assert events[1]["peak_probabilities"] == pytest.approx({violent: 0.4, calm: 0.8})
+    assert events[2]["peak_probabilities"] == pytest.approx({violent: 0.9, calm: 0.2})
+
+    events = _all_pages(catalog, start=BASE_TIME, end=BASE_TIME + 100)
+    assert [event["id"] for event in events] == [other_camera, low, high]
+
+    events = _all_pages(catalog, event_class=violent, limit=2)
+    assert [event["id"] for event in events] == [late, other_camera, high]
+
+    events = _all_pages(catalog, camera_id="cam_01", event_class=violent, min_probability=0.3)
+    assert [event["id"] for event in events] == [late, low, high]
+
+    assert catalog.get_event(low)["peak_probabilities"] == pytest.approx({violent: 0.4, calm: 0.8})
+    assert catalog.get_event(12345) is None
+
+
+def test_min_probability_requires_event_class(catalog):
+    with pytest.raises(ValueError):
+        catalog.query_events(min_probability=0.5)
+
+
+def test_events_endpoint_rejects_min_probability_without_class(catalog, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api import main
+
+    monkeypatch.setattr(main, "event_catalog", catalog)
+    _record(catalog, "cam_01", BASE_TIME, {config.CLASSES[1]: 0.9})
+    client = TestClient(main.app) # Sin 'with': no se ejecuta el 'lifespan' de la API
+
+    response = client.get("/events", params={"min_probability": 0.5})
+    assert response.status_code == 400
+    assert "event_class" in response.json()["detail"]
+
+    response = client.get("/events", params={"event_class": config.CLASSES[1], "min_probability": 0.5})
+    assert response.status_code == 200
+    assert len(response.json()["events"]) == 1
+
+    assert client.get("/events", params={"cursor": "no-es-un-cursor"}).status_code == 400
@@ -0,0 +1,102 @@
+import json
+import sys
+import os
+import time
+
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from services.event_journal import EventJournal, read_event_journal
+
+HEADER = {"camera_id": "cam1", "source_fps": 30.0}
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "event.jsonl"), str(tmp_path / "event.json")
+
+
+def _open(paths, monkeypatch, flush_records: int, flush_seconds: float) -> EventJournal:
+    monkeypatch.setattr(config, "EVENT_LOG_FLUSH_RECORDS", flush_records)
+    monkeypatch.setattr(config, "EVENT_LOG_FLUSH_SECONDS", flush_seconds)
+    return EventJournal(paths[0], paths[1], header=HEADER)
+
+
+def _records_on_disk(journal_path: str) -> list:
+    # Lo que vería otro proceso (o quien lea tras un corte) en este momento
+    _, records = read_event_journal(journal_path)
+    return list(records)
+
+
+def _probabilities(i: int) -> list:
+    return [0.1 * (i % 10), 0.0, 1.0 - 0.1 * (i % 10)]
+
+
+def test_flushes_every_n_records(paths, monkeypatch):
+    journal = _open(paths, monkeypatch, flush_records=3, flush_seconds=1000.0)
+
+    header, _ = read_event_journal(paths[0])
+    assert header["camera_id"] == "cam1"
+    assert header["type"] == "header"
+
+    journal.append(0, _probabilities(0))
+    journal.append(33, _probabilities(1))
+    assert _records_on_disk(paths[0]) == []
+
+    journal.append(66, _probabilities(2))
+    assert [t for t, _ in _records_on_disk(paths[0])] == [0, 33, 66]
+
+    journal.append(99, _probabilities(3))
+    assert len(_records_on_disk(paths[0])) == 3
+    journal.close()
+    assert len(_records_on_disk(paths[0])) == 4
+
+
+def test_flushes_every_n_seconds(paths, monkeypatch):
+    journal = _open(paths, monkeypatch, flush_records=1000, flush_seconds=0.2)
+
+    journal.append(0, _probabilities(0))
+    assert _records_on_disk(paths[0]) == []
+
+    time.sleep(0.25)
+    journal.append(250, _probabilities(1))
+    assert [t for t, _ in _records_on_disk(paths[0])] == [0, 250]
+    journal.close()
+
+
+def test_read_ignores_truncated_last_line(paths, monkeypatch):
+    journal = _open(paths, monkeypatch, flush_records=1, flush_seconds=1000.0)
+    for i in range(5):
+        journal.append(i * 33, _probabilities(i))
+
+    # Corte a mitad de escritura: la última línea queda incompleta
+    with open(paths[0], "a", encoding="utf-8") as f:
+        f.write('{"t":165,"p":[0.5,')
+
+    records = _records_on_disk(paths[0])
+    assert [t for t, _ in records] == [0, 33, 66, 99, 132]
+    assert records[2][1] == pytest.approx(_probabilities(2))
+    journal.file.close()
+
+
+def test_summary_is_readable_without_the_records(paths, monkeypatch):
+    journal = _open(paths, monkeypatch, flush_records=30, flush_seconds=1.0)
+    for i in range(100):
+        journal.append(i * 33, _probabilities(i))
+    summary = journal.close({"dropped_frames": 2})
+
+    # El resumen no depende del archivo de registros
+    os.remove(paths[0])
+    with open(paths[1], encoding="utf-8") as f:
+        on_disk = json.load(f)
+
+    assert on_disk == summary
+    assert on_disk["camera_id"] == "cam1"
+    assert on_disk["total_records"] == 100
+    assert on_disk["duration_ms"] == 99 * 33
+    assert on_disk["journal_file"] == "event.jsonl"
+    assert on_disk["dropped_frames"] == 2
+    assert on_disk["peak_probabilities"] == pytest.approx(dict(zip(config.CLASSES, [0.9, 0.0, 1.0])))
@@ -0,0 +1,46 @@
+import asyncio
+import queue
+import sys
+import os
+import time
+
+import numpy as np
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from api import event_manager
+
+
+def test_error_in_one_camera_does_not_drop_the_rest_of_the_burst(monkeypatch):
+    processed = []
+
+    async def fake_process(camera_id, results, *args):
+        if camera_id == "cam_bad":
+            raise ValueError("resultado corrupto")
+        processed.append((camera_id, time.monotonic(), len(results)))
+
+    monkeypatch.setattr(event_manager, "_process_camera_results", fake_process)
+
+    results_queue = queue.Queue()
+    probabilities = np.zeros(3, dtype=np.float32)
+    for camera_id in ("cam_01", "cam_bad", "cam_02", "cam_01"):
+        results_queue.put((camera_id, probabilities, time.time()))
+
+    async def run():
+        started = time.monotonic()
+        task = asyncio.create_task(event_manager.event_manager_task(None, results_queue, {}))
+        while len(processed) < 2 and time.monotonic() - started < 5.0:
+            await asyncio.sleep(0.01)
+
+        # La ráfaga siguiente no espera la pausa de 1 s del bucle
+        results_queue.put(("cam_03", probabilities, time.time()))
+        while len(processed) < 3 and time.monotonic() - started < 5.0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return started
+
+    started = asyncio.run(run())
+
+    assert sorted((camera_id, count) for camera_id, _, count in processed) == [("cam_01", 2), ("cam_02", 1), ("cam_03", 1)]
+    assert max(at for _, at, _ in processed) - started < 0.9
@@ -0,0 +1,96 @@
+import json
+import sys
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from services.event_recorder import EventRecorder, RecorderWriterPool
+
+FRAME_SIZE = (64, 48) # (ancho, alto)
+QUEUE_FRAMES = 5
+
+
+class BlockingRecorder:
+    # Ocupa el único hilo del pool hasta que se libera 'gate'
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def _drain(self, max_frames: int) -> str:
+        self.started.set()
+        self.gate.wait(5.0)
+        return "idle"
+
+
+@pytest.fixture
+def save_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SAVE_CLIP_PATH", str(tmp_path / "clips"))
+    monkeypatch.setattr(config, "SAVE_LOG_PATH", str(tmp_path / "logs"))
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((FRAME_SIZE[1], FRAME_SIZE[0], 3), value, dtype=np.uint8)
+
+
+def _read_means(path: str) -> list:
+    capture = cv2.VideoCapture(path)
+    means = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        means.append(float(frame.mean()))
+    capture.release()
+    return means
+
+
+@pytest.mark.parametrize("policy, kept", [
+    ("drop_oldest", range(7, 12)),
+    ("drop_newest", range(0, 5)),
+])
+def test_full_queue_applies_overflow_policy(save_paths, policy, kept):
+    pool = RecorderWriterPool(num_threads=1)
+    blocker = BlockingRecorder()
+    pool.ready.put(blocker)
+    assert blocker.started.wait(2.0)
+
+    recorder = EventRecorder(
+        f"cam_{policy}", [], source_fps=30.0, writer_pool=pool,
+        frame_size=FRAME_SIZE, max_queue_frames=QUEUE_FRAMES, overflow_policy=policy
+    )
+    recorder.start()
+
+    probabilities = np.zeros(len(config.CLASSES))
+    accepted = [recorder.add_frame(_frame(20 * i), probabilities) for i in range(12)]
+
+    # Las primeras entran; cada frame de más se descarta (el viejo o el nuevo)
+    assert accepted == [True] * QUEUE_FRAMES + [False] * 7
+    assert recorder.dropped_frames == 7
+    assert recorder.backlog_frames() == QUEUE_FRAMES
+    assert pool.backlog_frames() == QUEUE_FRAMES
+
+    blocker.gate.set()
+    recorder.close()
+    assert pool.shutdown(timeout=10.0)
+    assert pool.backlog_frames() == 0
+
+    assert _read_means(recorder.video_path) == pytest.approx([20 * i for i in kept], abs=4)
+    with open(recorder.log_path, encoding="utf-8") as f:
+        assert json.load(f)["dropped_frames"] == 7
+
+
+def test_invalid_overflow_policy_is_rejected(save_paths):
+    pool = RecorderWriterPool(num_threads=1)
+    try:
+        with pytest.raises(ValueError):
+            EventRecorder("cam_invalid", [], source_fps=30.0, writer_pool=pool,
+                          frame_size=FRAME_SIZE, overflow_policy="block")
+    finally:
+        pool.shutdown(timeout=1.0)
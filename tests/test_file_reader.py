@@ -0,0 +1,123 @@
+import sys
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from services.stream_reader.file_reader import FileReader
+
+FPS = 25.0
+FRAMES_PER_VIDEO = 20
+
+
+def _write_video(path: str, first_value: int, size=(64, 48)) -> str:
+    # El frame i tiene todos sus píxeles en first_value + i * 4
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, size)
+    for i in range(FRAMES_PER_VIDEO):
+        writer.write(np.full((size[1], size[0], 3), first_value + i * 4, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def videos(tmp_path):
+    return [
+        _write_video(str(tmp_path / "a.avi"), 0),
+        _write_video(str(tmp_path / "b.avi"), 130, size=(80, 60)),
+    ]
+
+
+@pytest.fixture
+def small_prefetch_queue(monkeypatch):
+    # Cola chica: el hilo de fondo se bloquea a menudo esperando al lector
+    monkeypatch.setattr(config, "FILE_READER_PREFETCH_FRAMES", 4)
+
+
+def _read_all(reader: FileReader, max_frames: int = 1000) -> list:
+    frames = []
+    for _ in range(max_frames):
+        ok, frame = reader.read()
+        if not ok:
+            assert frame is None
+            break
+        frames.append(frame)
+    return frames
+
+
+def _read_with_timeout(reader: FileReader, timeout: float = 5.0) -> tuple:
+    # Un lector que reintenta la lista sin fin nunca volvería de read()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(reader.read()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert result, "read() no terminó"
+    return result[0]
+
+
+def test_prefetch_yields_the_same_frames_as_synchronous_read(videos, small_prefetch_queue):
+    sync_reader = FileReader(videos, prefetch=False, loop=False)
+    prefetch_reader = FileReader(videos, prefetch=True, loop=False)
+    try:
+        sync_frames = _read_all(sync_reader)
+        prefetch_frames = _read_all(prefetch_reader)
+    finally:
+        sync_reader.release()
+        prefetch_reader.release()
+
+    assert len(sync_frames) == 2 * FRAMES_PER_VIDEO
+    assert len(prefetch_frames) == len(sync_frames)
+    assert all(np.array_equal(a, b) for a, b in zip(sync_frames, prefetch_frames))
+    # Primero todo 'a' y luego todo 'b' (que tiene otra resolución)
+    assert [f.shape for f in prefetch_frames] == [(48, 64, 3)] * FRAMES_PER_VIDEO + [(60, 80, 3)] * FRAMES_PER_VIDEO
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_loop_restarts_the_list(videos, small_prefetch_queue, prefetch):
+    reader = FileReader(videos, prefetch=prefetch, loop=True)
+    try:
+        frames = _read_all(reader, max_frames=3 * FRAMES_PER_VIDEO)
+    finally:
+        reader.release()
+
+    assert len(frames) == 3 * FRAMES_PER_VIDEO
+    assert all(np.array_equal(a, b) for a, b in zip(frames[:FRAMES_PER_VIDEO], frames[2 * FRAMES_PER_VIDEO:]))
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_no_loop_ends_with_false_none(videos, small_prefetch_queue, prefetch):
+    reader = FileReader(videos, prefetch=prefetch, loop=False)
+    try:
+        assert len(_read_all(reader)) == 2 * FRAMES_PER_VIDEO
+        # El fin del stream se mantiene en las lecturas siguientes
+        assert _read_with_timeout(reader) == (False, None)
+        assert _read_with_timeout(reader) == (False, None)
+    finally:
+        reader.release()
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_unreadable_file_in_the_list_is_skipped(videos, tmp_path, small_prefetch_queue, prefetch):
+    missing = str(tmp_path / "missing.avi")
+    reader = FileReader([videos[0], missing, videos[1]], prefetch=prefetch, loop=False)
+    try:
+        assert len(_read_all(reader)) == 2 * FRAMES_PER_VIDEO
+    finally:
+        reader.release()
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+@pytest.mark.parametrize("loop", [False, True])
+def test_unreadable_list_stops_instead_of_looping(tmp_path, small_prefetch_queue, prefetch, loop):
+    garbage = tmp_path / "garbage.avi"
+    garbage.write_bytes(b"esto no es un video")
+    reader = FileReader([str(tmp_path / "missing.avi"), str(garbage)], prefetch=prefetch, loop=loop)
+    try:
+        assert _read_with_timeout(reader) == (False, None)
+    finally:
+        reader.release()
@@ -0,0 +1,93 @@
+import multiprocessing
+import queue
+import sys
+import os
+import time
+
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from services.inference_dispatcher import InferenceDispatcher
+
+
+def _dispatcher(routing: str, num_workers: int = 2, maxsize: int = 0) -> InferenceDispatcher:
+    worker_queues = [queue.Queue(maxsize=maxsize) for _ in range(num_workers)]
+    return InferenceDispatcher(queue.Queue(), worker_queues, multiprocessing.Array("i", num_workers), routing=routing)
+
+
+def _drain(worker_queue: queue.Queue) -> list:
+    items = []
+    while not worker_queue.empty():
+        items.append(worker_queue.get_nowait())
+    return items
+
+
+def _wait_dispatched(dispatcher: InferenceDispatcher, total: int):
+    deadline = time.monotonic() + 5.0
+    while sum(dispatcher.dispatched) + dispatcher.dropped_clips < total:
+        assert time.monotonic() < deadline, "El despachador no reenvió los clips a tiempo"
+        time.sleep(0.01)
+
+
+def test_least_loaded_assigns_new_cameras_by_load_and_keeps_them():
+    dispatcher = _dispatcher("least_loaded")
+    dispatcher.in_flight[0] = 5
+
+    assert dispatcher._route("cam_01") == 1
+    # Aunque el proceso 1 pase a estar más cargado, la cámara no se mueve
+    dispatcher.in_flight[1] = 10
+    assert dispatcher._route("cam_01") == 1
+    assert dispatcher._route("cam_02") == 0
+    assert dispatcher._route("cam_02") == 0
+
+
+def test_camera_affinity_balances_by_camera_count():
+    dispatcher = _dispatcher("camera_affinity", num_workers=3)
+    dispatcher.in_flight[0] = 100 # No cuenta para "camera_affinity"
+
+    workers = [dispatcher._route(f"cam_{i:02d}") for i in range(6)]
+
+    assert workers == [0, 1, 2, 0, 1, 2]
+    assert [dispatcher._route(f"cam_{i:02d}") for i in range(6)] == workers
+
+
+@pytest.mark.parametrize("routing", ["least_loaded", "camera_affinity"])
+def test_each_camera_stream_stays_on_one_worker_in_order(routing):
+    dispatcher = _dispatcher(routing)
+    dispatcher.start()
+
+    cameras = ["cam_01", "cam_02", "cam_03"]
+    for clip_index in range(5):
+        for camera_id in cameras:
+            dispatcher.inference_queue.put((camera_id, clip_index, float(clip_index)))
+    _wait_dispatched(dispatcher, 15)
+
+    streams = {}
+    for worker, worker_queue in enumerate(dispatcher.worker_queues):
+        for camera_id, clip_index, _ in _drain(worker_queue):
+            streams.setdefault(camera_id, []).append((worker, clip_index))
+
+    for camera_id in cameras:
+        workers = {worker for worker, _ in streams[camera_id]}
+        assert len(workers) == 1, f"{camera_id} repartida entre procesos: {workers}"
+        assert [clip_index for _, clip_index in streams[camera_id]] == list(range(5))
+        assert dispatcher.affinity[camera_id] in workers
+
+    assert list(dispatcher.in_flight) == dispatcher.dispatched
+    assert sum(dispatcher.dispatched) == 15
+
+
+def test_full_worker_queue_drops_clip_and_keeps_in_flight_consistent():
+    dispatcher = _dispatcher("least_loaded", num_workers=1, maxsize=2)
+    dispatcher.start()
+
+    for clip_index in range(4):
+        dispatcher.inference_queue.put(("cam_01", clip_index, 0.0))
+    _wait_dispatched(dispatcher, 4)
+
+    assert dispatcher.dispatched == [2]
+    assert dispatcher.dropped_clips == 2
+    assert list(dispatcher.in_flight) == [2]
+    assert [clip_index for _, clip_index, _ in _drain(dispatcher.worker_queues[0])] == [0, 1]
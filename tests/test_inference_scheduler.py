@@ -0,0 +1,44 @@
+import sys
+import os
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from benchmark.scheduler_benchmark import simulate_scheduler
+
+
+def test_schedulers_match_without_contention():
+    # 8 cámaras x 1 pendiente <= lote de 16: todo entra en cada lote
+    for scheduler in ("fifo", "fair"):
+        report = simulate_scheduler(scheduler, num_cameras=8, rounds=50, batch_size=16, max_pending_per_camera=1)
+        assert not report["contended"]
+        assert report["recording"]["min_share"] == 1.0
+        assert report["others"]["min_share"] == 1.0
+
+
+def test_fifo_starves_cameras_under_contention():
+    report = simulate_scheduler("fifo", num_cameras=32, rounds=100, batch_size=16, max_pending_per_camera=1)
+    assert report["contended"]
+    assert report["recording"]["mean_share"] == 0.0
+    assert report["others"]["min_share"] == 0.0
+
+
+def test_fair_shares_batches_and_prioritizes_recording_cameras():
+    report = simulate_scheduler(
+        "fair", num_cameras=32, rounds=100, batch_size=16, max_pending_per_camera=1, priority_boost=4.0
+    )
+    # La cámara que graba entra en (casi) todos los lotes; el resto se reparte
+    # por igual lo que queda y ninguna espera más de un par de rondas
+    assert report["recording"]["min_share"] >= 0.95
+    assert 0.4 <= report["others"]["min_share"] <= 0.55
+    assert report["others"]["max_unserved_rounds"] <= 2
+
+
+def test_priority_boost_matters_only_with_fair_queueing():
+    without_boost = simulate_scheduler(
+        "fair", num_cameras=32, rounds=100, batch_size=16, max_pending_per_camera=1, priority_boost=1.0
+    )
+    with_boost = simulate_scheduler(
+        "fair", num_cameras=32, rounds=100, batch_size=16, max_pending_per_camera=1, priority_boost=4.0
+    )
+    assert with_boost["recording"]["mean_share"] > without_boost["recording"]["mean_share"] + 0.4
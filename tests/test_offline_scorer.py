@@ -0,0 +1,110 @@
+import json
+import sys
+import os
+
+import numpy as np
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from services.offline_scorer import OfflineScoreStore, SCORES_FILENAME
+
+
+def _fake_result(num_windows: int) -> dict:
+    start = np.arange(num_windows, dtype=np.int64) * config.STRIDE
+    return {
+        "fps": 30.0,
+        "num_frames": int(start[-1]) + 32 if num_windows else 0,
+        "start_frame": start,
+        "end_frame": start + 31,
+        "start_seconds": start / 30.0,
+        "end_seconds": (start + 32) / 30.0,
+        "scores": np.full((num_windows, len(config.CLASSES)), 0.5, dtype=np.float32),
+    }
+
+
+def _make_videos(tmp_path, names):
+    paths = {}
+    for name in names:
+        path = tmp_path / "videos" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"video " + name.encode())
+        paths[name] = str(path)
+    return paths
+
+
+def _run(output_dir, output_format, videos: dict, windows: int = 3) -> OfflineScoreStore:
+    # Lo mismo que 'run_offline_scoring', sin el pool de modelos
+    store = OfflineScoreStore(output_dir, output_format, "model:1")
+    pending = {key: path for key, path in videos.items() if not store.is_done(key, path)}
+    store.open(set(pending))
+    try:
+        for key, path in pending.items():
+            store.write(key, path, _fake_result(windows), 0.1)
+    finally:
+        store.close()
+    return store
+
+
+def _scored_videos(output_dir) -> dict:
+    counts = {}
+    with open(os.path.join(output_dir, SCORES_FILENAME), encoding="utf-8") as f:
+        for line in f:
+            video = json.loads(line)["video"]
+            counts[video] = counts.get(video, 0) + 1
+    return counts
+
+
+def test_resume_with_subset_keeps_other_videos(tmp_path):
+    videos = _make_videos(tmp_path, ["a.avi", "b.avi"])
+    output_dir = str(tmp_path / "out")
+
+    _run(output_dir, "jsonl", videos)
+    store = _run(output_dir, "jsonl", {"a.avi": videos["a.avi"]})
+
+    assert _scored_videos(output_dir) == {"a.avi": 3, "b.avi": 3}
+    assert store.is_done("b.avi", videos["b.avi"])
+
+
+def test_rescored_and_unfinished_videos_are_not_duplicated(tmp_path):
+    videos = _make_videos(tmp_path, ["a.avi", "b.avi"])
+    output_dir = str(tmp_path / "out")
+    _run(output_dir, "jsonl", videos)
+
+    # Líneas de un video que no llegó al manifiesto (ejecución interrumpida)
+    with open(os.path.join(output_dir, SCORES_FILENAME), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"video": "c.avi", "window_index": 0}) + "\n")
+    # 'a.avi' cambió: se vuelve a puntuar
+    with open(videos["a.avi"], "ab") as f:
+        f.write(b"more")
+
+    _run(output_dir, "jsonl", {"a.avi": videos["a.avi"]}, windows=5)
+
+    assert _scored_videos(output_dir) == {"a.avi": 5, "b.avi": 3}
+
+
+def test_npz_names_do_not_collide(tmp_path):
+    videos = _make_videos(tmp_path, ["x.avi", "x.mp4", "a/b.avi", "a__b.avi"])
+    output_dir = str(tmp_path / "out")
+
+    store = _run(output_dir, "npz", videos)
+
+    outputs = {store.completed[key]["output"] for key in videos}
+    assert len(outputs) == 4
+    for filename in outputs:
+        assert os.path.exists(os.path.join(output_dir, filename))
+
+
+def test_npz_collision_is_rejected(tmp_path):
+    videos = _make_videos(tmp_path, ["x.avi", "y.avi"])
+    store = OfflineScoreStore(str(tmp_path / "out"), "npz", "model:1")
+    store._npz_filename = lambda video_key: "same.npz"
+    store.open(set(videos))
+    try:
+        store.write("x.avi", videos["x.avi"], _fake_result(2), 0.1)
+        with pytest.raises(ValueError):
+            store.write("y.avi", videos["y.avi"], _fake_result(2), 0.1)
+    finally:
+        store.close()
@@ -0,0 +1,123 @@
+import queue
+import sys
+import os
+
+import numpy as np
+import pytest
+from onnxruntime.capi.onnxruntime_pybind11_state import Fail, InvalidArgument
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from onnx_model.onnx_person_detector import PersonDetector
+from services.person_detection_service import RemotePersonDetector
+
+RESHAPE_ERROR = "Non-zero status code returned while running Reshape node. The input tensor cannot be reshaped"
+
+
+class FakeSession:
+    # Sesión de ONNX Runtime de mentira: acepta lotes de hasta 'max_batch' y
+    # falla con 'error' con lotes mayores. Devuelve la suma de cada imagen.
+
+    def __init__(self, max_batch=None, error=None, always_fail=None):
+        self.max_batch = max_batch
+        self.error = error
+        self.always_fail = always_fail
+        self.batch_sizes = []
+
+    def run(self, output_names, inputs):
+        batch = next(iter(inputs.values()))
+        self.batch_sizes.append(batch.shape[0])
+        if self.always_fail is not None:
+            raise self.always_fail
+        if self.max_batch is not None and batch.shape[0] > self.max_batch:
+            raise self.error
+        return [batch.reshape(batch.shape[0], -1).sum(axis=1)]
+
+
+def _detector(session: FakeSession) -> PersonDetector:
+    detector = PersonDetector()
+    detector.session = session
+    detector.input_name, detector.output_name = "images", "output0"
+    return detector
+
+
+def _batch(size: int) -> np.ndarray:
+    return np.arange(size * 6, dtype=np.float32).reshape(size, 1, 2, 3)
+
+
+def test_reshape_failure_falls_back_to_batch_of_one():
+    session = FakeSession(max_batch=1, error=Fail(RESHAPE_ERROR))
+    detector = _detector(session)
+    batch = _batch(3)
+
+    outputs = detector._run_batch(batch)
+
+    np.testing.assert_array_equal(outputs, batch.reshape(3, -1).sum(axis=1))
+    assert detector.fixed_batch_size == 1
+    assert session.batch_sizes == [3, 1, 1, 1]
+
+
+@pytest.mark.parametrize("error", [
+    InvalidArgument("Got invalid dimensions for input: images"),
+    Fail("Failed to allocate memory for requested buffer"),
+    RuntimeError("provider error"),
+])
+def test_other_errors_propagate_and_keep_dynamic_batching(error):
+    session = FakeSession(max_batch=1, error=error)
+    detector = _detector(session)
+
+    with pytest.raises(type(error)):
+        detector._run_batch(_batch(4))
+
+    assert detector.fixed_batch_size is None
+    assert session.batch_sizes == [4]
+
+
+def test_mode_is_restored_when_batch_of_one_also_fails():
+    session = FakeSession(always_fail=Fail(RESHAPE_ERROR))
+    detector = _detector(session)
+
+    with pytest.raises(Fail):
+        detector._run_batch(_batch(2))
+
+    assert detector.fixed_batch_size is None
+
+
+def _remote(monkeypatch, timeout: float = 0.2):
+    monkeypatch.setattr(config, "PERSON_SERVICE_RESPONSE_TIMEOUT_SECONDS", timeout)
+    return RemotePersonDetector("cam_01", queue.Queue(), queue.Queue())
+
+
+def test_remote_detector_discards_stale_responses(monkeypatch):
+    remote = _remote(monkeypatch)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    boxes = np.ones((2, 5), dtype=np.float32)
+
+    # Respuesta atrasada de una petición anterior (ya expirada) y luego la buena
+    remote.response_queue.put((0, 7, np.empty((0, 5), dtype=np.float32)))
+    remote.response_queue.put((1, 2, boxes))
+
+    count, result_boxes = remote.detect_persons(frame)
+
+    assert count == 2
+    np.testing.assert_array_equal(result_boxes, boxes)
+    camera_id, sequence, canvas, _, frame_shape = remote.request_queue.get_nowait()
+    assert (camera_id, sequence, frame_shape) == ("cam_01", 1, frame.shape)
+    assert canvas.shape == (320, 320, 3) and canvas.dtype == np.uint8
+
+
+def test_remote_detector_times_out(monkeypatch):
+    remote = _remote(monkeypatch, timeout=0.05)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    # Solo llega una respuesta atrasada: se descarta y se agota el tiempo
+    remote.response_queue.put((0, 3, np.empty((0, 5), dtype=np.float32)))
+    count, boxes = remote.detect_persons(frame)
+    assert count == -1 and boxes.shape == (0, 5)
+
+    # La respuesta tardía de esa petición no se confunde con la siguiente
+    remote.response_queue.put((1, 5, np.empty((0, 5), dtype=np.float32)))
+    remote.response_queue.put((2, 1, np.ones((1, 5), dtype=np.float32)))
+    assert remote.count_persons(frame) == 1
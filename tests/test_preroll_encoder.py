@@ -0,0 +1,123 @@
+import json
+import sys
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from services import preroll_encoder
+from services.preroll_encoder import PrerollEncoder
+from services.event_recorder import EventRecorder, RecorderWriterPool
+
+FRAME_SIZE = (64, 48) # (ancho, alto)
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((FRAME_SIZE[1], FRAME_SIZE[0], 3), value, dtype=np.uint8)
+
+
+def _value(index: int) -> int:
+    return 10 + index * 9
+
+
+@pytest.fixture
+def slow_encoder(monkeypatch):
+    # Codificador lento: el worker siempre va por delante de él
+    real_imencode = cv2.imencode
+
+    def slow_imencode(*args):
+        time.sleep(0.02)
+        return real_imencode(*args)
+
+    monkeypatch.setattr(preroll_encoder.cv2, "imencode", slow_imencode)
+
+
+@pytest.fixture
+def save_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SAVE_CLIP_PATH", str(tmp_path / "clips"))
+    monkeypatch.setattr(config, "SAVE_LOG_PATH", str(tmp_path / "logs"))
+
+
+def _record(camera_id: str, pre_roll: list, new_frames: range) -> EventRecorder:
+    pool = RecorderWriterPool(num_threads=1)
+    recorder = EventRecorder(
+        camera_id, pre_roll, source_fps=30.0, writer_pool=pool,
+        frame_size=FRAME_SIZE, pre_roll_owned=True
+    )
+    recorder.start()
+    for index in new_frames:
+        assert recorder.add_frame(_frame(_value(index)), np.zeros(len(config.CLASSES)))
+    recorder.close()
+    assert pool.shutdown(timeout=10.0)
+    return recorder
+
+
+def _read_means(path: str) -> list:
+    capture = cv2.VideoCapture(path)
+    means = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        means.append(float(frame.mean()))
+    capture.release()
+    return means
+
+
+def test_snapshot_does_not_wait_and_stitches_with_live_frames(slow_encoder, save_paths):
+    encoder = PrerollEncoder(capacity_frames=20, segment_frames=5, queue_frames=100)
+    try:
+        for index in range(20):
+            encoder.add(_frame(_value(index)))
+        time.sleep(0.15) # Algunos frames ya codificados, la mayoría todavía en cola
+
+        started = time.monotonic()
+        pre_roll = encoder.snapshot()
+        assert time.monotonic() - started < 0.01
+    finally:
+        encoder.release()
+
+    assert len(pre_roll) == 20
+    assert any(isinstance(frame, bytes) for frame in pre_roll)
+    assert any(isinstance(frame, np.ndarray) for frame in pre_roll)
+
+    recorder = _record("cam_stitch", pre_roll, range(20, 25))
+
+    means = _read_means(recorder.video_path)
+    expected = [_value(index) for index in range(25)]
+    assert len(means) == len(expected)
+    # Cada frame es el más cercano a su valor esperado (el códec no es exacto)
+    assert means == pytest.approx(expected, abs=4)
+
+
+def test_dropped_frames_are_counted_and_kept_as_gaps(slow_encoder, save_paths):
+    encoder = PrerollEncoder(capacity_frames=100, segment_frames=4, queue_frames=2)
+    try:
+        for index in range(12):
+            encoder.add(_frame(_value(index)))
+        dropped = encoder.dropped_frames
+        assert dropped > 0
+
+        pre_roll = encoder.snapshot()
+        assert len(pre_roll) == 12
+        assert sum(frame is None for frame in pre_roll) == dropped
+
+        # Una vez codificado todo, los huecos siguen en su lugar
+        time.sleep(0.3)
+        encoded = encoder.snapshot()
+        assert len(encoded) == 12
+        assert [frame is None for frame in encoded] == [frame is None for frame in pre_roll]
+    finally:
+        encoder.release()
+
+    recorder = _record("cam_gaps", pre_roll, range(12, 14))
+
+    assert len(_read_means(recorder.video_path)) == 14
+    with open(recorder.log_path, encoding="utf-8") as f:
+        assert json.load(f)["pre_roll_gap_frames"] == dropped
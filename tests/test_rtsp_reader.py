@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from services.stream_reader.rtsp_reader import RtspReader
+
+FPS = 25.0
+NUM_FRAMES = 50
+
+
+@pytest.fixture
+def local_video(tmp_path):
+    # Video local que hace de cámara: el frame i tiene todos sus píxeles en i * 4
+    path = str(tmp_path / "camera.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (64, 48))
+    for i in range(NUM_FRAMES):
+        writer.write(np.full((48, 64, 3), i * 4, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(config, "RTSP_RECONNECT_INITIAL_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(config, "RTSP_RECONNECT_MAX_DELAY_SECONDS", 0.04)
+    monkeypatch.setattr(config, "RTSP_READ_TIMEOUT_SECONDS", 5.0)
+
+
+def _frame_index(frame: np.ndarray) -> int:
+    return int(round(float(frame.mean()) / 4))
+
+
+def test_realtime_pacing_comes_from_config(local_video, monkeypatch):
+    monkeypatch.setattr(config, "RTSP_REALTIME_PACING", True)
+    reader = RtspReader(local_video)
+    try:
+        assert reader.realtime_pacing
+    finally:
+        reader.release()
+
+
+def test_measured_fps_follows_paced_source(local_video, fast_reconnect, monkeypatch):
+    monkeypatch.setattr(config, "RTSP_FPS_MIN_SAMPLES", 20)
+    reader = RtspReader(local_video, realtime_pacing=True)
+    try:
+        assert reader.get_fps() == pytest.approx(FPS, rel=0.2)
+    finally:
+        reader.release()
+
+
+def test_read_returns_latest_frame_and_counts_dropped(local_video, fast_reconnect):
+    reader = RtspReader(local_video, realtime_pacing=True)
+    try:
+        ret, frame = reader.read()
+        assert ret
+        first = _frame_index(frame)
+
+        time.sleep(0.4) # ~10 frames que el "worker" no alcanza a leer
+        ret, frame = reader.read()
+        assert ret
+        skipped = _frame_index(frame) - first - 1
+        assert skipped >= 5
+        assert reader.dropped_frames == skipped
+    finally:
+        reader.release()
+
+
+def test_reconnects_when_the_stream_ends(local_video, fast_reconnect):
+    # Sin pacing el archivo se lee enseguida; al terminar, el grabber lo trata
+    # como una caída y se vuelve a conectar (el video empieza de nuevo)
+    reader = RtspReader(local_video, realtime_pacing=False)
+    try:
+        deadline = time.monotonic() + 5.0
+        while reader.latest_sequence <= NUM_FRAMES and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert reader.latest_sequence > NUM_FRAMES
+        ret, _ = reader.read()
+        assert ret
+    finally:
+        reader.release()
+
+
+def test_gives_up_after_max_reconnect_attempts(tmp_path, fast_reconnect, monkeypatch):
+    monkeypatch.setattr(config, "RTSP_MAX_RECONNECT_ATTEMPTS", 3)
+    start = time.monotonic()
+    reader = RtspReader(str(tmp_path / "missing.avi"))
+    try:
+        assert reader.read() == (False, None)
+        assert reader.failed
+        # Espera exponencial: 0.01 + 0.02 + 0.04 (tope)
+        assert time.monotonic() - start >= 0.07
+    finally:
+        reader.release()
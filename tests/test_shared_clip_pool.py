@@ -0,0 +1,61 @@
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from services import shared_clip_pool
+from services.shared_clip_pool import SharedClipPool
+
+CLIP_SHAPE = (3, 4, 8, 8)
+
+
+@pytest.fixture
+def pool():
+    pool = SharedClipPool.create(num_slots=2, clip_shape=CLIP_SHAPE, dtype="uint8")
+    yield pool
+    pool.close()
+
+
+def test_clip_round_trip_and_slot_exhaustion(pool):
+    clips = [np.random.default_rng(i).integers(0, 256, CLIP_SHAPE, dtype=np.uint8) for i in range(2)]
+
+    slots = [pool.acquire(timeout=1.0) for _ in range(2)]
+    assert sorted(slots) == [0, 1]
+    for slot, clip in zip(slots, clips):
+        pool.view(slot)[...] = clip
+
+    # Todos los slots en uso: no hay más hasta que se libere uno
+    assert pool.acquire(timeout=0.1) is None
+
+    # Otro "proceso" (el mismo estado que viaja al proceso hijo) ve los mismos datos sin copia
+    other = SharedClipPool.__new__(SharedClipPool)
+    other.__setstate__(pool.__getstate__())
+    try:
+        for slot, clip in zip(slots, clips):
+            np.testing.assert_array_equal(other.view(slot), clip)
+        other.release(slots[0])
+    finally:
+        other.close()
+
+    assert pool.acquire(timeout=1.0) == slots[0]
+    assert pool.acquire(timeout=0.1) is None
+
+
+def test_create_fails_when_dev_shm_is_too_small(monkeypatch):
+    if not os.path.isdir(shared_clip_pool._SHM_DIR):
+        pytest.skip("Sin /dev/shm en este sistema")
+
+    StatVfs = namedtuple("StatVfs", "f_bavail f_frsize")
+    monkeypatch.setattr(shared_clip_pool.os, "statvfs", lambda path: StatVfs(f_bavail=1, f_frsize=4096))
+    before = set(os.listdir(shared_clip_pool._SHM_DIR))
+
+    with pytest.raises(OSError) as error:
+        SharedClipPool.create(num_slots=4, clip_shape=CLIP_SHAPE, dtype="float32")
+
+    assert "MB libres" in str(error.value)
+    assert set(os.listdir(shared_clip_pool._SHM_DIR)) == before # No se creó ningún bloque
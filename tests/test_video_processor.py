@@ -0,0 +1,89 @@
+import sys
+import os
+
+import numpy as np
+import pytest
+
+# Agregamos 'model_api' al path de Python (igual que los módulos del proyecto)
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_api"))
+
+from config import config
+from processing.frame_ring_buffer import FrameRingBuffer
+from processing.video_processor import FramePreprocessCache, normalize_clip_batch, preprocess_clip
+
+WINDOW_SIZE = 48 # Búfer de inferencia de 1.6 s a 30 FPS (más frames que CLIP_LEN)
+
+
+def _frames(rng, count: int, height: int, width: int) -> list:
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def _run_like_worker(frames: list, as_uint8: bool, frame_counter: int = 0) -> int:
+    # Recorre los frames como el bucle del 'camera_worker' (búfer circular,
+    # ventanas cada STRIDE frames) y compara cada clip de la caché con el
+    # de 'preprocess_clip()'. Devuelve el número de ventanas comparadas.
+    ring = FrameRingBuffer(WINDOW_SIZE)
+    cache = FramePreprocessCache()
+    windows = 0
+    for frame in frames:
+        ring.append(frame)
+        frame_counter += 1
+        if len(ring) < WINDOW_SIZE or frame_counter % config.STRIDE != 0:
+            continue
+        window = ring.latest(WINDOW_SIZE)
+        cached = cache.preprocess_clip(window, frame_counter - WINDOW_SIZE, as_uint8=as_uint8)
+        expected = preprocess_clip(window, as_uint8=as_uint8)
+        assert cached.dtype == expected.dtype
+        assert np.array_equal(cached, expected)
+        windows += 1
+    return windows
+
+
+@pytest.mark.parametrize("as_uint8", [False, True])
+def test_cache_matches_preprocess_clip_on_overlapping_windows(as_uint8):
+    rng = np.random.default_rng(0)
+    # 144 frames: el búfer circular da varias vueltas y las ventanas se solapan
+    assert _run_like_worker(_frames(rng, 144, 240, 320), as_uint8) == 7
+
+
+@pytest.mark.parametrize("as_uint8", [False, True])
+def test_cache_matches_preprocess_clip_after_resolution_change(as_uint8):
+    rng = np.random.default_rng(1)
+    # El FileReader pasa a un video vertical de otra resolución
+    frames = _frames(rng, 80, 240, 320) + _frames(rng, 80, 300, 260)
+    assert _run_like_worker(frames, as_uint8) == 6
+
+
+def test_cache_matches_preprocess_clip_when_frame_counter_restarts():
+    rng = np.random.default_rng(2)
+    cache = FramePreprocessCache()
+    first = _frames(rng, 96, 240, 320)
+    second = _frames(rng, 96, 240, 320)
+
+    # Mismos números de frame, otros frames (ej. el contador volvió a empezar)
+    for frames in (first, second):
+        for first_frame_index in (0, 16, 32, 48):
+            window = frames[first_frame_index:first_frame_index + WINDOW_SIZE]
+            cached = cache.preprocess_clip(window, first_frame_index)
+            assert np.array_equal(cached, preprocess_clip(window))
+
+
+def test_cache_matches_preprocess_clip_with_large_frame_numbers():
+    rng = np.random.default_rng(3)
+    # Un stream que lleva días abierto: el contador supera 2**31
+    windows = _run_like_worker(_frames(rng, 96, 240, 320), as_uint8=False, frame_counter=2**31 - 40)
+    assert windows == 3
+
+
+def test_normalize_clip_batch_matches_stacked_preprocess_clip():
+    rng = np.random.default_rng(4)
+    clips = [_frames(rng, WINDOW_SIZE, 240, 320) for _ in range(3)]
+
+    uint8_batch = np.stack([preprocess_clip(frames, as_uint8=True) for frames in clips])
+    expected = np.stack([preprocess_clip(frames) for frames in clips])
+    normalized = normalize_clip_batch(uint8_batch)
+
+    assert uint8_batch.dtype == np.uint8
+    assert normalized.dtype == expected.dtype == np.float32
+    assert normalized.shape == expected.shape == (3, 3, config.CLIP_LEN, config.INPUT_CROP_SIZE, config.INPUT_CROP_SIZE)
+    assert np.array_equal(normalized, expected)